@@ -0,0 +1,332 @@
+"""
+BM25 lexical index for the RAG system.
+
+Chunk texts are kept in a SQLite table shared by every process on the host
+(API workers and Celery workers), updated incrementally as documents are
+indexed and deleted. Each process searches in-memory BM25 retrievers, one per
+stemming language (French and English), rebuilt from the table in a background
+thread when it has changed; searches keep using the previous retrievers until
+the new ones are swapped in. This gives hybrid retrieval an exact-term leg for article numbers,
+acronyms and other tokens that embeddings match poorly.
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, List, Any, Optional, Iterable, Tuple
+
+from llama_index.core.schema import TextNode
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BM25_INDEX_PATH = "/var/cache/regulaite/bm25.sqlite"
+
+# Rows written to the staging table per transaction during a full rebuild
+REBUILD_BATCH_SIZE = 1000
+
+# Supported index languages and their Snowball stemmers; other languages use English
+BM25_LANGUAGES = {"fr": "french", "en": "english"}
+
+# Frequent French function words, used when a chunk carries no language
+_FRENCH_MARKERS = {
+    "le", "la", "les", "des", "du", "une", "est", "et", "dans", "pour", "par", "sur",
+    "qui", "que", "aux", "au", "ce", "cette", "sont", "avec", "pas", "ou", "leur", "doit",
+}
+_ENGLISH_MARKERS = {
+    "the", "of", "and", "to", "in", "is", "for", "on", "that", "by", "with", "are",
+    "be", "this", "or", "shall", "must", "an", "as", "from", "which", "not", "its", "at",
+}
+_WORD_PATTERN = re.compile(r"[a-zàâäçéèêëîïôöùûüÿœæ]+")
+
+
+def guess_language(text: str, declared: Optional[str] = None) -> str:
+    """
+    Pick the index language of a text.
+
+    Args:
+        text: Chunk or query text
+        declared: Language code from the chunk metadata, if any
+
+    Returns:
+        A key of BM25_LANGUAGES
+    """
+    if declared:
+        code = str(declared).lower()[:2]
+        if code in BM25_LANGUAGES:
+            return code
+    words = _WORD_PATTERN.findall(text[:2000].lower())
+    french = sum(1 for word in words if word in _FRENCH_MARKERS)
+    english = sum(1 for word in words if word in _ENGLISH_MARKERS)
+    return "fr" if french > english else "en"
+
+
+class BM25Index:
+    """
+    Shared chunk corpus with per-language in-memory BM25 retrievers.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_BM25_INDEX_PATH, min_rebuild_interval: float = 10.0):
+        """
+        Initialize the index.
+
+        Args:
+            db_path: Path of the SQLite file holding the chunk corpus
+            min_rebuild_interval: Minimum seconds between two rebuilds of the in-memory
+                retrievers, so a burst of indexing does not trigger a rebuild per query
+        """
+        self.db_path = db_path
+        self.min_rebuild_interval = max(0.0, min_rebuild_interval)
+
+        self._lock = threading.Lock()
+        self._retrievers: Dict[str, Any] = {}
+        self._corpus_sizes: Dict[str, int] = {}
+        self._built_generation: Optional[int] = None
+        self._last_build = 0.0
+        self._building = False
+        # Set once the first build has finished, which searches wait for
+        self._ready = threading.Event()
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        # WAL lets several processes read while one writes
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                point_id TEXT PRIMARY KEY,
+                doc_id TEXT NOT NULL,
+                language TEXT NOT NULL,
+                text TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_doc_id ON chunks (doc_id)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0)")
+        self._conn.commit()
+        logger.info(f"BM25 index corpus opened at {db_path}")
+
+    def add_chunks(self, doc_id: str, chunks: Iterable[Tuple[str, str, str]]) -> int:
+        """
+        Add or replace chunks of a document.
+
+        Args:
+            doc_id: Document ID the chunks belong to
+            chunks: (point_id, text, language) tuples
+
+        Returns:
+            Number of chunks written
+        """
+        rows = [(point_id, doc_id, language, text) for point_id, text, language in chunks]
+        if not rows:
+            return 0
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (point_id, doc_id, language, text) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._bump_generation()
+        return len(rows)
+
+    def delete_points(self, point_ids: Iterable[str]) -> None:
+        """Remove chunks by point ID."""
+        rows = [(str(point_id),) for point_id in point_ids]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany("DELETE FROM chunks WHERE point_id = ?", rows)
+            self._bump_generation()
+
+    def delete_document(self, doc_id: str) -> None:
+        """Remove every chunk of a document."""
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks WHERE doc_id = ?", (doc_id,))
+            self._bump_generation()
+
+    def replace_all(self, chunks: Iterable[Tuple[str, str, str, str]]) -> int:
+        """
+        Replace the whole corpus, e.g. with the chunks stored in the vector store.
+
+        The new corpus is written to a staging table while searches keep using the
+        current one, then swapped in with a single transaction and generation bump.
+        Chunks added by concurrent indexing after the rebuild started are kept.
+
+        Args:
+            chunks: (doc_id, point_id, text, language) tuples; may be a generator
+
+        Returns:
+            Number of chunks in the new corpus
+        """
+        staging = f"chunks_staging_{uuid.uuid4().hex}"
+        with self._lock:
+            self._conn.execute(
+                f"CREATE TABLE {staging} (point_id TEXT PRIMARY KEY, doc_id TEXT NOT NULL, "
+                f"language TEXT NOT NULL, text TEXT NOT NULL)"
+            )
+            # Rows written after this point come from live indexing and survive the swap
+            started_rowid = self._conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM chunks").fetchone()[0]
+            self._conn.commit()
+
+        try:
+            count = 0
+            batch = []
+            for doc_id, point_id, text, language in chunks:
+                batch.append((point_id, doc_id, language, text))
+                if len(batch) >= REBUILD_BATCH_SIZE:
+                    count += self._stage(staging, batch)
+                    batch = []
+            if batch:
+                count += self._stage(staging, batch)
+
+            with self._lock:
+                try:
+                    self._conn.execute(
+                        f"DELETE FROM chunks WHERE rowid <= ? AND point_id NOT IN (SELECT point_id FROM {staging})",
+                        (started_rowid,)
+                    )
+                    self._conn.execute(
+                        f"INSERT OR REPLACE INTO chunks (point_id, doc_id, language, text) "
+                        f"SELECT point_id, doc_id, language, text FROM {staging} WHERE point_id NOT IN "
+                        f"(SELECT point_id FROM chunks WHERE rowid > ?)",
+                        (started_rowid,)
+                    )
+                    self._bump_generation()
+                except Exception:
+                    self._conn.rollback()
+                    raise
+            return count
+        finally:
+            with self._lock:
+                self._conn.execute(f"DROP TABLE IF EXISTS {staging}")
+                self._conn.commit()
+
+    def _stage(self, staging: str, rows: List[Tuple[str, str, str, str]]) -> int:
+        """Write a batch of rows to a staging table."""
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO {staging} (point_id, doc_id, language, text) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+        return len(rows)
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """
+        Search the chunk corpus.
+
+        Args:
+            query: Query text
+            k: Maximum number of results
+
+        Returns:
+            (point_id, BM25 score) pairs, best first
+        """
+        if not query.strip() or k <= 0:
+            return []
+        self._refresh()
+        self._ready.wait()
+        with self._lock:
+            hits = []
+            for language, retriever in self._retrievers.items():
+                retriever.similarity_top_k = min(k, self._corpus_sizes[language])
+                for result in retriever.retrieve(query):
+                    if result.score and result.score > 0:
+                        hits.append((result.node.node_id, float(result.score)))
+        hits.sort(key=lambda x: x[1], reverse=True)
+        return hits[:k]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the corpus size per language and the generation searched."""
+        with self._lock:
+            return {
+                "db_path": self.db_path,
+                "generation": self._generation(),
+                "built_generation": self._built_generation,
+                "chunks": dict(self._corpus_sizes),
+            }
+
+    def close(self) -> None:
+        """Close the corpus database."""
+        with self._lock:
+            try:
+                self._conn.close()
+            except Exception as e:
+                logger.warning(f"Error closing BM25 index: {str(e)}")
+
+    def _generation(self) -> int:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return int(row[0]) if row else 0
+
+    def _bump_generation(self) -> None:
+        """Mark the corpus as changed so every process rebuilds its retrievers. Caller holds the lock."""
+        self._conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+        self._conn.commit()
+
+    def _refresh(self) -> None:
+        """
+        Start a rebuild of the retrievers if the corpus changed since the last build.
+
+        The first build runs in the calling thread, since there is nothing to serve yet;
+        later ones run in a background thread.
+        """
+        with self._lock:
+            if self._building:
+                return
+            if self._generation() == self._built_generation:
+                return
+            first_build = self._built_generation is None
+            if not first_build and time.time() - self._last_build < self.min_rebuild_interval:
+                return
+            self._building = True
+
+        if first_build:
+            self._rebuild()
+        else:
+            threading.Thread(target=self._rebuild, name="bm25-rebuild", daemon=True).start()
+
+    def _rebuild(self) -> None:
+        """Build retrievers from the corpus table and swap them in; the caller set _building."""
+        try:
+            import Stemmer
+            from llama_index.retrievers.bm25 import BM25Retriever
+
+            start = time.time()
+            with self._lock:
+                generation = self._generation()
+                rows = {
+                    language: self._conn.execute(
+                        "SELECT point_id, text FROM chunks WHERE language = ?", (language,)
+                    ).fetchall()
+                    for language in BM25_LANGUAGES
+                }
+
+            retrievers = {}
+            sizes = {}
+            for language, stemmer_name in BM25_LANGUAGES.items():
+                nodes = [TextNode(id_=point_id, text=text) for point_id, text in rows[language]]
+                if not nodes:
+                    continue
+                retrievers[language] = BM25Retriever.from_defaults(
+                    nodes=nodes,
+                    stemmer=Stemmer.Stemmer(stemmer_name),
+                    language=language,
+                )
+                sizes[language] = len(nodes)
+
+            with self._lock:
+                self._retrievers = retrievers
+                self._corpus_sizes = sizes
+                self._built_generation = generation
+                self._last_build = time.time()
+            logger.info(f"Rebuilt BM25 retrievers for {sizes} chunks in {time.time() - start:.2f}s")
+        except Exception as e:
+            logger.error(f"Error rebuilding BM25 retrievers, still serving the previous ones: {str(e)}")
+        finally:
+            with self._lock:
+                self._building = False
+            self._ready.set()
@@ -0,0 +1,105 @@
+"""
+Local cross-encoder reranker for the RAG system.
+
+Scores (query, passage) pairs with a small cross-encoder running on CPU, all
+candidates in one batch. The ONNX build from fastembed is preferred; the
+sentence-transformers CrossEncoder is used when fastembed is not available.
+"""
+
+import logging
+import math
+import threading
+from typing import List, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Trained on English MS MARCO only: pick a multilingual model before using it on French corpora
+DEFAULT_CROSS_ENCODER_MODEL = "cross-encoder/ms-marco-MiniLM-L-12-v2"
+
+# Reranking modes accepted by RAGSystem and the query endpoints
+RERANKER_MODES = ("cross_encoder", "llm", "none")
+
+# The LLM rates relevance in any language; the cross-encoder is opt-in
+DEFAULT_RERANKER = "llm"
+
+# ONNX exports of the sentence-transformers cross-encoders served by fastembed
+_FASTEMBED_MODEL_NAMES = {
+    "cross-encoder/ms-marco-MiniLM-L-6-v2": "Xenova/ms-marco-MiniLM-L-6-v2",
+    "cross-encoder/ms-marco-MiniLM-L-12-v2": "Xenova/ms-marco-MiniLM-L-12-v2",
+}
+
+
+class CrossEncoderReranker:
+    """
+    Lazily loaded cross-encoder returning relevance probabilities in [0, 1].
+    """
+
+    def __init__(self, model_name: str = DEFAULT_CROSS_ENCODER_MODEL, batch_size: int = 32, max_chars: int = 2000):
+        """
+        Initialize the reranker. The model is loaded on first use.
+
+        Args:
+            model_name: sentence-transformers or fastembed cross-encoder name
+            batch_size: Number of pairs scored per model call
+            max_chars: Passages are truncated to this many characters before scoring
+        """
+        self.model_name = model_name
+        self.batch_size = max(1, batch_size)
+        self.max_chars = max_chars
+        self.backend: Optional[str] = None
+        self._model: Any = None
+        self._load_error: Optional[Exception] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> None:
+        with self._lock:
+            if self._model is not None:
+                return
+            if self._load_error is not None:
+                raise self._load_error
+
+            try:
+                from fastembed.rerank.cross_encoder import TextCrossEncoder
+                self._model = TextCrossEncoder(model_name=_FASTEMBED_MODEL_NAMES.get(self.model_name, self.model_name))
+                self.backend = "fastembed"
+            except Exception as e:
+                logger.info(f"fastembed cross-encoder unavailable for {self.model_name}, trying sentence-transformers: {str(e)}")
+                try:
+                    from sentence_transformers import CrossEncoder
+                    self._model = CrossEncoder(self.model_name, device="cpu")
+                    self.backend = "sentence_transformers"
+                except Exception as e:
+                    # Remember the failure so every query does not retry the load
+                    self._load_error = e
+                    raise
+
+            logger.info(f"Loaded cross-encoder {self.model_name} with {self.backend}")
+
+    def score(self, query: str, passages: List[str]) -> List[float]:
+        """
+        Score passages against a query.
+
+        Args:
+            query: User query
+            passages: Candidate passages
+
+        Returns:
+            Relevance probabilities aligned with passages
+        """
+        if not passages:
+            return []
+        self._load()
+        passages = [passage[:self.max_chars] for passage in passages]
+
+        if self.backend == "fastembed":
+            # fastembed returns raw logits
+            logits = list(self._model.rerank(query, passages, batch_size=self.batch_size))
+            return [1.0 / (1.0 + math.exp(-float(logit))) for logit in logits]
+
+        # Single-label sentence-transformers cross-encoders apply a sigmoid by default
+        scores = self._model.predict(
+            [(query, passage) for passage in passages],
+            batch_size=self.batch_size,
+            show_progress_bar=False
+        )
+        return [float(score) for score in scores]
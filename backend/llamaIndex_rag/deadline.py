@@ -0,0 +1,149 @@
+"""
+Per-request latency budgets for RAG queries.
+
+A QueryDeadline tracks the time left for a query and decides, before each
+optional stage, whether the stage still fits. Optional stages are given up in
+priority order: a stage only runs if the time left covers it, every stage that
+must still run, and every optional stage ranked above it. Stage costs are
+estimated from recently observed durations.
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, List, Any, Optional, Iterable
+
+logger = logging.getLogger(__name__)
+
+# Optional stages, first given up first
+OPTIONAL_QUERY_STAGES = ("reformulation", "llm_rerank", "self_critique", "hallucination_check")
+
+# Stages that always run
+REQUIRED_QUERY_STAGES = ("retrieval", "generation")
+
+# Cost estimates used until durations have been observed, in milliseconds
+DEFAULT_STAGE_ESTIMATES_MS = {
+    "reformulation": 1500.0,
+    "complexity_llm": 1000.0,
+    "retrieval": 500.0,
+    "llm_rerank": 2500.0,
+    "generation": 4000.0,
+    "self_critique": 4000.0,
+    "hallucination_check": 1500.0,
+}
+
+
+class StageLatencyTracker:
+    """
+    Exponentially weighted moving average of stage durations.
+    """
+
+    def __init__(self, alpha: float = 0.2, defaults: Optional[Dict[str, float]] = None):
+        """
+        Initialize the tracker.
+
+        Args:
+            alpha: Weight of the newest observation
+            defaults: Estimates used for stages not observed yet, in milliseconds
+        """
+        self.alpha = alpha
+        self._estimates = dict(defaults or DEFAULT_STAGE_ESTIMATES_MS)
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, duration_ms: float) -> None:
+        with self._lock:
+            previous = self._estimates.get(stage)
+            if previous is None:
+                self._estimates[stage] = duration_ms
+            else:
+                self._estimates[stage] = (1 - self.alpha) * previous + self.alpha * duration_ms
+
+    def estimate(self, stage: str) -> float:
+        with self._lock:
+            return self._estimates.get(stage, 0.0)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {stage: round(ms, 1) for stage, ms in self._estimates.items()}
+
+
+class QueryDeadline:
+    """
+    Time budget of one query, deciding which optional stages still fit.
+    """
+
+    def __init__(self, deadline_ms: Optional[float], latency: StageLatencyTracker):
+        """
+        Initialize the deadline.
+
+        Args:
+            deadline_ms: Budget of the query in milliseconds (None for no deadline)
+            latency: Stage duration estimates
+        """
+        self.deadline_ms = deadline_ms
+        self.latency = latency
+        self.start = time.monotonic()
+        self.skipped: List[str] = []
+        self._pending_required = set(REQUIRED_QUERY_STAGES)
+        self._decided = set()
+
+    def elapsed_ms(self) -> float:
+        return (time.monotonic() - self.start) * 1000.0
+
+    def remaining_ms(self) -> Optional[float]:
+        if self.deadline_ms is None:
+            return None
+        return self.deadline_ms - self.elapsed_ms()
+
+    def allows(self, stage: str) -> bool:
+        """
+        Decide whether an optional stage runs, recording it as skipped if not.
+
+        Args:
+            stage: One of OPTIONAL_QUERY_STAGES
+
+        Returns:
+            True if the stage fits in the remaining budget
+        """
+        self._decided.add(stage)
+        remaining = self.remaining_ms()
+        if remaining is None:
+            return True
+
+        # Reserve time for required stages and for higher-priority optional stages still ahead
+        rank = OPTIONAL_QUERY_STAGES.index(stage)
+        ahead = [s for s in OPTIONAL_QUERY_STAGES[rank + 1:] if s not in self._decided]
+        needed = self._estimate([stage] + ahead + sorted(self._pending_required))
+        if remaining >= needed:
+            return True
+
+        logger.info(f"Skipping {stage}: {remaining:.0f}ms left, about {needed:.0f}ms needed")
+        self.skipped.append(stage)
+        return False
+
+    def exclude(self, *stages: str) -> None:
+        """Mark optional stages that will not run anyway, so no time is reserved for them."""
+        self._decided.update(stages)
+
+    def fits(self, *stages: str) -> bool:
+        """Return whether the given stages fit in the remaining budget, without recording anything."""
+        remaining = self.remaining_ms()
+        return remaining is None or remaining >= self._estimate(stages)
+
+    def finished(self, stage: str, duration_ms: float) -> None:
+        """Record a stage duration, feeding the estimates used by later queries."""
+        self._pending_required.discard(stage)
+        self.latency.observe(stage, duration_ms)
+
+    def _estimate(self, stages: Iterable[str]) -> float:
+        return sum(self.latency.estimate(stage) for stage in stages)
+
+    def report(self) -> Dict[str, Any]:
+        """Return the budget, elapsed time and the skipped stages."""
+        elapsed = self.elapsed_ms()
+        return {
+            "deadline_ms": self.deadline_ms,
+            "elapsed_ms": round(elapsed, 1),
+            "met": self.deadline_ms is None or elapsed <= self.deadline_ms,
+            "skipped_stages": list(self.skipped),
+        }
@@ -0,0 +1,332 @@
+"""
+Document catalog for the RAG system.
+
+One payload-only record per document (title, file type, status, chunk count...)
+is kept in a Qdrant collection without dense vectors: the records are only ever
+read by ID or by payload filter, so vectors would just cost memory and HNSW work.
+All writers go through DocumentCatalog so the record layout stays in one place.
+"""
+
+import logging
+import uuid
+from typing import Dict, List, Any, Optional, Iterator
+
+from qdrant_client import QdrantClient, models as qdrant_models
+
+from llamaIndex_rag.file_lock import FileLock, lock_path
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentCatalog:
+    """
+    Payload-only store of document metadata records, keyed by doc_id.
+    """
+
+    def __init__(
+        self,
+        client: QdrantClient,
+        collection_name: str = "regulaite_metadata",
+        page_size: int = 256,
+        lock_dir: Optional[str] = None
+    ):
+        """
+        Initialize the catalog.
+
+        Args:
+            client: Qdrant client
+            collection_name: Name (or alias) of the catalog collection
+            page_size: Number of records fetched per scroll page
+            lock_dir: Directory of the lock files shared with the other API and Celery workers
+                (defaults to the RAG_LOCK_DIR environment variable)
+        """
+        self.client = client
+        self.collection_name = collection_name
+        self.page_size = max(1, page_size)
+        self.migration_lock = FileLock(lock_path(f"{collection_name}_migration", lock_dir))
+        # Writes hold this lock shared; the migration takes it exclusively for the switch
+        self.write_lock = FileLock(lock_path(f"{collection_name}_writes", lock_dir))
+
+    @property
+    def migrated_name(self) -> str:
+        """Name of the vectorless collection a legacy catalog is migrated to."""
+        return f"{self.collection_name}_catalog"
+
+    @staticmethod
+    def point_id(doc_id: str) -> str:
+        """Return the catalog point ID of a document."""
+        return str(uuid.uuid5(uuid.NAMESPACE_DNS, doc_id))
+
+    def ensure_collection(self) -> None:
+        """
+        Create the vectorless catalog collection, migrating a legacy collection with dummy vectors.
+
+        Every API and Celery worker calls this at startup. The checks and the migration
+        run under a lock shared by all of them: the first one migrates, the others wait
+        and then find the alias in place.
+        """
+        if self._is_migrated():
+            return
+
+        with self.migration_lock.hold(exclusive=True):
+            collection_names = [c.name for c in self.client.get_collections().collections]
+            alias_names = [a.alias_name for a in self.client.get_aliases().aliases]
+
+            if self.collection_name in alias_names:
+                # Already migrated: the name is an alias of the vectorless collection
+                return
+
+            if self.collection_name not in collection_names:
+                if self.migrated_name in collection_names:
+                    # A migration stopped between dropping the legacy collection and creating the alias
+                    logger.warning(f"{self.collection_name} is missing; aliasing it to {self.migrated_name}")
+                    self._create_alias()
+                    return
+                logger.info(f"Creating vectorless catalog collection {self.collection_name}")
+                self.client.create_collection(
+                    collection_name=self.collection_name,
+                    vectors_config={}
+                )
+                return
+
+            vectors = self.client.get_collection(self.collection_name).config.params.vectors
+            if isinstance(vectors, qdrant_models.VectorParams) or vectors:
+                self._migrate_to_vectorless()
+
+    def _is_migrated(self) -> bool:
+        """Return whether the catalog name already aliases a collection (the usual case at startup)."""
+        return any(alias.alias_name == self.collection_name for alias in self.client.get_aliases().aliases)
+
+    def _create_alias(self) -> None:
+        """Make the catalog name an alias of the migrated collection."""
+        self.client.update_collection_aliases(
+            change_aliases_operations=[
+                qdrant_models.CreateAliasOperation(
+                    create_alias=qdrant_models.CreateAlias(
+                        collection_name=self.migrated_name,
+                        alias_name=self.collection_name
+                    )
+                )
+            ]
+        )
+
+    def resolve_collection_name(self) -> str:
+        """Return the physical collection behind the catalog name (which may be an alias)."""
+        for alias in self.client.get_aliases().aliases:
+            if alias.alias_name == self.collection_name:
+                return alias.collection_name
+        return self.collection_name
+
+    def migrate_to_vectorless(self) -> Dict[str, Any]:
+        """
+        Copy a legacy catalog collection (with dummy vectors) into a vectorless one.
+
+        Records are copied to '<collection_name>_catalog', resuming from the records an
+        interrupted run already copied. Once the record counts match, the legacy collection
+        is dropped and '<collection_name>' becomes an alias of the new collection, so every
+        reader and writer keeps using the same name. Qdrant does not let an alias shadow an
+        existing collection, so the drop has to come first; ensure_collection repairs a
+        crash between the two steps.
+
+        Returns:
+            Dict with migration results
+        """
+        with self.migration_lock.hold(exclusive=True):
+            if self._is_migrated():
+                return {"status": "success", "copied": 0, "collection_name": self.resolve_collection_name()}
+            return self._migrate_to_vectorless()
+
+    def _migrate_to_vectorless(self) -> Dict[str, Any]:
+        """Run the catalog migration; the caller holds the migration lock."""
+        target_name = self.migrated_name
+        logger.info(f"Migrating catalog collection {self.collection_name} to vectorless collection {target_name}")
+
+        if target_name not in [c.name for c in self.client.get_collections().collections]:
+            self.client.create_collection(collection_name=target_name, vectors_config={})
+
+        with self.write_lock.hold(exclusive=True):
+            # Records copied by an interrupted run are not copied again
+            copied_ids = self._point_ids(target_name)
+            resumed = len(copied_ids)
+            copied = 0
+            offset = None
+            while True:
+                points, offset = self.client.scroll(
+                    collection_name=self.collection_name,
+                    limit=self.page_size,
+                    offset=offset,
+                    with_payload=True,
+                    with_vectors=False
+                )
+                points = [point for point in points if str(point.id) not in copied_ids]
+                if points:
+                    self.client.upsert(
+                        collection_name=target_name,
+                        points=[
+                            qdrant_models.PointStruct(id=point.id, vector={}, payload=point.payload or {})
+                            for point in points
+                        ],
+                        wait=True
+                    )
+                    copied += len(points)
+                if offset is None:
+                    break
+
+            source_count = self.client.count(collection_name=self.collection_name, exact=True).count
+            target_count = self.client.count(collection_name=target_name, exact=True).count
+            if source_count != target_count:
+                raise RuntimeError(
+                    f"Catalog migration copied {target_count} of {source_count} records; "
+                    f"keeping {self.collection_name}"
+                )
+
+            self.client.delete_collection(collection_name=self.collection_name)
+            self._create_alias()
+        logger.info(
+            f"Migrated {copied} catalog records to {target_name} ({resumed} copied by an earlier run), "
+            f"aliased as {self.collection_name}"
+        )
+        return {"status": "success", "copied": copied, "resumed": resumed, "collection_name": target_name}
+
+    def _point_ids(self, collection_name: str) -> set:
+        """Collect the IDs of all records in a collection, as strings."""
+        point_ids = set()
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=collection_name,
+                limit=self.page_size,
+                offset=offset,
+                with_payload=False,
+                with_vectors=False
+            )
+            point_ids.update(str(point.id) for point in points)
+            if offset is None:
+                break
+        return point_ids
+
+    def get(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the catalog record of a document.
+
+        Args:
+            doc_id: Document ID
+
+        Returns:
+            Record payload, or None if the document is not in the catalog
+        """
+        points = self.client.retrieve(
+            collection_name=self.collection_name,
+            ids=[self.point_id(doc_id)],
+            with_payload=True,
+            with_vectors=False
+        )
+        if points:
+            return points[0].payload or {}
+
+        # Records written by older code may not use the deterministic point ID
+        points, _ = self.client.scroll(
+            collection_name=self.collection_name,
+            scroll_filter=self._doc_filter(doc_id),
+            limit=1,
+            with_payload=True,
+            with_vectors=False
+        )
+        return (points[0].payload or {}) if points else None
+
+    def upsert(self, doc_id: str, payload: Dict[str, Any], merge: bool = True, wait: bool = False) -> Dict[str, Any]:
+        """
+        Write the catalog record of a document.
+
+        Args:
+            doc_id: Document ID
+            payload: Record fields
+            merge: Whether to merge into the existing record instead of replacing it
+            wait: Whether to wait for Qdrant to apply the write
+
+        Returns:
+            The stored record
+        """
+        record = {}
+        if merge:
+            record.update(self.get(doc_id) or {})
+        record.update(payload)
+        record["doc_id"] = doc_id
+
+        with self.write_lock.hold(exclusive=False):
+            self.client.upsert(
+                collection_name=self.collection_name,
+                points=[qdrant_models.PointStruct(id=self.point_id(doc_id), vector={}, payload=record)],
+                wait=wait
+            )
+        return record
+
+    def update_fields(self, doc_id: str, wait: bool = False, **fields: Any) -> Dict[str, Any]:
+        """
+        Update some fields of a document's record, keeping the others.
+
+        Args:
+            doc_id: Document ID
+            wait: Whether to wait for Qdrant to apply the write
+            **fields: Fields to set
+
+        Returns:
+            The stored record
+        """
+        return self.upsert(doc_id, fields, merge=True, wait=wait)
+
+    def delete(self, doc_id: str) -> None:
+        """Delete the catalog record(s) of a document."""
+        with self.write_lock.hold(exclusive=False):
+            self.client.delete(
+                collection_name=self.collection_name,
+                points_selector=self._doc_filter(doc_id)
+            )
+
+    def iter_documents(
+        self,
+        scroll_filter: Optional[qdrant_models.Filter] = None,
+        page_size: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream catalog records page by page.
+
+        Args:
+            scroll_filter: Optional payload filter
+            page_size: Records fetched per scroll call (defaults to the catalog page size)
+
+        Yields:
+            Record payloads
+        """
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=scroll_filter,
+                limit=page_size or self.page_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=False
+            )
+            for point in points:
+                if point.payload:
+                    yield point.payload
+            if offset is None:
+                break
+
+    def document_ids(self) -> List[str]:
+        """Return the IDs of all documents in the catalog."""
+        return list(dict.fromkeys(
+            record["doc_id"] for record in self.iter_documents() if record.get("doc_id")
+        ))
+
+    @staticmethod
+    def _doc_filter(doc_id: str) -> qdrant_models.Filter:
+        return qdrant_models.Filter(
+            must=[
+                qdrant_models.FieldCondition(
+                    key="doc_id",
+                    match=qdrant_models.MatchValue(value=doc_id)
+                )
+            ]
+        )
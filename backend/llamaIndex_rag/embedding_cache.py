@@ -0,0 +1,345 @@
+"""
+Embedding cache for the RAG system.
+
+This module wraps a LlamaIndex embedding model with a two-tier cache: an
+in-memory LRU tier local to the process and an on-disk SQLite tier that can be
+shared by every process on the same host (API workers and Celery workers).
+Entries are keyed by (embedding model name, sha256(text)).
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+import hashlib
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EMBEDDING_CACHE_PATH = "/var/cache/regulaite/embeddings.sqlite"
+
+
+class EmbeddingCache:
+    """
+    Two-tier (memory LRU + SQLite) store of embedding vectors.
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        max_memory_entries: int = 10000,
+        max_disk_entries: int = 500000,
+    ):
+        """
+        Initialize the embedding cache.
+
+        Args:
+            db_path: Path of the SQLite file for the on-disk tier (None disables it)
+            max_memory_entries: Maximum number of vectors kept in the in-memory LRU tier
+            max_disk_entries: Maximum number of vectors kept in the on-disk tier
+        """
+        self.db_path = db_path
+        self.max_memory_entries = max(0, max_memory_entries)
+        self.max_disk_entries = max(0, max_disk_entries)
+
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._writes_since_eviction = 0
+
+        # Hit/miss counters
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if db_path:
+            try:
+                os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+                # WAL lets several processes read while one writes
+                self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+                self._conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS embeddings (
+                        model TEXT NOT NULL,
+                        text_hash TEXT NOT NULL,
+                        vector BLOB NOT NULL,
+                        last_access REAL NOT NULL,
+                        PRIMARY KEY (model, text_hash)
+                    )
+                    """
+                )
+                self._conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings (last_access)"
+                )
+                self._conn.commit()
+                logger.info(f"Embedding cache on-disk tier opened at {db_path}")
+            except Exception as e:
+                logger.warning(f"Could not open embedding cache at {db_path}, using memory tier only: {str(e)}")
+                self._conn = None
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        """Return the sha256 hex digest used as the text part of cache keys."""
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Look up cached embeddings for a list of texts.
+
+        Args:
+            model: Embedding model name (cache namespace)
+            texts: Texts to look up
+
+        Returns:
+            List aligned with texts containing the cached vector or None
+        """
+        hashes = [self.text_hash(text) for text in texts]
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        disk_lookups: Dict[str, List[int]] = {}
+
+        with self._lock:
+            for i, text_hash in enumerate(hashes):
+                key = f"{model}:{text_hash}"
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    results[i] = vector
+                    self.memory_hits += 1
+                else:
+                    disk_lookups.setdefault(text_hash, []).append(i)
+
+            if disk_lookups and self._conn is not None:
+                try:
+                    found = self._read_disk(model, list(disk_lookups.keys()))
+                    for text_hash, vector in found.items():
+                        for i in disk_lookups.pop(text_hash):
+                            results[i] = vector
+                            self.disk_hits += 1
+                        self._remember(f"{model}:{text_hash}", vector)
+                except Exception as e:
+                    logger.warning(f"Error reading embedding cache: {str(e)}")
+
+            self.misses += sum(len(indices) for indices in disk_lookups.values())
+
+        return results
+
+    def put_many(self, model: str, texts: List[str], embeddings: List[List[float]]) -> None:
+        """
+        Store embeddings for a list of texts in both tiers.
+
+        Args:
+            model: Embedding model name (cache namespace)
+            texts: Texts that were embedded
+            embeddings: Embeddings aligned with texts
+        """
+        if not texts:
+            return
+
+        now = time.time()
+        rows = []
+        with self._lock:
+            for text, embedding in zip(texts, embeddings):
+                text_hash = self.text_hash(text)
+                vector = [float(v) for v in embedding]
+                self._remember(f"{model}:{text_hash}", vector)
+                rows.append((model, text_hash, np.asarray(vector, dtype=np.float32).tobytes(), now))
+
+            if self._conn is not None:
+                try:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_access) VALUES (?, ?, ?, ?)",
+                        rows
+                    )
+                    self._conn.commit()
+                    self._writes_since_eviction += len(rows)
+                    # Eviction needs a COUNT(*), so only check periodically
+                    if self._writes_since_eviction >= 1000:
+                        self._evict_disk()
+                        self._writes_since_eviction = 0
+                except Exception as e:
+                    logger.warning(f"Error writing embedding cache: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and tier sizes."""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        stats = {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": float((self.memory_hits + self.disk_hits) / lookups) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "max_memory_entries": self.max_memory_entries,
+            "disk_enabled": self._conn is not None,
+            "max_disk_entries": self.max_disk_entries
+        }
+        return stats
+
+    def close(self) -> None:
+        """Close the on-disk tier."""
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.close()
+                except Exception as e:
+                    logger.warning(f"Error closing embedding cache: {str(e)}")
+                self._conn = None
+
+    def _remember(self, key: str, vector: List[float]) -> None:
+        """Insert into the memory tier, evicting least recently used entries. Caller holds the lock."""
+        if self.max_memory_entries == 0:
+            return
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, model: str, text_hashes: List[str]) -> Dict[str, List[float]]:
+        """Fetch vectors from SQLite and refresh their access time. Caller holds the lock."""
+        found = {}
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(text_hashes), 500):
+            batch = text_hashes[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = self._conn.execute(
+                f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                [model, *batch]
+            ).fetchall()
+            for text_hash, blob in rows:
+                found[text_hash] = np.frombuffer(blob, dtype=np.float32).tolist()
+
+        if found:
+            now = time.time()
+            self._conn.executemany(
+                "UPDATE embeddings SET last_access = ? WHERE model = ? AND text_hash = ?",
+                [(now, model, text_hash) for text_hash in found]
+            )
+            self._conn.commit()
+        return found
+
+    def _evict_disk(self) -> None:
+        """Drop the least recently used rows beyond max_disk_entries. Caller holds the lock."""
+        count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        overflow = count - self.max_disk_entries
+        if overflow > 0:
+            self._conn.execute(
+                """
+                DELETE FROM embeddings WHERE rowid IN (
+                    SELECT rowid FROM embeddings ORDER BY last_access ASC LIMIT ?
+                )
+                """,
+                (overflow,)
+            )
+            self._conn.commit()
+            logger.info(f"Evicted {overflow} entries from embedding cache")
+
+
+class CachedEmbedding(BaseEmbedding):
+    """
+    Embedding model wrapper that serves repeated texts from an EmbeddingCache.
+    """
+
+    _base_model: BaseEmbedding = PrivateAttr()
+    _cache: EmbeddingCache = PrivateAttr()
+
+    def __init__(self, base_model: BaseEmbedding, cache: EmbeddingCache, **kwargs: Any):
+        """
+        Initialize the cached embedding model.
+
+        Args:
+            base_model: Embedding model used for cache misses
+            cache: Cache holding previously computed embeddings
+        """
+        super().__init__(
+            model_name=base_model.model_name,
+            embed_batch_size=base_model.embed_batch_size,
+            **kwargs
+        )
+        self._base_model = base_model
+        self._cache = cache
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    @property
+    def cache(self) -> EmbeddingCache:
+        """The underlying embedding cache."""
+        return self._cache
+
+    @property
+    def base_model(self) -> BaseEmbedding:
+        """The wrapped embedding model."""
+        return self._base_model
+
+    def _query_namespace(self) -> str:
+        # Some models embed queries differently from passages, keep them apart
+        return f"{self.model_name}#query"
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        namespace = self._query_namespace()
+        cached = self._cache.get_many(namespace, [query])[0]
+        if cached is not None:
+            return cached
+        embedding = self._base_model.get_query_embedding(query)
+        self._cache.put_many(namespace, [query], [embedding])
+        return embedding
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        namespace = self._query_namespace()
+        cached = self._cache.get_many(namespace, [query])[0]
+        if cached is not None:
+            return cached
+        embedding = await self._base_model.aget_query_embedding(query)
+        self._cache.put_many(namespace, [query], [embedding])
+        return embedding
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return (await self._aget_text_embeddings([text]))[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        results = self._cache.get_many(self.model_name, texts)
+        missing = self._unique_misses(texts, results)
+        if missing:
+            embeddings = self._base_model.get_text_embedding_batch(missing)
+            self._cache.put_many(self.model_name, missing, embeddings)
+            self._fill(texts, results, dict(zip(missing, embeddings)))
+        return results
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        results = self._cache.get_many(self.model_name, texts)
+        missing = self._unique_misses(texts, results)
+        if missing:
+            embeddings = await self._base_model.aget_text_embedding_batch(missing)
+            self._cache.put_many(self.model_name, missing, embeddings)
+            self._fill(texts, results, dict(zip(missing, embeddings)))
+        return results
+
+    @staticmethod
+    def _unique_misses(texts: List[str], results: List[Optional[List[float]]]) -> List[str]:
+        """Texts without a cached vector, each listed once."""
+        return list(dict.fromkeys(text for text, vector in zip(texts, results) if vector is None))
+
+    @staticmethod
+    def _fill(texts: List[str], results: List[Optional[List[float]]], computed: Dict[str, List[float]]) -> None:
+        """Fill the cache misses in results with freshly computed vectors."""
+        for i, text in enumerate(texts):
+            if results[i] is None:
+                results[i] = computed[text]
+
+    def close(self) -> None:
+        """Close the cache and the wrapped model if it supports it."""
+        self._cache.close()
+        if hasattr(self._base_model, "close"):
+            self._base_model.close()
@@ -0,0 +1,377 @@
+"""
+Shared embedding service for the RAG system.
+
+A single server process keeps the embedding model warm and serves every API and
+Celery worker over HTTP, so workers no longer load their own copy of the model.
+Concurrent requests are coalesced into micro-batches before hitting the model.
+
+Run the server with:
+
+    python -m llamaIndex_rag.embedding_service
+
+and point clients at it with the EMBEDDING_SERVICE_URL environment variable.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Any, Optional, Callable, Tuple
+
+import requests
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EMBEDDING_SERVICE_PORT = 8765
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent embedding requests into model-sized batches.
+    """
+
+    def __init__(self, embed_model: BaseEmbedding, max_batch_size: int = 256, max_wait_ms: float = 5.0):
+        """
+        Initialize the batcher.
+
+        Args:
+            embed_model: Embedding model used for all requests
+            max_batch_size: Maximum number of texts sent to the model at once
+            max_wait_ms: How long to wait for more requests before running a partial batch
+        """
+        self.embed_model = embed_model
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._workers: List[asyncio.Task] = []
+
+        # Counters
+        self.requests = 0
+        self.texts = 0
+        self.batches = 0
+
+    def start(self) -> None:
+        """Start one batching loop per request kind. Must run inside the event loop."""
+        for kind in ("text", "query"):
+            self._queues[kind] = asyncio.Queue()
+            self._workers.append(asyncio.create_task(self._run(kind)))
+
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def embed(self, texts: List[str], kind: str = "text") -> List[List[float]]:
+        """
+        Embed texts, sharing model calls with other in-flight requests.
+
+        Args:
+            texts: Texts to embed
+            kind: "text" for passages or "query" for search queries
+
+        Returns:
+            Embeddings aligned with texts
+        """
+        if not texts:
+            return []
+        future = asyncio.get_running_loop().create_future()
+        self.requests += 1
+        self.texts += len(texts)
+        await self._queues[kind].put((texts, future))
+        return await future
+
+    async def _run(self, kind: str) -> None:
+        queue = self._queues[kind]
+        loop = asyncio.get_running_loop()
+        while True:
+            pending: List[Tuple[List[str], asyncio.Future]] = [await queue.get()]
+            size = len(pending[0][0])
+
+            # Give other callers a moment to join the batch
+            deadline = loop.time() + self.max_wait
+            while size < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                pending.append(item)
+                size += len(item[0])
+
+            texts = [text for request_texts, _ in pending for text in request_texts]
+            try:
+                embeddings = await loop.run_in_executor(None, self._embed_sync, texts, kind)
+                self.batches += 1
+                start = 0
+                for request_texts, future in pending:
+                    if not future.done():
+                        future.set_result(embeddings[start:start + len(request_texts)])
+                    start += len(request_texts)
+            except Exception as e:
+                logger.error(f"Error embedding batch of {len(texts)} texts: {str(e)}")
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _embed_sync(self, texts: List[str], kind: str) -> List[List[float]]:
+        embed_batch = self._embed_queries if kind == "query" else self.embed_model.get_text_embedding_batch
+        embeddings = []
+        for start in range(0, len(texts), self.max_batch_size):
+            embeddings.extend(embed_batch(texts[start:start + self.max_batch_size]))
+        return embeddings
+
+    def _embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed a batch of queries in one model call.
+
+        BaseEmbedding only embeds queries one at a time, so the batched call of the
+        underlying model is used where queries get their own treatment (FastEmbed's
+        query prefix), and the passage batch call where they do not (OpenAI, whose
+        query and passage engines are the same model).
+        """
+        fastembed_model = getattr(self.embed_model, "_model", None)
+        if hasattr(fastembed_model, "query_embed"):
+            return [embedding.tolist() for embedding in fastembed_model.query_embed(texts, batch_size=len(texts))]
+        query_engine = getattr(self.embed_model, "_query_engine", None)
+        if query_engine is not None and query_engine == getattr(self.embed_model, "_text_engine", None):
+            return self.embed_model.get_text_embedding_batch(texts)
+        return [self.embed_model.get_query_embedding(text) for text in texts]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "texts": self.texts,
+            "batches": self.batches,
+            "avg_texts_per_batch": float(self.texts / self.batches) if self.batches else 0.0
+        }
+
+
+def load_embedding_model(model_name: str, openai_api_key: Optional[str] = None) -> BaseEmbedding:
+    """Load the embedding model the same way RAGSystem does."""
+    if "openai" in model_name.lower():
+        from llama_index.embeddings.openai import OpenAIEmbedding
+        return OpenAIEmbedding(model=model_name, api_key=openai_api_key)
+    from llama_index.embeddings.fastembed import FastEmbedEmbedding
+    return FastEmbedEmbedding(model_name=model_name)
+
+
+def create_app(model_name: Optional[str] = None, max_batch_size: int = 256, max_wait_ms: float = 5.0):
+    """
+    Build the embedding service FastAPI application.
+
+    Args:
+        model_name: Embedding model to serve (defaults to the EMBEDDING_MODEL environment variable)
+        max_batch_size: Maximum number of texts per model call
+        max_wait_ms: Micro-batching window in milliseconds
+
+    Returns:
+        FastAPI application
+    """
+    from fastapi import FastAPI, HTTPException
+    from pydantic import BaseModel, Field
+
+    model_name = model_name or os.getenv("EMBEDDING_MODEL", DEFAULT_EMBEDDING_MODEL)
+
+    class EmbedRequest(BaseModel):
+        texts: List[str] = Field(..., description="Texts to embed")
+        kind: str = Field("text", description="'text' for passages or 'query' for search queries")
+        model: Optional[str] = Field(None, description="Expected model name, rejected if it differs")
+
+    app = FastAPI(title="RegulAIte embedding service")
+    state: Dict[str, Any] = {}
+
+    @app.on_event("startup")
+    async def startup():
+        logger.info(f"Loading embedding model {model_name}")
+        embed_model = load_embedding_model(model_name, os.getenv("OPENAI_API_KEY"))
+        state["batcher"] = EmbeddingBatcher(embed_model, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+        state["batcher"].start()
+        state["started_at"] = time.time()
+        logger.info(f"Embedding service ready with model {model_name}")
+
+    @app.on_event("shutdown")
+    async def shutdown():
+        if "batcher" in state:
+            await state["batcher"].stop()
+
+    @app.post("/embed")
+    async def embed(request: EmbedRequest):
+        if request.kind not in ("text", "query"):
+            raise HTTPException(status_code=400, detail=f"Unknown embedding kind: {request.kind}")
+        if request.model and request.model != model_name:
+            raise HTTPException(status_code=400, detail=f"Service serves {model_name}, not {request.model}")
+        embeddings = await state["batcher"].embed(request.texts, kind=request.kind)
+        return {"model": model_name, "embeddings": embeddings}
+
+    @app.get("/health")
+    async def health():
+        batcher = state.get("batcher")
+        return {
+            "status": "healthy" if batcher else "starting",
+            "model": model_name,
+            "uptime_seconds": time.time() - state["started_at"] if "started_at" in state else 0.0,
+            "stats": batcher.stats() if batcher else {}
+        }
+
+    return app
+
+
+class RemoteEmbedding(BaseEmbedding):
+    """
+    Client-side embedding model that delegates to the shared embedding service.
+
+    Failed requests are retried with exponential backoff. If the service still cannot
+    be reached and a fallback factory is given, the model is loaded locally so callers
+    keep working, and the service is tried again after a cooldown.
+    """
+
+    _service_url: str = PrivateAttr()
+    _timeout: float = PrivateAttr()
+    _session: requests.Session = PrivateAttr()
+    _fallback_factory: Optional[Callable[[], BaseEmbedding]] = PrivateAttr()
+    _fallback_model: Optional[BaseEmbedding] = PrivateAttr()
+    _fallback_lock: threading.Lock = PrivateAttr()
+    _max_retries: int = PrivateAttr()
+    _retry_backoff: float = PrivateAttr()
+    _retry_after: float = PrivateAttr()
+    _unavailable_until: float = PrivateAttr()
+
+    def __init__(
+        self,
+        service_url: str,
+        model_name: str,
+        timeout: float = 60.0,
+        fallback_factory: Optional[Callable[[], BaseEmbedding]] = None,
+        max_retries: int = 2,
+        retry_backoff: float = 0.5,
+        retry_after: float = 30.0,
+        **kwargs: Any
+    ):
+        """
+        Initialize the remote embedding model.
+
+        Args:
+            service_url: Base URL of the embedding service
+            model_name: Model the service is expected to serve
+            timeout: Request timeout in seconds
+            fallback_factory: Builds a local model if the service is unavailable
+            max_retries: Retries of a failed request before falling back
+            retry_backoff: Delay before the first retry in seconds, doubled for each next one
+            retry_after: Seconds spent on the local model before the service is tried again
+        """
+        super().__init__(model_name=model_name, **kwargs)
+        self._service_url = service_url.rstrip("/")
+        self._timeout = timeout
+        self._session = requests.Session()
+        self._fallback_factory = fallback_factory
+        self._fallback_model = None
+        self._fallback_lock = threading.Lock()
+        self._max_retries = max(0, max_retries)
+        self._retry_backoff = max(0.0, retry_backoff)
+        self._retry_after = max(0.0, retry_after)
+        self._unavailable_until = 0.0
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "RemoteEmbedding"
+
+    def _post(self, texts: List[str], kind: str) -> List[List[float]]:
+        if self._fallback_factory is None or time.time() >= self._unavailable_until:
+            try:
+                embeddings = self._post_with_retries(texts, kind)
+                if self._unavailable_until:
+                    logger.info(f"Embedding service at {self._service_url} is back, leaving the local model")
+                    self._unavailable_until = 0.0
+                return embeddings
+            except requests.RequestException as e:
+                if self._fallback_factory is None:
+                    raise
+                self._unavailable_until = time.time() + self._retry_after
+                logger.warning(
+                    f"Embedding service at {self._service_url} unavailable, using a local model "
+                    f"for the next {self._retry_after:.0f}s: {str(e)}"
+                )
+
+        with self._fallback_lock:
+            if self._fallback_model is None:
+                self._fallback_model = self._fallback_factory()
+
+        if kind == "query":
+            return [self._fallback_model.get_query_embedding(text) for text in texts]
+        return self._fallback_model.get_text_embedding_batch(texts)
+
+    def _post_with_retries(self, texts: List[str], kind: str) -> List[List[float]]:
+        """Call the service, retrying connection errors, timeouts and 5xx responses with backoff."""
+        attempt = 0
+        while True:
+            try:
+                response = self._session.post(
+                    f"{self._service_url}/embed",
+                    json={"texts": texts, "kind": kind, "model": self.model_name},
+                    timeout=self._timeout
+                )
+                response.raise_for_status()
+                return response.json()["embeddings"]
+            except requests.RequestException as e:
+                status = e.response.status_code if e.response is not None else None
+                # A 4xx (such as a model mismatch) will not go away on retry
+                if attempt >= self._max_retries or (status is not None and status < 500):
+                    raise
+                delay = self._retry_backoff * (2 ** attempt)
+                attempt += 1
+                logger.info(f"Embedding service request failed ({str(e)}), retry {attempt}/{self._max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._post([query], "query")[0]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return await asyncio.to_thread(self._get_query_embedding, query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._post([text], "text")[0]
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return await asyncio.to_thread(self._get_text_embedding, text)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._post(texts, "text")
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.to_thread(self._get_text_embeddings, texts)
+
+    def close(self) -> None:
+        """Close the HTTP session."""
+        self._session.close()
+
+
+def main() -> None:
+    import uvicorn
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    app = create_app(
+        max_batch_size=int(os.getenv("EMBEDDING_SERVICE_BATCH_SIZE", "256")),
+        max_wait_ms=float(os.getenv("EMBEDDING_SERVICE_MAX_WAIT_MS", "5")),
+    )
+    # A single worker: the whole point is one warm copy of the model
+    uvicorn.run(
+        app,
+        host=os.getenv("EMBEDDING_SERVICE_HOST", "127.0.0.1"),
+        port=int(os.getenv("EMBEDDING_SERVICE_PORT", str(DEFAULT_EMBEDDING_SERVICE_PORT))),
+        workers=1
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Advisory file locks shared by the API workers and the Celery worker.
+
+Lock files live on the shared cache volume, so every process indexing into the
+same Qdrant collections sees them. They are flock locks: the kernel releases
+them when the holder exits, so a crashed run never leaves a stale lock behind.
+Each acquisition opens its own file descriptor, which makes the lock exclusive
+between threads of one process as well as between processes.
+"""
+
+import fcntl
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOCK_DIR = "/var/cache/regulaite/locks"
+
+
+class LockBusy(RuntimeError):
+    """Raised when a non-blocking acquisition finds the lock held elsewhere."""
+
+
+class FileLock:
+    """
+    Shared/exclusive lock on a file, usable across processes.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Initialize the lock.
+
+        Args:
+            path: Lock file (None, or a path that cannot be opened, falls back to a
+                process-local lock where shared holds do not exclude anything)
+        """
+        self.path = path
+        self._local = threading.Lock()
+        if path:
+            try:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            except Exception as e:
+                logger.warning(f"Could not create lock directory for {path}: {str(e)}")
+
+    def _open(self) -> Optional[int]:
+        """Open a new descriptor on the lock file, or None to use the process-local lock."""
+        if not self.path:
+            return None
+        try:
+            return os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        except Exception as e:
+            logger.warning(f"Could not open lock file {self.path}, locking in this process only: {str(e)}")
+            return None
+
+    def acquire(self, exclusive: bool = True, blocking: bool = True) -> Optional[int]:
+        """
+        Take the lock until release is called, possibly from another thread.
+
+        Args:
+            exclusive: Whether to exclude every other holder (otherwise only exclusive ones)
+            blocking: Whether to wait for the lock instead of raising LockBusy
+
+        Returns:
+            Handle to pass to release
+
+        Raises:
+            LockBusy: If blocking is False and the lock is held elsewhere
+        """
+        fd = self._open()
+        if fd is None:
+            if exclusive and not self._local.acquire(blocking=blocking):
+                raise LockBusy(f"Lock {self.path or id(self)} is held")
+            return -1 if exclusive else None
+
+        flags = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+        if not blocking:
+            flags |= fcntl.LOCK_NB
+        try:
+            fcntl.flock(fd, flags)
+        except BlockingIOError:
+            os.close(fd)
+            raise LockBusy(f"Lock {self.path} is held")
+        except Exception:
+            os.close(fd)
+            raise
+        return fd
+
+    def release(self, handle: Optional[int]) -> None:
+        """Release a lock taken with acquire."""
+        if handle is None:
+            return
+        if handle == -1:
+            self._local.release()
+            return
+        try:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+        finally:
+            os.close(handle)
+
+    @contextmanager
+    def hold(self, exclusive: bool = True, blocking: bool = True) -> Iterator[None]:
+        """
+        Hold the lock for the duration of a with block.
+
+        Args:
+            exclusive: Whether to exclude every other holder (otherwise only exclusive ones)
+            blocking: Whether to wait for the lock instead of raising LockBusy
+
+        Raises:
+            LockBusy: If blocking is False and the lock is held elsewhere
+        """
+        handle = self.acquire(exclusive=exclusive, blocking=blocking)
+        try:
+            yield
+        finally:
+            self.release(handle)
+
+    def is_locked(self) -> bool:
+        """Return whether some process holds the lock exclusively."""
+        fd = self._open()
+        if fd is None:
+            return self._local.locked()
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return True
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            return False
+        finally:
+            os.close(fd)
+
+
+def lock_path(name: str, lock_dir: Optional[str] = None) -> str:
+    """Return the path of a named lock file in the shared lock directory."""
+    return os.path.join(lock_dir or os.getenv("RAG_LOCK_DIR", DEFAULT_LOCK_DIR), f"{name}.lock")
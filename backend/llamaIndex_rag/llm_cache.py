@@ -0,0 +1,185 @@
+"""
+Exact-match response cache for deterministic LLM prompts.
+
+Auxiliary prompts (query reformulation, relevance and consistency ratings) are
+rendered from fixed templates and sent at low temperature, so the same prompt
+gets the same answer. Responses are cached under (model, template id, sha256 of
+the rendered prompt, temperature) in two tiers: an in-memory LRU tier local to
+the process and a Redis tier shared with the Celery workers. Hits and misses
+are counted per template id, i.e. per call site.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LLM_CACHE_TTL_SECONDS = 24 * 3600
+
+# Seconds to wait before retrying Redis after a connection error
+_REDIS_RETRY_SECONDS = 30.0
+
+
+class LLMResponseCache:
+    """
+    Two-tier (memory LRU + Redis) store of LLM response texts.
+    """
+
+    def __init__(
+        self,
+        redis_url: Optional[str] = None,
+        ttl_seconds: float = DEFAULT_LLM_CACHE_TTL_SECONDS,
+        max_memory_entries: int = 2000,
+        namespace: str = "regulaite:llm"
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            redis_url: URL of the shared Redis tier (None uses the memory tier only)
+            ttl_seconds: Lifetime of an entry in both tiers
+            max_memory_entries: Maximum number of responses kept in the memory tier
+            namespace: Prefix of the Redis keys
+        """
+        self.redis_url = redis_url
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_entries = max(0, max_memory_entries)
+        self.namespace = namespace
+
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis: Any = None
+        self._redis_failed_at: Optional[float] = None
+
+        # Hit/miss counters per template id
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def key(self, model: str, template_id: str, prompt: str, temperature: float) -> str:
+        """Return the cache key of a rendered prompt."""
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return f"{self.namespace}:{template_id}:{model}:{temperature}:{prompt_hash}"
+
+    def get(self, model: str, template_id: str, prompt: str, temperature: float) -> Optional[str]:
+        """Look up the response to one prompt."""
+        return self.get_many(model, template_id, [prompt], temperature)[0]
+
+    def get_many(self, model: str, template_id: str, prompts: List[str], temperature: float) -> List[Optional[str]]:
+        """
+        Look up the responses to several prompts of one call site.
+
+        Args:
+            model: LLM model name
+            template_id: Identifier of the prompt template (the call site)
+            prompts: Rendered prompts
+            temperature: Sampling temperature
+
+        Returns:
+            List aligned with prompts containing the cached response or None
+        """
+        keys = [self.key(model, template_id, prompt, temperature) for prompt in prompts]
+        results: List[Optional[str]] = [None] * len(keys)
+        redis_lookups = []
+
+        now = time.time()
+        with self._lock:
+            counters = self._counters.setdefault(template_id, {"memory_hits": 0, "redis_hits": 0, "misses": 0})
+            for i, key in enumerate(keys):
+                entry = self._memory.get(key)
+                if entry is not None and entry[0] > now:
+                    self._memory.move_to_end(key)
+                    results[i] = entry[1]
+                    counters["memory_hits"] += 1
+                else:
+                    redis_lookups.append(i)
+
+        client = self._get_redis() if redis_lookups else None
+        if client is not None:
+            try:
+                values = client.mget([keys[i] for i in redis_lookups])
+                found = []
+                for i, value in zip(redis_lookups, values):
+                    if value is not None:
+                        results[i] = value.decode("utf-8") if isinstance(value, bytes) else value
+                        found.append(i)
+                with self._lock:
+                    for i in found:
+                        self._remember(keys[i], results[i])
+                    counters["redis_hits"] += len(found)
+                redis_lookups = [i for i in redis_lookups if results[i] is None]
+            except Exception as e:
+                self._redis_error(e)
+
+        with self._lock:
+            counters["misses"] += len(redis_lookups)
+        return results
+
+    def put(self, model: str, template_id: str, prompt: str, temperature: float, response: str) -> None:
+        """
+        Store the response to a prompt in both tiers.
+
+        Args:
+            model: LLM model name
+            template_id: Identifier of the prompt template (the call site)
+            prompt: Rendered prompt
+            temperature: Sampling temperature
+            response: Response text
+        """
+        key = self.key(model, template_id, prompt, temperature)
+        with self._lock:
+            self._remember(key, response)
+
+        client = self._get_redis()
+        if client is not None:
+            try:
+                client.setex(key, int(self.ttl_seconds), response)
+            except Exception as e:
+                self._redis_error(e)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and hit rates per call site."""
+        with self._lock:
+            call_sites = {}
+            for template_id, counters in self._counters.items():
+                lookups = sum(counters.values())
+                hits = counters["memory_hits"] + counters["redis_hits"]
+                call_sites[template_id] = dict(counters, hit_rate=float(hits / lookups) if lookups else 0.0)
+            return {
+                "call_sites": call_sites,
+                "memory_entries": len(self._memory),
+                "max_memory_entries": self.max_memory_entries,
+                "redis_enabled": self.redis_url is not None,
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+    def _remember(self, key: str, response: str) -> None:
+        """Insert into the memory tier, evicting least recently used entries. Caller holds the lock."""
+        if self.max_memory_entries == 0:
+            return
+        self._memory[key] = (time.time() + self.ttl_seconds, response)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _get_redis(self) -> Any:
+        """Return the Redis client, or None when disabled or recently unreachable."""
+        if not self.redis_url:
+            return None
+        if self._redis_failed_at is not None and time.time() - self._redis_failed_at < _REDIS_RETRY_SECONDS:
+            return None
+        if self._redis is None:
+            try:
+                import redis
+                self._redis = redis.Redis.from_url(self.redis_url, socket_timeout=0.5, socket_connect_timeout=0.5)
+            except Exception as e:
+                self._redis_error(e)
+                return None
+        return self._redis
+
+    def _redis_error(self, error: Exception) -> None:
+        # Keep serving from memory; Redis is retried after a pause
+        logger.warning(f"LLM cache Redis tier unavailable: {str(error)}")
+        self._redis_failed_at = time.time()
@@ -0,0 +1,148 @@
+"""
+Concurrent, time-budgeted LLM scoring for the RAG system.
+
+Stages that ask the LLM for a numeric rating (passage relevance, statement
+consistency) send all their prompts at once through the async LLM API, bounded by
+a concurrency limit. Each stage gets a wall-clock budget: prompts still running
+when it expires are cancelled and reported as None, so callers can fall back to
+their embedding score instead of waiting for the slowest call. Responses are
+cached per template when an LLMResponseCache is given, so repeated ratings skip
+the LLM entirely.
+"""
+
+import asyncio
+import logging
+import re
+import threading
+import time
+from typing import List, Any, Optional
+
+from llamaIndex_rag.llm_cache import LLMResponseCache
+
+logger = logging.getLogger(__name__)
+
+_SCORE_PATTERN = re.compile(r'(\d+(\.\d+)?)')
+
+
+class BudgetedLLMScorer:
+    """
+    Runs batches of scoring prompts concurrently under a concurrency limit and a time budget.
+    """
+
+    def __init__(
+        self,
+        llm: Any,
+        max_concurrency: int = 4,
+        budget_seconds: float = 10.0,
+        temperature: float = 0.1,
+        cache: Optional[LLMResponseCache] = None
+    ):
+        """
+        Initialize the scorer.
+
+        Args:
+            llm: LlamaIndex LLM exposing acomplete
+            max_concurrency: Maximum number of LLM calls in flight per batch
+            budget_seconds: Wall-clock budget of one batch
+            temperature: Sampling temperature of the scoring calls
+            cache: Response cache for prompts scored with a template id
+        """
+        self.llm = llm
+        self.max_concurrency = max(1, max_concurrency)
+        self.budget_seconds = budget_seconds
+        self.temperature = temperature
+        self.cache = cache
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+
+    async def ascore(
+        self,
+        prompts: List[str],
+        budget_seconds: Optional[float] = None,
+        template_id: Optional[str] = None
+    ) -> List[Optional[float]]:
+        """
+        Score prompts concurrently.
+
+        Args:
+            prompts: Prompts asking for a numeric rating
+            budget_seconds: Budget of this batch (defaults to the scorer budget)
+            template_id: Identifier of the prompt template; enables the response cache
+
+        Returns:
+            The first number in each response, or None for prompts that failed,
+            returned no number or did not finish within the budget
+        """
+        if not prompts:
+            return []
+        budget = self.budget_seconds if budget_seconds is None else budget_seconds
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        model = getattr(self.llm, "model", "")
+        use_cache = self.cache is not None and template_id is not None
+
+        async def complete_one(prompt: str) -> str:
+            async with semaphore:
+                response = await self.llm.acomplete(prompt, temperature=self.temperature)
+            response_text = response.text if hasattr(response, 'text') else str(response)
+            if use_cache:
+                self.cache.put(model, template_id, prompt, self.temperature, response_text)
+            return response_text
+
+        start = time.time()
+        responses: List[Optional[str]] = [None] * len(prompts)
+        if use_cache:
+            responses = self.cache.get_many(model, template_id, prompts, self.temperature)
+
+        tasks = {i: asyncio.ensure_future(complete_one(prompt)) for i, prompt in enumerate(prompts) if responses[i] is None}
+        if tasks:
+            done, pending = await asyncio.wait(list(tasks.values()), timeout=budget)
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+                logger.info(f"LLM scoring budget of {budget}s exhausted, {len(pending)}/{len(tasks)} calls unfinished")
+
+            for i, task in tasks.items():
+                if task in done and task.exception() is None:
+                    responses[i] = task.result()
+                elif task in done:
+                    logger.warning(f"Error in LLM scoring call: {str(task.exception())}")
+
+        scores = []
+        for response_text in responses:
+            score_match = _SCORE_PATTERN.search(response_text) if response_text is not None else None
+            scores.append(float(score_match.group(1)) if score_match else None)
+        logger.debug(f"Scored {len(prompts)} prompts ({len(prompts) - len(tasks)} cached) in {time.time() - start:.2f}s")
+        return scores
+
+    def score(
+        self,
+        prompts: List[str],
+        budget_seconds: Optional[float] = None,
+        template_id: Optional[str] = None
+    ) -> List[Optional[float]]:
+        """
+        Synchronous wrapper around ascore for the sync retrieval and verification code.
+
+        The batch runs on a dedicated background event loop, so this works whether or
+        not the caller is itself inside an event loop, and the LLM's async HTTP client
+        always stays bound to the same loop.
+        """
+        if not prompts:
+            return []
+        future = asyncio.run_coroutine_threadsafe(self.ascore(prompts, budget_seconds, template_id), self._get_loop())
+        return future.result()
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="llm-scoring", daemon=True).start()
+            return self._loop
+
+    def close(self) -> None:
+        """Stop the background event loop."""
+        with self._loop_lock:
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._loop = None
@@ -0,0 +1,237 @@
+"""
+Semantic query cache for the RAG query engine.
+
+Queries whose embedding is within a cosine threshold of a cached query, asked
+with the same filters and settings, reuse the cached retrieval (and optionally
+the cached answer) instead of running the pipeline again. Cached values are kept
+pickled: every hit gets its own copy of the nodes, so callers annotating them do
+not change the cache, and the cache is capped by the bytes it holds as well as
+by its number of entries. Every entry records
+the index generation it was computed at; indexing or deleting a document bumps
+the generation, which invalidates all entries. The generation lives in a small
+SQLite file so that Celery workers indexing documents invalidate the caches of
+the API workers.
+"""
+
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_GENERATION_PATH = "/var/cache/regulaite/index_generation.sqlite"
+
+
+class IndexGeneration:
+    """
+    Counter bumped whenever the document index changes, shared across processes.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        """
+        Initialize the counter.
+
+        Args:
+            db_path: Path of the SQLite file holding the counter (None keeps it in memory,
+                local to this process)
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._local_generation = 0
+
+        if db_path:
+            try:
+                os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+                self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+                self._conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0)")
+                self._conn.commit()
+            except Exception as e:
+                logger.warning(f"Could not open index generation at {db_path}, using a process-local counter: {str(e)}")
+                self._conn = None
+
+    def current(self) -> int:
+        """Return the current generation."""
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    row = self._conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+                    return int(row[0]) if row else 0
+                except Exception as e:
+                    logger.warning(f"Error reading index generation: {str(e)}")
+            return self._local_generation
+
+    def bump(self) -> None:
+        """Record an index change."""
+        with self._lock:
+            self._local_generation += 1
+            if self._conn is not None:
+                try:
+                    self._conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+                    self._conn.commit()
+                except Exception as e:
+                    logger.warning(f"Error bumping index generation: {str(e)}")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class SemanticQueryCache:
+    """
+    In-memory cache of query results looked up by embedding similarity.
+    """
+
+    def __init__(
+        self,
+        similarity_threshold: float = 0.95,
+        ttl_seconds: float = 3600.0,
+        max_entries: int = 1000,
+        max_bytes: int = 256 * 1024 * 1024
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            similarity_threshold: Minimum cosine similarity between a query and a cached query
+            ttl_seconds: Lifetime of an entry
+            max_entries: Maximum number of entries; the least recently used are evicted
+            max_bytes: Maximum size of the cached values and embeddings; the least
+                recently used entries are evicted
+        """
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(0, max_entries)
+        self.max_bytes = max(0, max_bytes)
+        self._bytes = 0
+
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._next_id = 0
+        self._generation: Optional[int] = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def lookup(self, embedding: List[float], cache_key: str, generation: int) -> Optional[Dict[str, Any]]:
+        """
+        Find the most similar cached query with the same cache key.
+
+        Args:
+            embedding: Query embedding
+            cache_key: Filters and settings the result depends on
+            generation: Current index generation
+
+        Returns:
+            The cached entry with its "similarity", or None
+        """
+        with self._lock:
+            self._sync_generation(generation)
+            now = time.time()
+            for entry_id in [i for i, entry in self._entries.items() if entry["expires_at"] <= now]:
+                self._remove(entry_id)
+
+            candidates = [(i, entry) for i, entry in self._entries.items() if entry["cache_key"] == cache_key]
+            if candidates:
+                matrix = np.stack([entry["embedding"] for _, entry in candidates])
+                similarities = matrix @ self._normalize(embedding)
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    entry_id, entry = candidates[best]
+                    self._entries.move_to_end(entry_id)
+                    self.hits += 1
+                    return dict(pickle.loads(entry["values"]), similarity=float(similarities[best]))
+
+            self.misses += 1
+            return None
+
+    def store(self, embedding: List[float], cache_key: str, generation: int, **values: Any) -> None:
+        """
+        Cache values computed for a query.
+
+        Args:
+            embedding: Query embedding
+            cache_key: Filters and settings the values depend on
+            generation: Index generation the values were computed at
+            **values: Cached values (e.g. retrieval, result), which must be picklable
+        """
+        if self.max_entries == 0 or self.max_bytes == 0:
+            return
+        try:
+            blob = pickle.dumps(values, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            logger.warning(f"Could not cache query result: {str(e)}")
+            return
+        vector = self._normalize(embedding)
+        size = len(blob) + vector.nbytes
+        if size > self.max_bytes:
+            logger.info(f"Query result of {size} bytes exceeds the query cache size, not caching it")
+            return
+        with self._lock:
+            self._sync_generation(generation)
+            if generation != self._generation:
+                # Computed against an index that has changed since
+                return
+            self._entries[self._next_id] = {
+                "values": blob,
+                "embedding": vector,
+                "cache_key": cache_key,
+                "expires_at": time.time() + self.ttl_seconds,
+                "size": size,
+            }
+            self._bytes += size
+            self._next_id += 1
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, entry_id: int) -> None:
+        """Drop one entry. Caller holds the lock."""
+        self._bytes -= self._entries.pop(entry_id)["size"]
+
+    def invalidate(self) -> None:
+        """Drop every entry."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _sync_generation(self, generation: int) -> None:
+        """Drop every entry when the index generation moved forward. Caller holds the lock."""
+        if self._generation is None or generation > self._generation:
+            if self._entries:
+                logger.info(f"Index generation is now {generation}, dropping {len(self._entries)} cached queries")
+            self._entries.clear()
+            self._bytes = 0
+            self._generation = generation
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the number of entries."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": float(self.hits / lookups) if lookups else 0.0,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "similarity_threshold": self.similarity_threshold,
+            "ttl_seconds": self.ttl_seconds,
+            "generation": self._generation,
+        }
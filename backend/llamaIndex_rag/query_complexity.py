@@ -0,0 +1,156 @@
+"""
+Local query complexity classifier.
+
+Queries are classified as "low", "medium" or "high" complexity from a few
+surface features (length, number of questions and sentences, analytical
+keywords), in well under a millisecond. Each decision comes with a confidence:
+the distance from the query to the nearest rule boundary, so a 13-word query
+barely above the "medium" length threshold is ambiguous while a 40-word
+comparison is not. Callers may send only ambiguous queries to an LLM; those
+decisions are recorded next to the local ones so the rules can be tuned
+against them.
+"""
+
+import logging
+import re
+import threading
+from collections import Counter
+from typing import Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+COMPLEXITY_LEVELS = ("low", "medium", "high")
+
+# Words announcing an analytical question (matched as word prefixes)
+COMPLEX_INDICATORS = (
+    "compar", "contrast", "analy", "explain", "why", "how",
+    "relationship", "difference", "similarit", "advantage", "disadvantage", "detailed",
+    "expliqu", "pourquoi", "comment", "différence", "avantage", "inconvénient",
+)
+COMPLEX_PHRASES = ("pros and cons", "step by step", "étape par étape")
+
+# Rule thresholds: word counts above which a query is medium or high complexity
+MEDIUM_WORD_COUNT = 12
+HIGH_WORD_COUNT = 25
+
+_WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+class QueryComplexityClassifier:
+    """
+    Rule-based complexity classifier with a confidence for each decision.
+    """
+
+    def __init__(self, confidence_threshold: float = 0.6):
+        """
+        Initialize the classifier.
+
+        Args:
+            confidence_threshold: Decisions below this confidence (0.5-1) are ambiguous
+        """
+        self.confidence_threshold = confidence_threshold
+        self._lock = threading.Lock()
+        self._decisions: Counter = Counter()
+        self._ambiguous = 0
+        # Local label -> LLM label counts for ambiguous queries sent to the LLM
+        self._llm_decisions: Counter = Counter()
+
+    @staticmethod
+    def features(query: str) -> Dict[str, int]:
+        """Extract the surface features the rules look at."""
+        lowered = query.lower()
+        words = _WORD_PATTERN.findall(lowered)
+        indicators = sum(1 for word in words if word.startswith(COMPLEX_INDICATORS))
+        indicators += sum(1 for phrase in COMPLEX_PHRASES if phrase in lowered)
+        return {
+            "words": len(words),
+            "question_marks": query.count("?"),
+            "sentences": max(1, len([s for s in re.split(r"[.;!?]", query) if s.strip()])),
+            "indicators": indicators,
+        }
+
+    def classify(self, query: str) -> Tuple[str, float]:
+        """
+        Classify a query.
+
+        Args:
+            query: The query text
+
+        Returns:
+            Tuple of (complexity level, confidence between 0.5 and 1)
+        """
+        f = self.features(query)
+        words = f["words"]
+
+        # Margins are in [0, 1]: how clearly each rule holds (or fails)
+        high_margins = [
+            min(1.0, (words - HIGH_WORD_COUNT) / 10.0) if words > HIGH_WORD_COUNT else 0.0,
+            1.0 if f["question_marks"] > 1 else 0.0,
+            min(1.0, (f["indicators"] - 1) / 2.0) if f["indicators"] >= 2 else 0.0,
+        ]
+        medium_margins = [
+            min(1.0, (words - MEDIUM_WORD_COUNT) / 6.0) if words > MEDIUM_WORD_COUNT else 0.0,
+            1.0 if f["sentences"] > 1 else 0.0,
+            0.5 if f["indicators"] >= 1 else 0.0,
+        ]
+
+        if max(high_margins) > 0:
+            level = "high"
+            margin = max(high_margins)
+        elif max(medium_margins) > 0:
+            level = "medium"
+            # A medium query is ambiguous if close to either boundary
+            to_high = min(1.0, (HIGH_WORD_COUNT - words) / 6.0)
+            if f["indicators"] == 1:
+                to_high = min(to_high, 0.5)
+            margin = min(max(medium_margins), to_high)
+        else:
+            level = "low"
+            margin = min(1.0, (MEDIUM_WORD_COUNT - words) / 6.0)
+
+        confidence = round(0.5 + 0.5 * max(0.0, margin), 3)
+        with self._lock:
+            self._decisions[level] += 1
+            if confidence < self.confidence_threshold:
+                self._ambiguous += 1
+        return level, confidence
+
+    def is_ambiguous(self, confidence: float) -> bool:
+        """Return whether a decision is too uncertain to act on without a second opinion."""
+        return confidence < self.confidence_threshold
+
+    def record_llm_decision(self, query: str, local_level: str, confidence: float, llm_level: str) -> None:
+        """
+        Record the LLM's decision for an ambiguous query, to tune the rules against.
+
+        Args:
+            query: The query text
+            local_level: Level picked by the rules
+            confidence: Confidence of the rules
+            llm_level: Level picked by the LLM
+        """
+        with self._lock:
+            self._llm_decisions[(local_level, llm_level)] += 1
+        logger.info(
+            f"Query complexity: rules said {local_level} ({confidence:.2f}), LLM said {llm_level}, "
+            f"features {self.features(query)}"
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Return decision counts and the agreement of the rules with the LLM on ambiguous queries."""
+        with self._lock:
+            llm_total = sum(self._llm_decisions.values())
+            agreed = sum(count for (local, llm), count in self._llm_decisions.items() if local == llm)
+            return {
+                "decisions": dict(self._decisions),
+                "ambiguous": self._ambiguous,
+                "confidence_threshold": self.confidence_threshold,
+                "llm_decisions": {f"{local}->{llm}": count for (local, llm), count in self._llm_decisions.items()},
+                "llm_agreement": float(agreed / llm_total) if llm_total else None,
+            }
+
+
+def parse_complexity_level(text: str) -> Optional[str]:
+    """Return the first complexity level named in an LLM response, if any."""
+    match = re.search(r"\b(low|medium|high)\b", text.lower())
+    return match.group(1) if match else None
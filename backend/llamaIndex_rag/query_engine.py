@@ -7,8 +7,11 @@ with features to generate reliable, accurate responses and detect hallucinations
 
 import logging
 import asyncio
+import functools
 import json
-from typing import Dict, List, Any, Optional, Tuple, Union, Callable
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple, Union, Callable, AsyncIterator
 import re
 import numpy as np
 
@@ -32,6 +35,10 @@ from llama_index.core.evaluation import (
 
 # Local imports
 from llamaIndex_rag.rag import RAGSystem
+from llamaIndex_rag.deadline import QueryDeadline, StageLatencyTracker
+from llamaIndex_rag.query_cache import SemanticQueryCache
+from llamaIndex_rag.query_complexity import QueryComplexityClassifier, parse_complexity_level
+from llamaIndex_rag.cross_encoder import DEFAULT_RERANKER
 
 logger = logging.getLogger(__name__)
 
@@ -108,6 +115,18 @@ Please reformulate the original query to make it more effective for information
 FORMAT YOUR RESPONSE AS A JSON ARRAY OF STRINGS, CONTAINING THE REFORMULATED QUERIES ONLY:
 """
 
+# Template for classifying queries the local complexity rules are unsure about
+QUERY_COMPLEXITY_TEMPLATE = """Classify the complexity of the following query to a document retrieval system.
+
+QUERY: {query}
+
+- low: a single factual question answered by one passage
+- medium: a question needing a few passages or some explanation
+- high: a comparison, analysis or multi-part question needing many passages
+
+Answer with one word: low, medium or high.
+"""
+
 # Template for source attribution and verification
 SOURCE_ATTRIBUTION_TEMPLATE = """You are an AI assistant that provides trustworthy answers with proper source attribution.
 
@@ -139,7 +158,16 @@ class RAGQueryEngine:
         max_tokens: int = 2048,
         streaming: bool = False,
         default_prompt: Optional[str] = None,
-        use_self_critique: bool = True
+        use_self_critique: bool = True,
+        use_query_cache: bool = True,
+        query_cache_threshold: float = 0.95,
+        query_cache_ttl_seconds: float = 3600.0,
+        query_cache_max_entries: int = 1000,
+        query_cache_max_mb: float = 256.0,
+        cache_answers: bool = False,
+        sync_workers: int = 8,
+        complexity_confidence_threshold: float = 0.6,
+        complexity_llm_fallback: bool = False
     ):
         """
         Initialize RAG query engine.
@@ -152,6 +180,18 @@ class RAGQueryEngine:
             streaming: Whether to stream responses by default
             default_prompt: Default prompt template to use for responses
             use_self_critique: Whether to use self-critique for hallucination reduction
+            use_query_cache: Whether to reuse the retrieval of near-identical earlier queries
+            query_cache_threshold: Minimum cosine similarity for a cached query to be reused
+            query_cache_ttl_seconds: Lifetime of cached queries
+            query_cache_max_entries: Maximum number of cached queries
+            query_cache_max_mb: Maximum size of the cached query results, in megabytes
+            cache_answers: Whether cache hits also reuse the generated answer
+            sync_workers: Threads running the synchronous retrieval, embedding and
+                verification work, so it never blocks the event loop
+            complexity_confidence_threshold: Confidence below which the local query
+                complexity decision is ambiguous
+            complexity_llm_fallback: Whether ambiguous complexity decisions are settled
+                by the LLM
         """
         self.rag_system = rag_system
         self.model_name = model_name
@@ -178,6 +218,7 @@ class RAGQueryEngine:
         self.uncertainty_prompt = PromptTemplate(UNCERTAINTY_TEMPLATE)
         self.query_reformulation_prompt = PromptTemplate(QUERY_REFORMULATION_TEMPLATE)
         self.source_attribution_prompt = PromptTemplate(SOURCE_ATTRIBUTION_TEMPLATE)
+        self.query_complexity_prompt = PromptTemplate(QUERY_COMPLEXITY_TEMPLATE)
         
         # Initialize self critique
         self.use_self_critique = use_self_critique
@@ -187,8 +228,45 @@ class RAGQueryEngine:
         self.use_multi_retrieval = True
         self.use_source_attribution = True
         
+        # Query complexity is decided locally; only ambiguous queries may go to the LLM
+        self.complexity_classifier = QueryComplexityClassifier(complexity_confidence_threshold)
+        self.complexity_llm_fallback = complexity_llm_fallback
+        
+        # Observed stage durations, used to fit optional stages into request deadlines
+        self.stage_latency = StageLatencyTracker()
+        
+        # Invalidated through the RAG system's index generation
+        self.query_cache = None
+        if use_query_cache:
+            self.query_cache = SemanticQueryCache(
+                similarity_threshold=query_cache_threshold,
+                ttl_seconds=query_cache_ttl_seconds,
+                max_entries=query_cache_max_entries,
+                max_bytes=int(query_cache_max_mb * 1024 * 1024)
+            )
+        self.cache_answers = cache_answers
+        
+        # LLM calls are awaited natively; blocking work is bounded by this pool
+        self._sync_executor = ThreadPoolExecutor(max_workers=max(1, sync_workers), thread_name_prefix="rag-query")
+        
         logger.info(f"Enhanced RAG query engine initialized with model: {model_name}, temperature: {temperature}")
     
+    async def _run_sync(self, func: Callable, *args: Any, **kwargs: Any) -> Any:
+        """Run blocking retrieval or embedding work on the bounded executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._sync_executor, functools.partial(func, *args, **kwargs))
+    
+    async def _acomplete(self, prompt: str) -> str:
+        """Complete a prompt without blocking the event loop."""
+        response = await self.llm.acomplete(prompt)
+        return response.text if hasattr(response, 'text') else str(response)
+    
+    async def _astream_complete(self, prompt: str) -> AsyncIterator[str]:
+        """Stream the completion of a prompt, yielding text deltas."""
+        async for response in await self.llm.astream_complete(prompt):
+            if response.delta:
+                yield response.delta
+    
     def update_model(
         self,
         model_name: Optional[str] = None,
@@ -226,7 +304,10 @@ class RAGQueryEngine:
         custom_prompt: Optional[str] = None,
         streaming: Optional[bool] = True,
         return_contexts: bool = True,
-        use_self_critique: bool = True
+        use_self_critique: bool = True,
+        reranker: Optional[str] = None,
+        deadline_ms: Optional[float] = None,
+        use_cache: bool = True
     ) -> Dict[str, Any]:
         """
         Query the RAG system with reliable RAG techniques.
@@ -236,9 +317,14 @@ class RAGQueryEngine:
             top_k: Number of context chunks to retrieve
             search_filter: Metadata filters for retrieval
             custom_prompt: Custom prompt template for response
-            streaming: Whether to stream the response
+            streaming: Ignored; use stream_query to stream the answer
             return_contexts: Whether to return context in response
             use_self_critique: Whether to use self-critique for hallucination reduction
+            reranker: Relevance reranking mode ("cross_encoder", "llm" or "none"),
+                defaults to the RAG system setting
+            deadline_ms: Latency budget; optional stages (reformulation, LLM reranking,
+                self-critique, hallucination checks) are skipped in that order to meet it
+            use_cache: Whether this query may be served from, and stored in, the query cache
             
         Returns:
             Dict with query results, including answer and metadata
@@ -246,91 +332,45 @@ class RAGQueryEngine:
         try:
             start_time = asyncio.get_event_loop().time()
             
-            # Step 1: Query Reformulation (if enabled)
-            reformulated_queries = []
-            if self.use_query_reformulation:
-                reformulated_queries = await self._reformulate_query(query_text)
-                logger.info(f"Reformulated query into {len(reformulated_queries)} variations")
-            
-            # Always include the original query
-            all_queries = [query_text] + reformulated_queries
+            deadline = QueryDeadline(deadline_ms, self.stage_latency)
+            reranker = reranker or getattr(self.rag_system, "reranker", DEFAULT_RERANKER)
+            wants_self_critique = use_self_critique and self.use_self_critique
+            if not self.use_query_reformulation:
+                deadline.exclude("reformulation")
+            if reranker != "llm":
+                deadline.exclude("llm_rerank")
+            if not wants_self_critique:
+                deadline.exclude("self_critique")
             
-            # Step 2: Query Complexity Assessment
-            query_complexity = await self._assess_query_complexity(query_text)
-            logger.info(f"Query complexity assessed as: {query_complexity}")
+            # Semantic cache: reuse the work done for a near-identical earlier query
+            cache_entry, cache_key, query_embedding, generation = await self._lookup_query_cache(
+                query_text,
+                use_cache,
+                self._query_cache_key(top_k, search_filter, reranker, custom_prompt, wants_self_critique, return_contexts)
+            )
             
-            # Adjust retrieval parameters based on complexity
-            adjusted_top_k = top_k
-            if query_complexity == "high":
-                # For complex queries, retrieve more context
-                adjusted_top_k = min(top_k + 3, 12)  # Get more context but with a reasonable limit
-                logger.info(f"Increased context retrieval to {adjusted_top_k} chunks due to high complexity")
+            if cache_entry is not None and cache_entry.get("result") is not None:
+                logger.info(f"Serving cached answer (similarity {cache_entry['similarity']:.3f})")
+                result = dict(cache_entry["result"])
+                result["query"] = query_text
+                result["duration_seconds"] = asyncio.get_event_loop().time() - start_time
+                result["deadline"] = deadline.report()
+                result["skipped_stages"] = []
+                result["cache"] = {"hit": "answer", "similarity": cache_entry["similarity"]}
+                return result
             
-            # Step 3: Multi-strategy Retrieval
-            retrieved_nodes = []
-            if self.use_multi_retrieval and reformulated_queries:
-                # Use multiple queries for retrieval
-                all_nodes = []
-                
-                # First retrieve with original query
-                original_nodes = self.rag_system.retrieve_context(
-                    query=query_text,
-                    top_k=adjusted_top_k,
-                    search_filter=search_filter
-                )
-                
-                # Add retrieval method metadata
-                for node in original_nodes:
-                    if hasattr(node, 'node') and hasattr(node.node, 'metadata'):
-                        node.node.metadata["retrieval_method"] = "original_query"
-                
-                all_nodes.extend(original_nodes)
-                
-                # Then retrieve with reformulated queries, but with fewer results each
-                reformulation_top_k = max(2, adjusted_top_k // 2)
-                for i, ref_query in enumerate(reformulated_queries[:2]):  # Limit to top 2 reformulations
-                    ref_nodes = self.rag_system.retrieve_context(
-                        query=ref_query,
-                        top_k=reformulation_top_k,
-                        search_filter=search_filter
-                    )
-                    
-                    # Add retrieval method metadata
-                    for node in ref_nodes:
-                        if hasattr(node, 'node') and hasattr(node.node, 'metadata'):
-                            node.node.metadata["retrieval_method"] = f"reformulation_{i+1}"
-                    
-                    all_nodes.extend(ref_nodes)
-                
-                # Deduplicate nodes (in case the same document was retrieved by multiple queries)
-                seen_texts = set()
-                unique_nodes = []
-                
-                for node in all_nodes:
-                    if hasattr(node, 'node'):
-                        node_text = node.node.get_content()
-                        # Use a simple hash of the text to identify duplicates
-                        text_hash = hash(node_text[:100])  # Use first 100 chars for hashing
-                        
-                        if text_hash not in seen_texts:
-                            seen_texts.add(text_hash)
-                            unique_nodes.append(node)
-                
-                # Keep only the top nodes by score
-                retrieved_nodes = sorted(unique_nodes, key=lambda n: n.score or 0, reverse=True)[:adjusted_top_k]
-                logger.info(f"Retrieved {len(retrieved_nodes)} unique nodes using multi-query retrieval")
+            if cache_entry is not None:
+                logger.info(f"Reusing cached retrieval (similarity {cache_entry['similarity']:.3f})")
+                deadline.exclude("reformulation", "llm_rerank")
+                reformulated_queries = cache_entry["reformulated_queries"]
+                query_complexity = cache_entry["query_complexity"]
+                retrieved_nodes = cache_entry["nodes"]
+                retrieval_report = dict(cache_entry["retrieval_report"], cached=True)
             else:
-                # Use standard retrieval with original query
-                retrieved_nodes = self.rag_system.retrieve_context(
-                    query=query_text,
-                    top_k=adjusted_top_k,
-                    search_filter=search_filter
+                reformulated_queries, query_complexity, retrieved_nodes, retrieval_report = await self._retrieve(
+                    query_text, top_k, search_filter, reranker, deadline, query_embedding
                 )
             
-            # Step 4: Custom Semantic Reranking
-            if hasattr(self.rag_system, '_apply_context_reranking'):
-                retrieved_nodes = self.rag_system._apply_context_reranking(retrieved_nodes, query_text)
-                
             # Convert nodes to text for context
             context_texts = [node.node.get_content() for node in retrieved_nodes]
             
@@ -338,21 +378,13 @@ class RAGQueryEngine:
             context_quality = await self._assess_context_quality(query_text, context_texts)
             logger.info(f"Context quality assessed as: {context_quality}")
             
-            # Step 6: Select appropriate prompt template based on context quality and source attribution preference
-            use_source_attribution = self.use_source_attribution and context_quality != "insufficient"
-            if use_source_attribution:
-                prompt_template = self.source_attribution_prompt
-                logger.info("Using source attribution prompt template")
-            else:
-                prompt_template = self._select_prompt_template(context_quality, custom_prompt)
-                logger.info(f"Selected prompt template type: {prompt_template.__class__.__name__}")
-            
-            # Format context with enhanced context formatting
-            enhanced_context = await self._enhance_context_formatting(query_text, context_texts)
-            combined_context = enhanced_context if enhanced_context else "\n\n".join(context_texts)
+            # Step 6: Select appropriate prompt template and format the context
+            prompt_template, combined_context = await self._answer_prompt(
+                query_text, context_texts, context_quality, custom_prompt
+            )
             
             # Step 7: Generate response with the selected strategy
-            if use_self_critique and self.use_self_critique and context_quality != "insufficient":
+            if wants_self_critique and context_quality != "insufficient" and deadline.allows("self_critique"):
                 # First generate an initial answer
                 formatted_initial_prompt = self.default_prompt.format(
                     context=combined_context,
@@ -360,8 +392,9 @@ class RAGQueryEngine:
                 )
                 
                 # Generate initial response
-                initial_response = self.llm.complete(formatted_initial_prompt)
-                initial_response_text = initial_response.text if hasattr(initial_response, 'text') else str(initial_response)
+                stage_start = time.perf_counter()
+                initial_response_text = await self._acomplete(formatted_initial_prompt)
+                deadline.finished("generation", (time.perf_counter() - stage_start) * 1000.0)
                 
                 # Then use self-critique to improve it
                 formatted_prompt = self.self_critique_prompt.format(
@@ -371,8 +404,9 @@ class RAGQueryEngine:
                 )
                 
                 # Generate final response with self-critique
-                response = self.llm.complete(formatted_prompt)
-                response_text = response.text if hasattr(response, 'text') else str(response)
+                stage_start = time.perf_counter()
+                response_text = await self._acomplete(formatted_prompt)
+                deadline.finished("self_critique", (time.perf_counter() - stage_start) * 1000.0)
             else:
                 # Regular prompt formatting based on selected template
                 formatted_prompt = prompt_template.format(
@@ -381,18 +415,19 @@ class RAGQueryEngine:
                 )
                 
                 # Generate response
-                response = self.llm.complete(formatted_prompt)
-                response_text = response.text if hasattr(response, 'text') else str(response)
+                stage_start = time.perf_counter()
+                response_text = await self._acomplete(formatted_prompt)
+                deadline.finished("generation", (time.perf_counter() - stage_start) * 1000.0)
             
             # Step 8: Detect and address hallucinations
-            hallucination_result = self.rag_system.detect_hallucination(
-                query=query_text,
-                response=response_text,
-                context=context_texts
-            )
+            hallucination_result = await self._check_hallucination(query_text, response_text, context_texts, deadline)
             
             # If high hallucination probability is detected, try to correct the response
-            if hallucination_result.get("is_hallucination", False) and not use_self_critique:
+            if (
+                hallucination_result.get("is_hallucination", False)
+                and not use_self_critique
+                and deadline.fits("self_critique", "hallucination_check")
+            ):
                 logger.warning(f"Detected potential hallucination, regenerating with self-critique prompt")
                 
                 # Use self-critique prompt for regeneration
@@ -403,11 +438,11 @@ class RAGQueryEngine:
                 )
                 
                 # Regenerate response
-                response = self.llm.complete(formatted_prompt)
-                response_text = response.text if hasattr(response, 'text') else str(response)
+                response_text = await self._acomplete(formatted_prompt)
                 
                 # Re-evaluate
-                hallucination_result = self.rag_system.detect_hallucination(
+                hallucination_result = await self._run_sync(
+                    self.rag_system.detect_hallucination,
                     query=query_text,
                     response=response_text,
                     context=context_texts
@@ -430,23 +465,32 @@ class RAGQueryEngine:
                 "hallucination_metrics": hallucination_result,
                 "context_quality": context_quality,
                 "query_complexity": query_complexity,
-                "reformulated_queries": reformulated_queries if self.use_query_reformulation else []
+                "reformulated_queries": reformulated_queries if self.use_query_reformulation else [],
+                "retrieval": retrieval_report,
+                "deadline": deadline.report(),
+                "skipped_stages": list(deadline.skipped),
+                "cache": {
+                    "hit": "retrieval" if cache_entry is not None else None,
+                    "similarity": cache_entry["similarity"] if cache_entry is not None else None
+                }
             }
             
             # Include contexts if requested
             if return_contexts:
-                result["contexts"] = []
-                for i, node in enumerate(retrieved_nodes):
-                    reliability_score = node.node.metadata.get("reliability_score", node.score)
-                    retrieval_method = node.node.metadata.get("retrieval_method", "default")
-                    result["contexts"].append({
-                        "text": node.node.get_content(),
-                        "score": node.score if hasattr(node, 'score') else None,
-                        "metadata": node.node.metadata if hasattr(node.node, 'metadata') else {},
-                        "document_id": node.node.metadata.get("document_id") if hasattr(node.node, 'metadata') else None,
-                        "reliability_score": reliability_score,
-                        "retrieval_method": retrieval_method
-                    })
+                result["contexts"] = self._contexts_payload(retrieved_nodes)
+            
+            # Results degraded to meet a deadline are not worth reusing
+            if cache_key is not None and cache_entry is None and not deadline.skipped:
+                self.query_cache.store(
+                    query_embedding,
+                    cache_key,
+                    generation,
+                    reformulated_queries=reformulated_queries,
+                    query_complexity=query_complexity,
+                    nodes=retrieved_nodes,
+                    retrieval_report=retrieval_report,
+                    result=dict(result) if self.cache_answers else None
+                )
             
             return result
         except Exception as e:
@@ -457,6 +501,462 @@ class RAGQueryEngine:
                 "error": str(e)
             }
     
+    async def stream_query(
+        self,
+        query_text: str,
+        top_k: int = 5,
+        search_filter: Optional[Dict[str, Any]] = None,
+        custom_prompt: Optional[str] = None,
+        reranker: Optional[str] = None,
+        deadline_ms: Optional[float] = None,
+        use_cache: bool = True,
+        token_stream: Optional[Callable[[List[Dict[str, Any]]], AsyncIterator[str]]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Query the RAG system, yielding events as the pipeline progresses.
+        
+        Events, in order:
+        - {"type": "processing", "stage": "retrieval", ...} once context is retrieved
+        - {"type": "sources", "contexts": [...], "context_quality": ...}
+        - {"type": "token", "content": ...} for each piece of the answer
+        - {"type": "hallucination", "hallucination_metrics": ..., "hallucination_risk": ...}
+        - {"type": "end", ...} with the same fields as query(), without contexts
+        An {"type": "error", "error": ...} event ends the stream early on failure.
+        
+        Streamed tokens cannot be revised, so self-critique does not run and a
+        suspected hallucination is only reported in the trailing event.
+        
+        Args:
+            query_text: Query to answer
+            top_k: Number of context chunks to retrieve
+            search_filter: Metadata filters for retrieval
+            custom_prompt: Custom prompt template for response
+            reranker: Relevance reranking mode, defaults to the RAG system setting
+            deadline_ms: Latency budget; optional stages are skipped to meet it
+            use_cache: Whether this query may be served from, and stored in, the query cache
+            token_stream: Optional generator of the answer from the contexts payload,
+                replacing the engine's own prompt (e.g. a chat completion over a conversation)
+            
+        Yields:
+            Event dicts
+        """
+        try:
+            start_time = asyncio.get_event_loop().time()
+            
+            deadline = QueryDeadline(deadline_ms, self.stage_latency)
+            reranker = reranker or getattr(self.rag_system, "reranker", DEFAULT_RERANKER)
+            deadline.exclude("self_critique")
+            if not self.use_query_reformulation:
+                deadline.exclude("reformulation")
+            if reranker != "llm":
+                deadline.exclude("llm_rerank")
+            
+            cache_entry, cache_key, query_embedding, generation = await self._lookup_query_cache(
+                query_text,
+                use_cache,
+                self._query_cache_key(top_k, search_filter, reranker, custom_prompt, False, True)
+            )
+            cached_result = cache_entry.get("result") if cache_entry is not None and token_stream is None else None
+            
+            stage_start = time.perf_counter()
+            if cache_entry is not None:
+                deadline.exclude("reformulation", "llm_rerank")
+                reformulated_queries = cache_entry["reformulated_queries"]
+                query_complexity = cache_entry["query_complexity"]
+                retrieved_nodes = cache_entry["nodes"]
+                retrieval_report = dict(cache_entry["retrieval_report"], cached=True)
+            else:
+                reformulated_queries, query_complexity, retrieved_nodes, retrieval_report = await self._retrieve(
+                    query_text, top_k, search_filter, reranker, deadline, query_embedding
+                )
+            cache_info = {
+                "hit": ("answer" if cached_result is not None else "retrieval") if cache_entry is not None else None,
+                "similarity": cache_entry["similarity"] if cache_entry is not None else None
+            }
+            yield {
+                "type": "processing",
+                "stage": "retrieval",
+                "state": f"Retrieved {len(retrieved_nodes)} context chunks",
+                "duration_ms": round((time.perf_counter() - stage_start) * 1000.0, 2),
+                "query_complexity": query_complexity,
+                "reformulated_queries": reformulated_queries,
+                "cache": cache_info
+            }
+            
+            context_texts = [node.node.get_content() for node in retrieved_nodes]
+            context_quality = await self._assess_context_quality(query_text, context_texts)
+            contexts = self._contexts_payload(retrieved_nodes)
+            yield {"type": "sources", "contexts": contexts, "context_quality": context_quality}
+            
+            # Answer tokens as soon as they are generated
+            collected_tokens = []
+            stage_start = time.perf_counter()
+            if cached_result is not None:
+                collected_tokens.append(cached_result["answer"])
+                yield {"type": "token", "content": cached_result["answer"]}
+            else:
+                if token_stream is not None:
+                    tokens = token_stream(contexts)
+                else:
+                    prompt_template, combined_context = await self._answer_prompt(
+                        query_text, context_texts, context_quality, custom_prompt
+                    )
+                    tokens = self._astream_complete(prompt_template.format(context=combined_context, query=query_text))
+                async for token in tokens:
+                    if token:
+                        collected_tokens.append(token)
+                        yield {"type": "token", "content": token}
+                deadline.finished("generation", (time.perf_counter() - stage_start) * 1000.0)
+            response_text = "".join(collected_tokens)
+            
+            if cached_result is not None:
+                hallucination_result = cached_result.get("hallucination_metrics", {})
+            else:
+                hallucination_result = await self._check_hallucination(query_text, response_text, context_texts, deadline)
+            yield {
+                "type": "hallucination",
+                "hallucination_metrics": hallucination_result,
+                "hallucination_risk": hallucination_result.get("hallucination_probability")
+            }
+            
+            result = {
+                "query": query_text,
+                "answer": response_text,
+                "duration_seconds": asyncio.get_event_loop().time() - start_time,
+                "model": self.model_name,
+                "hallucination_metrics": hallucination_result,
+                "context_quality": context_quality,
+                "query_complexity": query_complexity,
+                "reformulated_queries": reformulated_queries if self.use_query_reformulation else [],
+                "retrieval": retrieval_report,
+                "deadline": deadline.report(),
+                "skipped_stages": list(deadline.skipped),
+                "cache": cache_info
+            }
+            
+            # Answers produced by a caller's token_stream depend on more than the query
+            if cache_key is not None and cache_entry is None and not deadline.skipped:
+                self.query_cache.store(
+                    query_embedding,
+                    cache_key,
+                    generation,
+                    reformulated_queries=reformulated_queries,
+                    query_complexity=query_complexity,
+                    nodes=retrieved_nodes,
+                    retrieval_report=retrieval_report,
+                    result=dict(result) if self.cache_answers and token_stream is None else None
+                )
+            
+            yield dict(result, type="end")
+        except Exception as e:
+            logger.error(f"Error streaming RAG query: {str(e)}")
+            yield {"type": "error", "query": query_text, "error": str(e)}
+    
+    async def _retrieve(
+        self,
+        query_text: str,
+        top_k: int,
+        search_filter: Optional[Dict[str, Any]],
+        reranker: str,
+        deadline: QueryDeadline,
+        query_embedding: Optional[List[float]] = None
+    ) -> Tuple[List[str], str, List[NodeWithScore], Dict[str, Any]]:
+        """
+        Reformulate the query, assess its complexity and retrieve context.
+        
+        Reformulation, complexity assessment and the original query's search run
+        concurrently: the original query is searched right away with the requested
+        top_k, extra candidates for a complex query are fetched incrementally, and the
+        reformulations are searched as soon as they arrive. All candidates are then
+        deduplicated and reranked once.
+        
+        Args:
+            query_text: Query to answer
+            top_k: Number of context chunks to retrieve
+            search_filter: Metadata filters for retrieval
+            reranker: Relevance reranking mode
+            deadline: Budget of the query
+            query_embedding: Embedding of query, if already computed (e.g. for the cache lookup)
+            
+        Returns:
+            Tuple of (reformulated queries, query complexity, retrieved nodes, retrieval report)
+        """
+        # Step 1: Query Reformulation (if enabled), in the background since it waits on the LLM
+        reformulation_task = None
+        if self.use_query_reformulation and deadline.allows("reformulation"):
+            reformulation_task = asyncio.ensure_future(self._timed_reformulation(query_text, deadline))
+        
+        # Step 3 starts before step 2: the original query does not depend on either, so its
+        # candidates are searched with the provisional top_k while the others run
+        original_task = asyncio.ensure_future(self._run_sync(
+            self.rag_system.gather_candidates,
+            query_text,
+            top_k=top_k,
+            search_filter=search_filter,
+            keep_all_candidates=True,
+            query_embedding=query_embedding
+        ))
+        pending = [task for task in (reformulation_task, original_task) if task is not None]
+        
+        try:
+            # Step 2: Query Complexity Assessment
+            query_complexity = await self._assess_query_complexity(query_text, deadline)
+            logger.info(f"Query complexity assessed as: {query_complexity}")
+            
+            # Adjust retrieval parameters based on complexity
+            adjusted_top_k = top_k
+            if query_complexity == "high":
+                # For complex queries, retrieve more context
+                adjusted_top_k = min(top_k + 3, 12)  # Get more context but with a reasonable limit
+                logger.info(f"Increased context retrieval to {adjusted_top_k} chunks due to high complexity")
+            
+            # The original search kept every fused result, so extra context usually comes from
+            # that pool; only fetch the next page if it ran short while the index had more
+            gathered = [await original_task]
+            original_candidates = gathered[0].nodes[:adjusted_top_k]
+            provisional_limit = self.rag_system.retrieval_pipeline.search_limit(top_k)
+            extra_limit = self.rag_system.retrieval_pipeline.search_limit(adjusted_top_k) - provisional_limit
+            fetched = len(gathered[0].search_results[0]) if gathered[0].search_results else 0
+            extra_task = None
+            if len(original_candidates) < adjusted_top_k and extra_limit > 0 and fetched >= provisional_limit:
+                extra_task = asyncio.ensure_future(self._run_sync(
+                    self.rag_system.gather_candidates,
+                    query_text,
+                    top_k=adjusted_top_k,
+                    search_filter=search_filter,
+                    search_offset=provisional_limit,
+                    search_limit=extra_limit,
+                    keep_all_candidates=True,
+                    query_embedding=gathered[0].query_embedding
+                ))
+                pending.append(extra_task)
+            
+            # Steps 3-4: Multi-strategy Retrieval and Reranking
+            # Up to 2 reformulations are searched once they arrive, then merged with the
+            # original query's candidates for a single rerank
+            reformulated_queries = await reformulation_task if reformulation_task is not None else []
+            variant_candidates = []
+            if self.use_multi_retrieval and reformulated_queries:
+                variants = await self._run_sync(
+                    self.rag_system.gather_candidates,
+                    query_text,
+                    top_k=adjusted_top_k,
+                    search_filter=search_filter,
+                    queries=reformulated_queries[:2],  # Limit to top 2 reformulations
+                    query_embedding=gathered[0].query_embedding
+                )
+                gathered.append(variants)
+                variant_candidates = variants.nodes
+            
+            if extra_task is not None:
+                extra = await extra_task
+                gathered.append(extra)
+                original_candidates += extra.nodes[:adjusted_top_k - len(original_candidates)]
+                logger.info(f"Fetched {len(extra.nodes)} more candidates for the complex query")
+        except BaseException:
+            for task in pending:
+                task.cancel()
+            raise
+        
+        if variant_candidates:
+            for node in original_candidates:
+                node.node.metadata["retrieval_method"] = "original_query"
+        
+        if reranker == "llm" and not deadline.allows("llm_rerank"):
+            # Keep the bi-encoder scores rather than wait for the LLM scorer
+            reranker = "none"
+        
+        retrieval = await self._run_sync(
+            self.rag_system.retrieve,
+            query=query_text,
+            top_k=adjusted_top_k,
+            search_filter=search_filter,
+            reranker=reranker,
+            candidates=original_candidates + variant_candidates,
+            query_embedding=gathered[0].query_embedding
+        )
+        retrieved_nodes = retrieval.nodes
+        retrieval_report = self._merge_retrieval_reports([state.report() for state in gathered + [retrieval]])
+        rerank_ms = retrieval_report["timings_ms"].get("rerank", 0.0) if reranker == "llm" else 0.0
+        if reranker == "llm":
+            deadline.finished("llm_rerank", rerank_ms)
+        deadline.finished("retrieval", retrieval_report["total_ms"] - rerank_ms)
+        logger.info(
+            f"Retrieved {len(retrieved_nodes)} unique nodes using {1 + min(len(reformulated_queries), 2)} queries "
+            f"({len(original_candidates)} original and {len(variant_candidates)} reformulation candidates)"
+        )
+        
+        return reformulated_queries, query_complexity, retrieved_nodes, retrieval_report
+    
+    async def _timed_reformulation(self, query_text: str, deadline: QueryDeadline) -> List[str]:
+        """Reformulate the query, recording the stage duration against the deadline."""
+        stage_start = time.perf_counter()
+        reformulated_queries = await self._reformulate_query(query_text)
+        deadline.finished("reformulation", (time.perf_counter() - stage_start) * 1000.0)
+        logger.info(f"Reformulated query into {len(reformulated_queries)} variations")
+        return reformulated_queries
+    
+    @staticmethod
+    def _merge_retrieval_reports(reports: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Combine the reports of the candidate searches and the final ranking run.
+        
+        Args:
+            reports: Pipeline reports, the final ranking run last
+            
+        Returns:
+            Report in the pipeline's format, with stage timings summed across runs
+        """
+        stages = []
+        errors = {}
+        timings: Dict[str, float] = {}
+        for report in reports:
+            stages.extend(stage for stage in report["stages"] if stage not in stages)
+            errors.update(report["errors"])
+            for stage, ms in report["timings_ms"].items():
+                timings[stage] = round(timings.get(stage, 0.0) + ms, 2)
+        return {
+            "stages": stages,
+            "skipped_stages": [stage for stage in reports[-1]["skipped_stages"] if stage not in stages],
+            "errors": errors,
+            "timings_ms": timings,
+            "total_ms": round(sum(report["total_ms"] for report in reports), 2),
+            "candidate_searches": len(reports) - 1,
+        }
+    
+    def _query_cache_key(
+        self,
+        top_k: int,
+        search_filter: Optional[Dict[str, Any]],
+        reranker: str,
+        custom_prompt: Optional[str],
+        use_self_critique: bool,
+        return_contexts: bool
+    ) -> str:
+        """Serialize the filters and settings a cached query result depends on."""
+        return json.dumps({
+            "top_k": top_k,
+            "filter": search_filter,
+            "reranker": reranker,
+            "model": self.model_name,
+            "temperature": self.temperature,
+            "prompt": custom_prompt,
+            "self_critique": use_self_critique,
+            "contexts": return_contexts,
+        }, sort_keys=True, default=str)
+    
+    async def _lookup_query_cache(
+        self,
+        query_text: str,
+        use_cache: bool,
+        cache_key: str
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[str], Optional[List[float]], Optional[int]]:
+        """
+        Look up a near-identical earlier query in the semantic cache.
+        
+        Args:
+            query_text: Query to answer
+            use_cache: Whether this query may use the cache
+            cache_key: Serialized filters and settings of the query
+            
+        Returns:
+            Tuple of (cache entry or None, cache key, query embedding, index generation);
+            the last three are None when the cache is not used
+        """
+        if not use_cache or self.query_cache is None:
+            return None, None, None, None
+        try:
+            query_embedding = await self._run_sync(self.rag_system.embed_model.get_text_embedding, query_text)
+            generation = await self._run_sync(self.rag_system.index_generation.current)
+            cache_entry = self.query_cache.lookup(query_embedding, cache_key, generation)
+            return cache_entry, cache_key, query_embedding, generation
+        except Exception as e:
+            logger.warning(f"Error looking up query cache: {str(e)}")
+            return None, None, None, None
+    
+    async def _answer_prompt(
+        self,
+        query_text: str,
+        context_texts: List[str],
+        context_quality: str,
+        custom_prompt: Optional[str]
+    ) -> Tuple[PromptTemplate, str]:
+        """
+        Select the answer prompt template from the context quality and format the context.
+        
+        Returns:
+            Tuple of (prompt template, formatted context)
+        """
+        if self.use_source_attribution and context_quality != "insufficient":
+            prompt_template = self.source_attribution_prompt
+            logger.info("Using source attribution prompt template")
+        else:
+            prompt_template = self._select_prompt_template(context_quality, custom_prompt)
+            logger.info(f"Selected prompt template type: {prompt_template.__class__.__name__}")
+        
+        # Format context with enhanced context formatting
+        enhanced_context = await self._enhance_context_formatting(query_text, context_texts)
+        combined_context = enhanced_context if enhanced_context else "\n\n".join(context_texts)
+        return prompt_template, combined_context
+    
+    async def _check_hallucination(
+        self,
+        query_text: str,
+        response_text: str,
+        context_texts: List[str],
+        deadline: QueryDeadline
+    ) -> Dict[str, Any]:
+        """Run the hallucination check on an answer if the deadline allows it."""
+        if not deadline.allows("hallucination_check"):
+            return {"skipped": True, "reason": "deadline"}
+        stage_start = time.perf_counter()
+        hallucination_result = await self._run_sync(
+            self.rag_system.detect_hallucination,
+            query=query_text,
+            response=response_text,
+            context=context_texts
+        )
+        deadline.finished("hallucination_check", (time.perf_counter() - stage_start) * 1000.0)
+        return hallucination_result
+    
+    @staticmethod
+    def _contexts_payload(nodes: List[NodeWithScore]) -> List[Dict[str, Any]]:
+        """Describe retrieved nodes for the query result."""
+        contexts = []
+        for node in nodes:
+            metadata = node.node.metadata if hasattr(node.node, 'metadata') else {}
+            contexts.append({
+                "text": node.node.get_content(),
+                "score": node.score if hasattr(node, 'score') else None,
+                "metadata": metadata,
+                "document_id": metadata.get("document_id"),
+                "reliability_score": metadata.get("reliability_score", node.score),
+                "retrieval_method": metadata.get("retrieval_method", "default")
+            })
+        return contexts
+    
+    async def _cached_complete(self, template_id: str, prompt: str) -> str:
+        """
+        Complete a deterministic auxiliary prompt through the RAG system's LLM response cache.
+        
+        Args:
+            template_id: Identifier of the prompt template (the call site)
+            prompt: Rendered prompt
+            
+        Returns:
+            Response text
+        """
+        cache = getattr(self.rag_system, "llm_cache", None)
+        if cache is not None:
+            cached = await self._run_sync(cache.get, self.model_name, template_id, prompt, self.temperature)
+            if cached is not None:
+                return cached
+        
+        response_text = await self._acomplete(prompt)
+        if cache is not None:
+            await self._run_sync(cache.put, self.model_name, template_id, prompt, self.temperature, response_text)
+        return response_text
+    
     async def _reformulate_query(self, query: str) -> List[str]:
         """
         Reformulate the query to increase retrieval effectiveness.
@@ -473,9 +973,8 @@ class RAGQueryEngine:
             # Format the prompt for query reformulation
             formatted_prompt = self.query_reformulation_prompt.format(query=query)
             
-            # Generate reformulations
-            response = self.llm.complete(formatted_prompt)
-            response_text = response.text if hasattr(response, 'text') else str(response)
+            # Generate reformulations, reusing the answer to an identical earlier prompt
+            response_text = await self._cached_complete("query_reformulation", formatted_prompt)
             
             # Try to parse the JSON response
             try:
@@ -519,44 +1018,47 @@ class RAGQueryEngine:
             logger.warning(f"Error in query reformulation: {str(e)}")
             return []  # Fall back to empty list
     
-    async def _assess_query_complexity(self, query: str) -> str:
+    async def _assess_query_complexity(self, query: str, deadline: Optional[QueryDeadline] = None) -> str:
         """
         Assess the complexity of a query to determine appropriate retrieval and answering strategies.
         
+        The local classifier decides in well under a millisecond; the LLM is only asked
+        about ambiguous queries, if enabled and the deadline leaves room for it.
+        
         Args:
             query: The query text
+            deadline: Budget of the query, if any
             
         Returns:
             Complexity level: "low", "medium", or "high"
         """
         try:
-            # Simple heuristics for query complexity assessment
-            words = query.split()
-            
-            # Check if query has multiple components/questions
-            question_marks = query.count('?')
-            sentence_count = max(1, len([s for s in query.split('.') if len(s.strip()) > 0]))
-            
-            # Check for complexity indicators
-            complex_indicators = [
-                "compare", "contrast", "analyze", "explain", "why", "how",
-                "relationship", "difference", "similarities", "pros and cons",
-                "advantages", "disadvantages", "detailed"
-            ]
-            
-            # Count indicators
-            indicator_count = sum(1 for word in words if any(ind in word.lower() for ind in complex_indicators))
-            
-            # Determine complexity
-            if len(words) > 25 or question_marks > 1 or indicator_count >= 2:
-                return "high"
-            elif len(words) > 12 or sentence_count > 1 or indicator_count >= 1:
-                return "medium"
-            else:
-                return "low"
+            level, confidence = self.complexity_classifier.classify(query)
         except Exception as e:
             logger.warning(f"Error assessing query complexity: {str(e)}")
             return "medium"  # Default to medium if assessment fails
+        
+        if not (self.complexity_llm_fallback and self.complexity_classifier.is_ambiguous(confidence)):
+            return level
+        if deadline is not None and not deadline.fits("complexity_llm", "retrieval", "generation"):
+            return level
+        
+        try:
+            stage_start = time.perf_counter()
+            response_text = await self._cached_complete(
+                "query_complexity", self.query_complexity_prompt.format(query=query)
+            )
+            if deadline is not None:
+                deadline.finished("complexity_llm", (time.perf_counter() - stage_start) * 1000.0)
+            llm_level = parse_complexity_level(response_text)
+            if llm_level is None:
+                logger.warning(f"Could not parse query complexity from LLM response: {response_text[:100]}")
+                return level
+            self.complexity_classifier.record_llm_decision(query, level, confidence, llm_level)
+            return llm_level
+        except Exception as e:
+            logger.warning(f"Error asking the LLM for query complexity, keeping {level}: {str(e)}")
+            return level
     
     async def _assess_context_quality(self, query: str, contexts: List[str]) -> str:
         """
@@ -573,13 +1075,13 @@ class RAGQueryEngine:
             if not contexts:
                 return "insufficient"
             
-            # Get query embedding
-            query_embedding = self.rag_system.embed_model.get_text_embedding(query)
+            # Embed the query and every context in one batch, off the event loop
+            embeddings = await self._run_sync(self.rag_system.embed_model.get_text_embedding_batch, [query] + contexts)
+            query_embedding = embeddings[0]
             
             # Calculate relevance scores for each context
             relevance_scores = []
-            for context in contexts:
-                context_embedding = self.rag_system.embed_model.get_text_embedding(context)
+            for context_embedding in embeddings[1:]:
                 
                 # Calculate cosine similarity
                 if isinstance(query_embedding, list) and isinstance(context_embedding, list):
@@ -9,11 +9,14 @@ import logging
 import os
 import time
 import json
-from typing import Dict, List, Any, Optional, Tuple, Union
+from typing import Dict, List, Any, Optional, Tuple, Union, Iterable, Iterator
 import asyncio
 import uuid
+import hashlib
 import numpy as np
 import re
+import itertools
+import math
 
 # LlamaIndex imports - updated to match installed package structure
 from llama_index.core import (
@@ -38,6 +41,20 @@ from llama_index.core.evaluation import (
 # Qdrant client for vector DB
 from qdrant_client import QdrantClient, models as qdrant_models
 
+# Local imports
+from llamaIndex_rag.embedding_cache import CachedEmbedding, EmbeddingCache, DEFAULT_EMBEDDING_CACHE_PATH
+from llamaIndex_rag.reindex import ReindexRunner, ReindexClaim, DEFAULT_REINDEX_CHECKPOINT_PATH
+from llamaIndex_rag.embedding_service import RemoteEmbedding
+from llamaIndex_rag.document_catalog import DocumentCatalog
+from llamaIndex_rag.llm_scoring import BudgetedLLMScorer
+from llamaIndex_rag.llm_cache import LLMResponseCache, DEFAULT_LLM_CACHE_TTL_SECONDS
+from llamaIndex_rag.cross_encoder import CrossEncoderReranker, DEFAULT_CROSS_ENCODER_MODEL, DEFAULT_RERANKER, RERANKER_MODES
+from llamaIndex_rag.retrieval_pipeline import RetrievalPipeline, RetrievalState, RETRIEVAL_STAGES, CANDIDATE_STAGES
+from llamaIndex_rag.bm25_index import BM25Index, DEFAULT_BM25_INDEX_PATH, guess_language
+from llamaIndex_rag.query_cache import IndexGeneration, DEFAULT_INDEX_GENERATION_PATH
+from llamaIndex_rag.sparse_vectors import SparseTextEncoder, SPARSE_VECTOR_NAME, DEFAULT_SPARSE_MODEL, sparse_vector_params
+from llamaIndex_rag.file_lock import FileLock, LockBusy, lock_path
+
 # Define MetadataParser at the module level
 class MetadataParser:
     """Simple metadata parser for document processing."""
@@ -74,6 +91,17 @@ class MetadataParser:
 # Module logger
 logger = logging.getLogger(__name__)
 
+# Payload fields used in filters, indexed so filtered scroll/search/delete stay fast
+_KEYWORD_FILTER_FIELDS = ["doc_id", "metadata.doc_id", "status", "file_type", "language", "tags", "category"]
+CHUNK_PAYLOAD_INDEXES = {
+    **{field: qdrant_models.PayloadSchemaType.KEYWORD for field in _KEYWORD_FILTER_FIELDS},
+    "is_placeholder": qdrant_models.PayloadSchemaType.BOOL,
+}
+METADATA_PAYLOAD_INDEXES = {field: qdrant_models.PayloadSchemaType.KEYWORD for field in _KEYWORD_FILTER_FIELDS}
+
+# How long a sparse vector readiness check is trusted before the collection config is read again
+SPARSE_READY_RECHECK_SECONDS = 30.0
+
 class RAGSystem:
     """
     Production-ready RAG System with Reliable RAG techniques to prevent and detect hallucinations.
@@ -94,6 +122,32 @@ class RAGSystem:
         doc_chunk_overlap: int = 100,
         vector_weight: float = 0.7,
         semantic_weight: float = 0.3,
+        embed_batch_size: int = 64,
+        upsert_batch_size: int = 256,
+        use_embedding_cache: bool = True,
+        embedding_cache_path: Optional[str] = None,
+        embedding_cache_size: int = 10000,
+        scroll_page_size: int = 256,
+        reindex_workers: int = 4,
+        reindex_max_docs_per_second: Optional[float] = None,
+        reindex_checkpoint_path: Optional[str] = None,
+        embedding_service_url: Optional[str] = None,
+        use_scalar_quantization: Optional[bool] = None,
+        quantization_oversampling: float = 2.0,
+        reranker: Optional[str] = None,
+        cross_encoder_model: Optional[str] = None,
+        llm_scoring_concurrency: int = 4,
+        llm_scoring_budget_seconds: float = 10.0,
+        retrieval_skip_stages: Optional[List[str]] = None,
+        use_bm25: Optional[bool] = None,
+        bm25_index_path: Optional[str] = None,
+        use_sparse_vectors: Optional[bool] = None,
+        sparse_model: Optional[str] = None,
+        index_generation_path: Optional[str] = None,
+        use_llm_cache: bool = True,
+        llm_cache_redis_url: Optional[str] = None,
+        llm_cache_ttl_seconds: float = DEFAULT_LLM_CACHE_TTL_SECONDS,
+        lock_dir: Optional[str] = None,
     ):
         """
         Initialize RAG System
@@ -111,7 +165,54 @@ class RAGSystem:
             doc_chunk_size: Document chunk size
             doc_chunk_overlap: Document chunk overlap
             vector_weight: Weight for vector search in hybrid retrieval (0-1)
-            semantic_weight: Weight for semantic search in hybrid retrieval (0-1)
+            semantic_weight: Weight for lexical (BM25) search in hybrid retrieval (0-1)
+            embed_batch_size: Number of nodes embedded per model call during indexing
+            upsert_batch_size: Number of points sent per Qdrant upsert during indexing
+            use_embedding_cache: Whether to cache embeddings by (model, text hash)
+            embedding_cache_path: SQLite file for the shared on-disk cache tier
+                (defaults to the EMBEDDING_CACHE_PATH environment variable)
+            embedding_cache_size: Maximum number of embeddings in the in-memory cache tier
+            scroll_page_size: Number of points fetched per Qdrant scroll page when streaming chunks
+            reindex_workers: Number of documents reindexed concurrently by reindex_all_documents
+            reindex_max_docs_per_second: Throttle for reindex_all_documents (None for no limit)
+            reindex_checkpoint_path: File recording completed doc_ids so reindexing can resume
+                (defaults to the REINDEX_CHECKPOINT_PATH environment variable)
+            embedding_service_url: URL of the shared embedding service; when set, embeddings are
+                computed there instead of loading the model in this process
+                (defaults to the EMBEDDING_SERVICE_URL environment variable)
+            use_scalar_quantization: Whether to keep int8-quantized chunk vectors in RAM with the
+                float32 originals on disk, rescoring results against the originals
+                (defaults to the QDRANT_SCALAR_QUANTIZATION environment variable)
+            quantization_oversampling: Candidates fetched per requested result before rescoring
+            reranker: Relevance reranking mode: "llm" (LLM-rated relevance, default), "cross_encoder"
+                (local model) or "none" (defaults to the RAG_RERANKER environment variable)
+            cross_encoder_model: Cross-encoder used by the "cross_encoder" mode; the default one
+                is English-only (defaults to the CROSS_ENCODER_MODEL environment variable)
+            llm_scoring_concurrency: Maximum concurrent LLM calls when the LLM rates relevance
+                or fact consistency
+            llm_scoring_budget_seconds: Wall-clock budget of each LLM scoring stage; items not
+                scored in time keep their embedding score
+            retrieval_skip_stages: Retrieval pipeline stages skipped for every query
+                (see RETRIEVAL_STAGES)
+            use_bm25: Whether to keep a BM25 index of chunk text as the lexical leg of hybrid
+                retrieval (defaults to the RAG_BM25 environment variable)
+            bm25_index_path: SQLite file holding the shared BM25 corpus
+                (defaults to the BM25_INDEX_PATH environment variable)
+            use_sparse_vectors: Whether chunks carry a named sparse vector and hybrid retrieval
+                fuses dense and sparse results server-side with RRF, instead of using the BM25
+                index (defaults to the QDRANT_SPARSE_VECTORS environment variable)
+            sparse_model: fastembed sparse model computing the sparse vectors
+                (defaults to the SPARSE_MODEL environment variable)
+            index_generation_path: SQLite file holding the index generation counter, bumped
+                whenever documents are indexed or deleted so query caches are invalidated
+                (defaults to the INDEX_GENERATION_PATH environment variable)
+            use_llm_cache: Whether to cache the responses to deterministic auxiliary prompts
+                (query reformulation, relevance and consistency ratings)
+            llm_cache_redis_url: Redis URL of the LLM cache tier shared with the Celery workers
+                (defaults to the REDIS_URL environment variable; memory tier only when unset)
+            llm_cache_ttl_seconds: Lifetime of cached LLM responses
+            lock_dir: Directory of the lock files coordinating collection migrations with the
+                API and Celery workers (defaults to the RAG_LOCK_DIR environment variable)
         """
         self.collection_name = collection_name
         self.metadata_collection_name = metadata_collection_name
@@ -126,11 +227,65 @@ class RAGSystem:
         self.doc_chunk_overlap = doc_chunk_overlap
         self.vector_weight = vector_weight
         self.semantic_weight = semantic_weight
+        self.embed_batch_size = max(1, embed_batch_size)
+        self.upsert_batch_size = max(1, upsert_batch_size)
+        self.scroll_page_size = max(1, scroll_page_size)
+        if use_scalar_quantization is None:
+            use_scalar_quantization = os.getenv("QDRANT_SCALAR_QUANTIZATION", "false").lower() in ("1", "true", "yes")
+        self.use_scalar_quantization = use_scalar_quantization
+        self.quantization_oversampling = max(1.0, quantization_oversampling)
+        if use_sparse_vectors is None:
+            use_sparse_vectors = os.getenv("QDRANT_SPARSE_VECTORS", "false").lower() in ("1", "true", "yes")
+        self.sparse_encoder: Optional[SparseTextEncoder] = None
+        if use_sparse_vectors:
+            self.sparse_encoder = SparseTextEncoder(model_name=sparse_model or os.getenv("SPARSE_MODEL", DEFAULT_SPARSE_MODEL))
+        # Whether the chunk collection has the sparse vector, and when that was last checked;
+        # another worker or the Celery process may run the migration, so it is re-read
+        self._sparse_ready = False
+        self._sparse_checked_at = 0.0
+        self.reranker = reranker or os.getenv("RAG_RERANKER", DEFAULT_RERANKER)
+        if self.reranker not in RERANKER_MODES:
+            raise ValueError(f"Unknown reranker {self.reranker}, expected one of {RERANKER_MODES}")
+        # Loaded on first use so processes that never rerank do not pay for the model
+        self.cross_encoder = CrossEncoderReranker(
+            model_name=cross_encoder_model or os.getenv("CROSS_ENCODER_MODEL", DEFAULT_CROSS_ENCODER_MODEL)
+        )
+        self.retrieval_pipeline = RetrievalPipeline(self, skip_stages=retrieval_skip_stages)
+        self.llm_cache: Optional[LLMResponseCache] = None
+        if use_llm_cache:
+            self.llm_cache = LLMResponseCache(
+                redis_url=llm_cache_redis_url or os.getenv("REDIS_URL"),
+                ttl_seconds=llm_cache_ttl_seconds
+            )
+        self.index_generation = IndexGeneration(
+            index_generation_path or os.getenv("INDEX_GENERATION_PATH", DEFAULT_INDEX_GENERATION_PATH)
+        )
+        if use_bm25 is None:
+            use_bm25 = os.getenv("RAG_BM25", "true").lower() in ("1", "true", "yes")
+        self.bm25_index: Optional[BM25Index] = None
+        if use_bm25:
+            try:
+                self.bm25_index = BM25Index(db_path=bm25_index_path or os.getenv("BM25_INDEX_PATH", DEFAULT_BM25_INDEX_PATH))
+            except Exception as e:
+                logger.warning(f"Could not open BM25 index, hybrid retrieval will use vector search only: {str(e)}")
+        self.lock_dir = lock_dir
+        # Chunk writes hold this lock shared; a collection migration takes it exclusively
+        # to pause them while it copies the last changes and switches the alias
+        self.chunk_write_lock = FileLock(lock_path(f"{collection_name}_writes", lock_dir))
+        self.sparse_migration_lock = FileLock(lock_path(f"{collection_name}_sparse_migration", lock_dir))
+        self.reindexer = ReindexRunner(
+            max_workers=reindex_workers,
+            max_docs_per_second=reindex_max_docs_per_second,
+            checkpoint_path=reindex_checkpoint_path or os.getenv("REINDEX_CHECKPOINT_PATH", DEFAULT_REINDEX_CHECKPOINT_PATH)
+        )
         
         # Initialize components
         try:
             # Connect to Qdrant
             self.client = QdrantClient(url=qdrant_url)
+            self.catalog = DocumentCatalog(
+                self.client, metadata_collection_name, page_size=self.scroll_page_size, lock_dir=lock_dir
+            )
             
             # Create collections if they don't exist
             self._ensure_collections_exist()
@@ -139,16 +294,44 @@ class RAGSystem:
             
             # Initialize LLM
             self.llm = OpenAI(model=llm_model, temperature=0.1)
+            self.llm_scorer = BudgetedLLMScorer(
+                self.llm,
+                max_concurrency=llm_scoring_concurrency,
+                budget_seconds=llm_scoring_budget_seconds,
+                cache=self.llm_cache
+            )
             
             # Initialize embeddings
-            if "openai" in embedding_model.lower():
-                self.embed_model = OpenAIEmbedding(
-                    model=embedding_model,
-                    api_key=openai_api_key,
+            def load_local_embed_model():
+                if "openai" in embedding_model.lower():
+                    return OpenAIEmbedding(
+                        model=embedding_model,
+                        api_key=openai_api_key,
+                    )
+                return FastEmbedEmbedding(
+                    model_name=embedding_model,
                 )
-            else:
-                self.embed_model = FastEmbedEmbedding(
+            
+            embedding_service_url = embedding_service_url or os.getenv("EMBEDDING_SERVICE_URL")
+            if embedding_service_url:
+                # Share one warm model across processes; load locally only if the service is down
+                self.embed_model = RemoteEmbedding(
+                    service_url=embedding_service_url,
                     model_name=embedding_model,
+                    fallback_factory=load_local_embed_model,
+                )
+                logger.info(f"Using embedding service at {embedding_service_url}")
+            else:
+                self.embed_model = load_local_embed_model()
+            
+            # Serve repeated texts from the embedding cache
+            if use_embedding_cache:
+                self.embed_model = CachedEmbedding(
+                    base_model=self.embed_model,
+                    cache=EmbeddingCache(
+                        db_path=embedding_cache_path or os.getenv("EMBEDDING_CACHE_PATH", DEFAULT_EMBEDDING_CACHE_PATH),
+                        max_memory_entries=embedding_cache_size,
+                    ),
                 )
             
             # Initialize vector store
@@ -178,38 +361,200 @@ class RAGSystem:
             raise
     
     def _ensure_collections_exist(self):
-        """Initialize Qdrant collections if they don't exist."""
+        """
+        Initialize Qdrant collections if they don't exist.
+        
+        New and existing collections get keyword payload indexes on the hot filter fields.
+        When scalar quantization is enabled, the chunk collection keeps int8 vectors in RAM
+        and the float32 originals on disk. When sparse vectors are enabled, new chunk
+        collections get the named sparse vector next to the default dense vector; existing
+        ones need migrate_to_sparse_vectors.
+        """
         try:
             # Check and create main collection
             collections = self.client.get_collections().collections
             collection_names = [c.name for c in collections]
+            alias_names = [a.alias_name for a in self.client.get_aliases().aliases]
+            
+            collection_missing = self.collection_name not in collection_names and self.collection_name not in alias_names
+            # A sparse vector migration interrupted after dropping the old collection leaves the
+            # name unassigned: point it at the migrated copy instead of creating an empty collection
+            if collection_missing and self._recover_chunk_alias():
+                collection_missing = False
             
-            if self.collection_name not in collection_names:
+            if collection_missing:
                 logger.info(f"Creating collection {self.collection_name}")
                 self.client.create_collection(
                     collection_name=self.collection_name,
                     vectors_config=qdrant_models.VectorParams(
                         size=self.embedding_dim,
-                        distance=qdrant_models.Distance.COSINE
-                    )
+                        distance=qdrant_models.Distance.COSINE,
+                        on_disk=self.use_scalar_quantization
+                    ),
+                    sparse_vectors_config=self._sparse_vectors_config(),
+                    quantization_config=self._quantization_config()
                 )
-            
-            # Check and create metadata collection
-            if self.metadata_collection_name not in collection_names:
-                logger.info(f"Creating metadata collection {self.metadata_collection_name}")
-                self.client.create_collection(
-                    collection_name=self.metadata_collection_name,
-                    vectors_config=qdrant_models.VectorParams(
-                        size=self.embedding_dim,
-                        distance=qdrant_models.Distance.COSINE
+            elif self.use_scalar_quantization:
+                self._apply_quantization(self.collection_name)
+            
+            if self.sparse_encoder is not None:
+                if not self.refresh_sparse_vectors_ready():
+                    logger.warning(
+                        f"Collection {self.collection_name} has no {SPARSE_VECTOR_NAME} vector; "
+                        f"run migrate_to_sparse_vectors to enable server-side hybrid search"
                     )
-                )
+            
+            # Check and create the vectorless document catalog
+            self.catalog.ensure_collection()
+            
+            self._ensure_payload_indexes(self._resolve_collection_name(self.collection_name), CHUNK_PAYLOAD_INDEXES)
+            self._ensure_payload_indexes(self.catalog.resolve_collection_name(), METADATA_PAYLOAD_INDEXES)
                 
             logger.info(f"Collections initialized: {self.collection_name}, {self.metadata_collection_name}")
         except Exception as e:
             logger.error(f"Error initializing Qdrant collections: {str(e)}")
             raise
     
+    def _sparse_vectors_config(self) -> Optional[Dict[str, qdrant_models.SparseVectorParams]]:
+        """Named sparse vector config for the chunk collection, or None when disabled."""
+        if self.sparse_encoder is None:
+            return None
+        return {SPARSE_VECTOR_NAME: sparse_vector_params()}
+    
+    def _resolve_collection_name(self, collection_name: str) -> str:
+        """Return the physical collection behind a name (which may be an alias)."""
+        for alias in self.client.get_aliases().aliases:
+            if alias.alias_name == collection_name:
+                return alias.collection_name
+        return collection_name
+    
+    def _has_sparse_vectors(self, collection_name: str) -> bool:
+        """Check whether a collection has the named sparse vector."""
+        try:
+            return self._read_sparse_vectors(collection_name)
+        except Exception as e:
+            logger.warning(f"Could not read sparse vector config of {collection_name}: {str(e)}")
+            return False
+    
+    def _read_sparse_vectors(self, collection_name: str) -> bool:
+        """Read whether a collection has the named sparse vector, raising if Qdrant cannot be reached."""
+        sparse_vectors = self.client.get_collection(self._resolve_collection_name(collection_name)).config.params.sparse_vectors or {}
+        return SPARSE_VECTOR_NAME in sparse_vectors
+    
+    @property
+    def sparse_vectors_ready(self) -> bool:
+        """
+        Whether the chunk collection has the named sparse vector.
+        
+        The answer is cached for SPARSE_READY_RECHECK_SECONDS, so a migration run by another
+        process is picked up by searches within that window. Writes call
+        refresh_sparse_vectors_ready directly.
+        """
+        if self.sparse_encoder is None:
+            return False
+        if time.time() - self._sparse_checked_at >= SPARSE_READY_RECHECK_SECONDS:
+            self.refresh_sparse_vectors_ready()
+        return self._sparse_ready
+    
+    @sparse_vectors_ready.setter
+    def sparse_vectors_ready(self, ready: bool) -> None:
+        self._sparse_ready = ready
+        self._sparse_checked_at = time.time()
+    
+    def refresh_sparse_vectors_ready(self) -> bool:
+        """
+        Re-read whether the chunk collection has the named sparse vector.
+        
+        If Qdrant cannot be reached the previous answer is kept, so a transient error
+        does not switch a migrated collection back to dense-only writes.
+        
+        Returns:
+            The refreshed readiness
+        """
+        if self.sparse_encoder is None:
+            return False
+        try:
+            self.sparse_vectors_ready = self._read_sparse_vectors(self.collection_name)
+        except Exception as e:
+            logger.warning(f"Could not re-check sparse vectors of {self.collection_name}: {str(e)}")
+            self._sparse_checked_at = time.time()
+        return self._sparse_ready
+    
+    def _quantization_config(self) -> Optional[qdrant_models.ScalarQuantization]:
+        """Scalar int8 quantization config for the chunk collection, or None when disabled."""
+        if not self.use_scalar_quantization:
+            return None
+        return qdrant_models.ScalarQuantization(
+            scalar=qdrant_models.ScalarQuantizationConfig(
+                type=qdrant_models.ScalarType.INT8,
+                quantile=0.99,
+                always_ram=True
+            )
+        )
+    
+    def _apply_quantization(self, collection_name: str) -> None:
+        """
+        Enable scalar quantization on an existing collection if it is not configured yet.
+        
+        Args:
+            collection_name: Collection to update
+        """
+        try:
+            collection_name = self._resolve_collection_name(collection_name)
+            config = self.client.get_collection(collection_name).config
+            if config.quantization_config is not None:
+                return
+            logger.info(f"Enabling scalar int8 quantization on existing collection {collection_name}")
+            vectors_config = None
+            if isinstance(config.params.vectors, qdrant_models.VectorParams):
+                # Move the float32 originals to disk; the quantized copies stay in RAM
+                vectors_config = {"": qdrant_models.VectorParamsDiff(on_disk=True)}
+            self.client.update_collection(
+                collection_name=collection_name,
+                vectors_config=vectors_config,
+                quantization_config=self._quantization_config()
+            )
+        except Exception as e:
+            logger.warning(f"Could not enable quantization on {collection_name}: {str(e)}")
+    
+    def _ensure_payload_indexes(self, collection_name: str, fields: Dict[str, Any]) -> None:
+        """
+        Create the payload indexes missing from a collection.
+        
+        Args:
+            collection_name: Collection to index
+            fields: Mapping of payload field to Qdrant payload schema type
+        """
+        try:
+            existing = self.client.get_collection(collection_name).payload_schema or {}
+        except Exception as e:
+            logger.warning(f"Could not read payload schema of {collection_name}: {str(e)}")
+            existing = {}
+        
+        for field_name, schema in fields.items():
+            if field_name in existing:
+                continue
+            try:
+                self.client.create_payload_index(
+                    collection_name=collection_name,
+                    field_name=field_name,
+                    field_schema=schema
+                )
+                logger.info(f"Created {schema} payload index on {collection_name}.{field_name}")
+            except Exception as e:
+                logger.warning(f"Could not create payload index on {collection_name}.{field_name}: {str(e)}")
+    
+    def _search_params(self) -> Optional[qdrant_models.SearchParams]:
+        """Search params that rescore quantized candidates against the original vectors."""
+        if not self.use_scalar_quantization:
+            return None
+        return qdrant_models.SearchParams(
+            quantization=qdrant_models.QuantizationSearchParams(
+                rescore=True,
+                oversampling=self.quantization_oversampling
+            )
+        )
+    
     @property
     def qdrant_client(self):
         """Alias for self.client to maintain compatibility."""
@@ -221,7 +566,8 @@ class RAGSystem:
         
         Args:
             doc_id: Document ID to index
-            force: Whether to force reindex
+            force: Whether to reindex an already indexed document. Only chunks whose
+                content changed are re-embedded; chunks that disappeared are deleted.
             
         Returns:
             Dict with indexing results
@@ -240,6 +586,13 @@ class RAGSystem:
                                     key="metadata.doc_id",
                                     match=qdrant_models.MatchValue(value=doc_id)
                                 )
+                            ],
+                            # Chunks stored by the parser without embeddings do not count
+                            must_not=[
+                                qdrant_models.FieldCondition(
+                                    key="is_placeholder",
+                                    match=qdrant_models.MatchValue(value=True)
+                                )
                             ]
                         ),
                         limit=1
@@ -267,21 +620,25 @@ class RAGSystem:
                     "error": "Document parser not initialized"
                 }
             
-            # Retrieve document chunks from the parser
+            # Retrieve document chunks from the parser as a stream where possible
             # Try different methods that might exist on the parser
             chunks = None
             try:
-                # First try get_document_chunks
-                if hasattr(document_parser, 'get_document_chunks'):
-                    chunks = document_parser.get_document_chunks(doc_id)
+                # First try the paginated chunk generator
+                if hasattr(document_parser, 'iter_document_chunks'):
+                    chunks = self._peek_chunks(document_parser.iter_document_chunks(doc_id))
+                    
+                # Then get_document_chunks
+                elif hasattr(document_parser, 'get_document_chunks'):
+                    chunks = self._peek_chunks(document_parser.get_document_chunks(doc_id))
                     
                 # If that fails, try get_chunks
                 elif hasattr(document_parser, 'get_chunks'):
-                    chunks = document_parser.get_chunks(doc_id)
+                    chunks = self._peek_chunks(document_parser.get_chunks(doc_id))
                     
                 # Try other potential methods
                 elif hasattr(document_parser, 'retrieve_chunks'):
-                    chunks = document_parser.retrieve_chunks(doc_id)
+                    chunks = self._peek_chunks(document_parser.retrieve_chunks(doc_id))
                     
                 # Last resort: try to get the document and split it ourselves
                 elif hasattr(document_parser, 'get_document'):
@@ -302,9 +659,9 @@ class RAGSystem:
                                             'chunk_index': len(text_chunks)
                                         }
                                     })
-                            chunks = text_chunks
+                            chunks = self._peek_chunks(text_chunks)
                 
-                # If still no chunks, try to get them directly from Qdrant
+                # If still no chunks, try to stream them directly from Qdrant
                 if not chunks:
                     logger.info(f"No chunks found using parser methods, trying direct Qdrant query for doc_id={doc_id}")
                     try:
@@ -312,63 +669,12 @@ class RAGSystem:
                         collection_name = self.collection_name
                         if hasattr(document_parser, 'qdrant_collection_name'):
                             collection_name = document_parser.qdrant_collection_name
-                            
-                        # Query Qdrant directly to find chunks by doc_id
-                        chunk_points = self.client.scroll(
-                            collection_name=collection_name,
-                            scroll_filter=qdrant_models.Filter(
-                                must=[
-                                    qdrant_models.FieldCondition(
-                                        key="metadata.doc_id", 
-                                        match=qdrant_models.MatchValue(value=doc_id)
-                                    )
-                                ]
-                            ),
-                            limit=1000,
-                            with_payload=True,
-                            with_vectors=False
-                        )
-                        
-                        if chunk_points and len(chunk_points[0]) > 0:
-                            chunks = []
-                            for point in chunk_points[0]:
-                                payload = point.payload
-                                chunk = {
-                                    'text': payload.get('text', ''),
-                                    'content': payload.get('text', ''),
-                                    'metadata': payload.get('metadata', {})
-                                }
-                                chunks.append(chunk)
-                            logger.info(f"Retrieved {len(chunks)} chunks directly from Qdrant")
                         
-                        # Try alternate field structure 
-                        if not chunks:
-                            chunk_points = self.client.scroll(
-                                collection_name=collection_name,
-                                scroll_filter=qdrant_models.Filter(
-                                    must=[
-                                        qdrant_models.FieldCondition(
-                                            key="doc_id", 
-                                            match=qdrant_models.MatchValue(value=doc_id)
-                                        )
-                                    ]
-                                ),
-                                limit=1000,
-                                with_payload=True,
-                                with_vectors=False
-                            )
-                            
-                            if chunk_points and len(chunk_points[0]) > 0:
-                                chunks = []
-                                for point in chunk_points[0]:
-                                    payload = point.payload
-                                    chunk = {
-                                        'text': payload.get('text', ''),
-                                        'content': payload.get('text', ''),
-                                        'metadata': {'doc_id': doc_id}
-                                    }
-                                    chunks.append(chunk)
-                                logger.info(f"Retrieved {len(chunks)} chunks from Qdrant using direct doc_id field")
+                        chunks = self._peek_chunks(
+                            self.iter_document_chunks(doc_id, collection_name=collection_name)
+                        )
+                        if chunks:
+                            logger.info(f"Streaming chunks for document {doc_id} directly from Qdrant")
                     except Exception as qdrant_error:
                         logger.warning(f"Error querying Qdrant directly: {str(qdrant_error)}")
                         
@@ -377,10 +683,12 @@ class RAGSystem:
                         logger.info("Adding delay and retrying chunk retrieval")
                         try:
                             time.sleep(1)  # Small delay to allow any potential async operations to complete
-                            if hasattr(document_parser, 'get_document_chunks'):
-                                chunks = document_parser.get_document_chunks(doc_id)
-                                if chunks:
-                                    logger.info(f"Successfully retrieved {len(chunks)} chunks after delay")
+                            if hasattr(document_parser, 'iter_document_chunks'):
+                                chunks = self._peek_chunks(document_parser.iter_document_chunks(doc_id))
+                            elif hasattr(document_parser, 'get_document_chunks'):
+                                chunks = self._peek_chunks(document_parser.get_document_chunks(doc_id))
+                            if chunks:
+                                logger.info(f"Successfully retrieved chunks for document {doc_id} after delay")
                         except Exception as retry_error:
                             logger.warning(f"Error in retry chunk retrieval: {str(retry_error)}")
                 
@@ -393,7 +701,7 @@ class RAGSystem:
                     "error": str(e)
                 }
             
-            if not chunks or len(chunks) == 0:
+            if not chunks:
                 logger.warning(f"No chunks found for document {doc_id}")
                 return {
                     "status": "error",
@@ -402,133 +710,491 @@ class RAGSystem:
                     "error": "No chunks found"
                 }
             
-            logger.info(f"Retrieved {len(chunks)} chunks for document {doc_id}")
+            logger.info(f"Streaming chunks for document {doc_id} into the index")
+            
+            result = self.index_chunks(doc_id, chunks)
+            result["duration_seconds"] = time.time() - start_time
+            return result
+        except Exception as e:
+            logger.error(f"Error indexing document {doc_id}: {str(e)}")
+            return {
+                "status": "error",
+                "doc_id": doc_id,
+                "message": f"Error indexing document: {str(e)}",
+                "error": str(e)
+            }
+
+    def index_chunks(self, doc_id: str, chunks: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Embed and store chunks for a document, diffing against the points already stored.
+        
+        Used by index_document and by the document parser's single-pass ingest. Chunks are
+        consumed as a stream and flushed every upsert_batch_size new or changed chunks, so a
+        generator keeps memory flat regardless of document size.
+        
+        Args:
+            doc_id: Document ID the chunks belong to
+            chunks: Chunk dicts (list or iterator) with 'text' or 'content' and optional 'metadata'
             
-            # Convert chunks to LlamaIndex nodes
-            nodes = []
-            for chunk in chunks:
-                # Extract content and metadata
-                content = chunk.get('content') or chunk.get('text', '')
-                chunk_metadata = chunk.get('metadata', {})
+        Returns:
+            Dict with indexing results. If some new or changed chunks could not be stored,
+            the status is "partial" (or "error" if none were) and the stale points are kept,
+            so a failed batch never loses the old copy of a chunk.
+        """
+        start_time = time.time()
+        
+        vector_count = 0
+        unchanged_count = 0
+        deleted_count = 0
+        missing_ids = set()
+        batch_timings = []
+        try:
+            # Diff against what is already stored for this document
+            existing_ids = self._get_indexed_point_ids(doc_id)
+            wanted_ids = set()
+            stored_ids = set()
+            pending_nodes = []
+            lexical_chunks = []
+            
+            def flush_lexical() -> None:
+                """Write the buffered chunk texts to the BM25 index."""
+                try:
+                    self.bm25_index.add_chunks(doc_id, lexical_chunks)
+                except Exception as e:
+                    logger.warning(f"Error updating BM25 index for document {doc_id}: {str(e)}")
+                lexical_chunks.clear()
+            
+            def flush_nodes() -> int:
+                """Embed and upsert the pending nodes."""
+                with self.chunk_write_lock.hold(exclusive=False):
+                    # Never write dense-only points into a collection migrated by another process
+                    self.refresh_sparse_vectors_ready()
+                    flushed_ids, timings = self._index_nodes_in_batches(pending_nodes, doc_id)
+                for timing in timings:
+                    timing["batch"] += len(batch_timings)
+                batch_timings.extend(timings)
+                pending_nodes.clear()
+                stored_ids.update(flushed_ids)
+                return len(flushed_ids)
+            
+            for chunk_index, chunk in enumerate(chunks):
+                node = self._chunk_to_node(doc_id, chunk, chunk_index)
+                if node is None or node.node_id in wanted_ids:
+                    continue
+                wanted_ids.add(node.node_id)
                 
-                # Ensure doc_id is in metadata
-                chunk_metadata['doc_id'] = doc_id
+                # Unchanged chunks are written too, so documents indexed before the BM25 index existed are picked up
+                if self.bm25_index is not None:
+                    lexical_chunks.append((
+                        node.node_id,
+                        node.get_content(),
+                        guess_language(node.get_content(), node.metadata.get('language'))
+                    ))
+                    if len(lexical_chunks) >= self.upsert_batch_size:
+                        flush_lexical()
                 
-                # Create TextNode
-                node = TextNode(
-                    text=content,
-                    metadata=chunk_metadata
+                if node.node_id in existing_ids:
+                    unchanged_count += 1
+                    continue
+                
+                pending_nodes.append(node)
+                if len(pending_nodes) >= self.upsert_batch_size:
+                    vector_count += flush_nodes()
+            
+            if pending_nodes:
+                vector_count += flush_nodes()
+            if lexical_chunks:
+                flush_lexical()
+            
+            # Only replace the old points once every wanted chunk is stored
+            missing_ids = wanted_ids - existing_ids - stored_ids
+            if missing_ids:
+                logger.error(
+                    f"Document {doc_id}: {len(missing_ids)} chunks could not be stored, "
+                    f"keeping {len(existing_ids - wanted_ids)} stale points"
                 )
-                nodes.append(node)
-            
-            # Index nodes
-            vector_count = 0
-            if nodes:
-                # Get the index
+                stale_ids = []
+            else:
+                # Remove points for chunks that no longer exist (or were written with random IDs)
+                stale_ids = list(existing_ids - wanted_ids)
+            for batch_start in range(0, len(stale_ids), self.upsert_batch_size):
+                stale_batch = stale_ids[batch_start:batch_start + self.upsert_batch_size]
+                with self.chunk_write_lock.hold(exclusive=False):
+                    self.client.delete(
+                        collection_name=self.collection_name,
+                        points_selector=qdrant_models.PointIdsList(points=stale_batch)
+                    )
+                deleted_count += len(stale_batch)
+            if stale_ids and self.bm25_index is not None:
                 try:
-                    if force:
-                        # Delete existing document nodes first
-                        self.client.delete(
-                            collection_name=self.collection_name,
-                            points_selector=qdrant_models.Filter(
-                                must=[
-                                    qdrant_models.FieldCondition(
-                                        key="metadata.doc_id",
-                                        match=qdrant_models.MatchValue(value=doc_id)
-                                    )
-                                ]
-                            )
-                        )
-                        logger.info(f"Deleted existing nodes for document {doc_id}")
-                    
-                    # Index nodes
-                    for node in nodes:
-                        try:
-                            # Get embedding for node
-                            embedding = self.embed_model.get_text_embedding(node.get_content())
-                            
-                            # Generate a unique ID for the node
-                            node_id = str(uuid.uuid4())
-                            
-                            # Create payload with text and metadata
-                            payload = {
-                                "text": node.get_content(),
-                                "metadata": node.metadata
-                            }
-                            
-                            # Store in Qdrant
-                            self.client.upsert(
-                                collection_name=self.collection_name,
-                                points=[
-                                    qdrant_models.PointStruct(
-                                        id=node_id,
-                                        vector=embedding,
-                                        payload=payload
-                                    )
-                                ]
-                            )
-                            vector_count += 1
-                        except Exception as e:
-                            logger.error(f"Error indexing node: {str(e)}")
-                
-                    logger.info(f"Indexed {vector_count} vectors for document {doc_id}")
-                except Exception as index_error:
-                    logger.error(f"Error during indexing: {str(index_error)}")
-                    return {
-                        "status": "error",
-                        "doc_id": doc_id,
-                        "message": f"Error during indexing: {str(index_error)}",
-                        "error": str(index_error)
-                    }
+                    self.bm25_index.delete_points(stale_ids)
+                except Exception as e:
+                    logger.warning(f"Error removing stale chunks from BM25 index: {str(e)}")
             
-            duration = time.time() - start_time
+            if not missing_ids and (vector_count or deleted_count):
+                self.index_generation.bump()
+            logger.info(
+                f"Document {doc_id}: {vector_count} new or changed chunks indexed, "
+                f"{unchanged_count} unchanged, {deleted_count} stale points deleted"
+            )
+        except Exception as index_error:
+            logger.error(f"Error during indexing: {str(index_error)}")
             return {
-                "status": "success",
+                "status": "error",
                 "doc_id": doc_id,
-                "message": f"Document indexed successfully in {duration:.2f} seconds",
-                "vector_count": vector_count,
-                "duration_seconds": duration
+                "message": f"Error during indexing: {str(index_error)}",
+                "error": str(index_error)
             }
-        except Exception as e:
-            logger.error(f"Error indexing document {doc_id}: {str(e)}")
+        
+        duration = time.time() - start_time
+        if missing_ids:
+            failed_batches = [timing for timing in batch_timings if timing.get("error")]
             return {
-                "status": "error",
+                "status": "partial" if vector_count else "error",
                 "doc_id": doc_id,
-                "message": f"Error indexing document: {str(e)}",
-                "error": str(e)
+                "message": (
+                    f"{len(missing_ids)} chunks could not be stored in {len(failed_batches)} failed batches; "
+                    f"stale points were kept"
+                ),
+                "error": "; ".join(timing["error"] for timing in failed_batches) or "Chunks not stored",
+                "vector_count": vector_count,
+                "failed_count": len(missing_ids),
+                "unchanged_count": unchanged_count,
+                "deleted_count": 0,
+                "duration_seconds": duration,
+                "batch_timings": batch_timings
             }
-    
-    def delete_document(self, doc_id: str) -> bool:
-        """Delete a document from the RAG system."""
-        try:
-            logger.info(f"Deleting document {doc_id} from vector store")
+        return {
+            "status": "success",
+            "doc_id": doc_id,
+            "message": f"Document indexed successfully in {duration:.2f} seconds",
+            "vector_count": vector_count,
+            "unchanged_count": unchanged_count,
+            "deleted_count": deleted_count,
+            "duration_seconds": duration,
+            "batch_timings": batch_timings
+        }
+
+    def _chunk_to_node(self, doc_id: str, chunk: Dict[str, Any], chunk_index: int) -> Optional[TextNode]:
+        """
+        Convert a chunk dict to a TextNode with a deterministic point ID.
+        
+        Args:
+            doc_id: Document ID the chunk belongs to
+            chunk: Chunk dict with 'text' or 'content' and optional 'metadata'
+            chunk_index: Position of the chunk in the document stream
             
-            # Delete points from Qdrant with matching doc_id in metadata
-            result = self.client.delete(
+        Returns:
+            TextNode, or None for chunks without text
+        """
+        # Extract content and metadata
+        content = chunk.get('content') or chunk.get('text', '')
+        chunk_metadata = dict(chunk.get('metadata') or {})
+        
+        # Skip chunks with empty text content
+        if not content or not content.strip():
+            return None
+        
+        # Ensure doc_id is in metadata
+        chunk_metadata['doc_id'] = doc_id
+        
+        # Derive the point ID from (doc_id, chunk_id, content hash) so unchanged
+        # chunks map onto the points already stored for them. The chunk_id is stored
+        # back so that reading the point again yields the same ID.
+        chunk_id = str(chunk_metadata.get('chunk_id') or chunk_metadata.get('chunk_index', chunk_index))
+        content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        chunk_metadata['chunk_id'] = chunk_id
+        chunk_metadata['content_hash'] = content_hash
+        
+        return TextNode(
+            id_=self._chunk_point_id(doc_id, chunk_id, content_hash),
+            text=content,
+            metadata=chunk_metadata
+        )
+
+    @staticmethod
+    def _peek_chunks(chunks: Optional[Iterable[Dict[str, Any]]]) -> Optional[Iterator[Dict[str, Any]]]:
+        """
+        Check whether a chunk source yields anything without consuming it.
+        
+        Args:
+            chunks: List or iterator of chunks, or None
+            
+        Returns:
+            Iterator over all chunks, or None if the source is empty
+        """
+        if chunks is None:
+            return None
+        chunk_iter = iter(chunks)
+        first_chunk = next(chunk_iter, None)
+        if first_chunk is None:
+            return None
+        return itertools.chain([first_chunk], chunk_iter)
+
+    def iter_document_chunks(
+        self,
+        doc_id: str,
+        page_size: Optional[int] = None,
+        collection_name: Optional[str] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream a document's stored chunks page by page using Qdrant's next page offset.
+        
+        Chunks are matched on metadata.doc_id, falling back to the root doc_id field for
+        points written without nested metadata.
+        
+        Args:
+            doc_id: Document ID
+            page_size: Points fetched per scroll call (defaults to scroll_page_size)
+            collection_name: Collection to read (defaults to the chunk collection)
+            
+        Yields:
+            Chunk dicts with 'text', 'content' and 'metadata'
+        """
+        page_size = max(1, page_size or self.scroll_page_size)
+        collection_name = collection_name or self.collection_name
+        
+        for key in ("metadata.doc_id", "doc_id"):
+            found = False
+            offset = None
+            while True:
+                points, offset = self.client.scroll(
+                    collection_name=collection_name,
+                    scroll_filter=qdrant_models.Filter(
+                        must=[
+                            qdrant_models.FieldCondition(
+                                key=key,
+                                match=qdrant_models.MatchValue(value=doc_id)
+                            )
+                        ]
+                    ),
+                    limit=page_size,
+                    offset=offset,
+                    with_payload=True,
+                    with_vectors=False
+                )
+                for point in points:
+                    found = True
+                    payload = point.payload or {}
+                    text = payload.get('text', '')
+                    # Points written by the LlamaIndex vector store keep the text in _node_content
+                    if not text and isinstance(payload.get('_node_content'), str):
+                        try:
+                            text = json.loads(payload['_node_content']).get('text', '')
+                        except (json.JSONDecodeError, TypeError, AttributeError):
+                            text = ''
+                    metadata = dict(payload.get('metadata') or {})
+                    metadata.setdefault('doc_id', doc_id)
+                    if payload.get('chunk_id') is not None:
+                        metadata.setdefault('chunk_id', payload['chunk_id'])
+                    yield {
+                        'text': text,
+                        'content': text,
+                        'metadata': metadata
+                    }
+                if offset is None:
+                    break
+            if found:
+                return
+
+    @staticmethod
+    def _chunk_point_id(doc_id: str, chunk_id: str, content_hash: str) -> str:
+        """
+        Build the deterministic Qdrant point ID for a chunk.
+        
+        Args:
+            doc_id: Document ID
+            chunk_id: Chunk identifier within the document
+            content_hash: SHA-256 hex digest of the chunk text
+            
+        Returns:
+            UUID string stable for identical (doc_id, chunk_id, content) triples
+        """
+        return str(uuid.uuid5(uuid.NAMESPACE_DNS, f"{doc_id}:{chunk_id}:{content_hash}"))
+
+    def _get_indexed_point_ids(self, doc_id: str) -> set:
+        """
+        Collect the IDs of all points currently stored for a document.
+        
+        Args:
+            doc_id: Document ID
+            
+        Returns:
+            Set of point IDs as strings
+        """
+        point_ids = set()
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
                 collection_name=self.collection_name,
-                points_selector=qdrant_models.Filter(
+                scroll_filter=qdrant_models.Filter(
                     must=[
                         qdrant_models.FieldCondition(
                             key="metadata.doc_id",
                             match=qdrant_models.MatchValue(value=doc_id)
                         )
                     ]
+                ),
+                limit=self.scroll_page_size,
+                offset=offset,
+                with_payload=False,
+                with_vectors=False
+            )
+            point_ids.update(str(point.id) for point in points)
+            if offset is None:
+                break
+        return point_ids
+
+    def _index_nodes_in_batches(self, nodes: List[TextNode], doc_id: str) -> Tuple[set, List[Dict[str, Any]]]:
+        """
+        Embed nodes in batches through the model's batch API and upsert them to Qdrant in bulk.
+
+        A failed embedding or upsert batch does not stop the others; it is reported in
+        its timing record's "error", and its nodes are missing from the returned IDs.
+
+        Args:
+            nodes: Nodes to embed and store
+            doc_id: Document ID the nodes belong to
+
+        Returns:
+            Tuple of (IDs of the points stored, per-batch timing records)
+        """
+        stored_ids = set()
+        batch_timings = []
+        pending_points = []
+        upsert_errors = []
+
+        def flush_points() -> Tuple[int, float]:
+            """Upsert pending points in chunks of upsert_batch_size."""
+            flushed = 0
+            upsert_start = time.time()
+            while pending_points:
+                points = pending_points[:self.upsert_batch_size]
+                del pending_points[:self.upsert_batch_size]
+                try:
+                    self.client.upsert(
+                        collection_name=self.collection_name,
+                        points=points
+                    )
+                    stored_ids.update(str(point.id) for point in points)
+                    flushed += len(points)
+                except Exception as e:
+                    logger.error(f"Error upserting {len(points)} points for document {doc_id}: {str(e)}")
+                    upsert_errors.append(f"upsert of {len(points)} points failed: {str(e)}")
+            return flushed, time.time() - upsert_start
+
+        for batch_number, batch_start in enumerate(range(0, len(nodes), self.embed_batch_size)):
+            batch = nodes[batch_start:batch_start + self.embed_batch_size]
+            texts = [node.get_content() for node in batch]
+
+            # Embed the whole batch in one model call
+            embed_start = time.time()
+            try:
+                embeddings = self.embed_model.get_text_embedding_batch(texts)
+            except Exception as e:
+                logger.error(f"Error embedding batch {batch_number} for document {doc_id}: {str(e)}")
+                batch_timings.append({
+                    "batch": batch_number,
+                    "node_count": len(batch),
+                    "embed_seconds": time.time() - embed_start,
+                    "upserted": 0,
+                    "upsert_seconds": 0.0,
+                    "error": f"embedding failed: {str(e)}"
+                })
+                continue
+            
+            # Sparse vectors are optional: points without one are still found by dense search
+            sparse_embeddings = [None] * len(batch)
+            if self.sparse_vectors_ready:
+                try:
+                    sparse_embeddings = self.sparse_encoder.embed_documents(texts)
+                except Exception as e:
+                    logger.warning(f"Error computing sparse vectors for batch {batch_number} of document {doc_id}: {str(e)}")
+            embed_seconds = time.time() - embed_start
+
+            for node, embedding, sparse_embedding in zip(batch, embeddings, sparse_embeddings):
+                vector = embedding
+                if sparse_embedding is not None:
+                    vector = {"": embedding, SPARSE_VECTOR_NAME: sparse_embedding}
+                pending_points.append(
+                    qdrant_models.PointStruct(
+                        id=node.node_id,
+                        vector=vector,
+                        payload={
+                            "doc_id": doc_id,
+                            "chunk_id": node.metadata.get("chunk_id"),
+                            "text": node.get_content(),
+                            "metadata": node.metadata
+                        }
+                    )
                 )
+
+            # Only hit Qdrant once enough points have accumulated, or on the last batch
+            upserted, upsert_seconds = 0, 0.0
+            is_last_batch = batch_start + self.embed_batch_size >= len(nodes)
+            if len(pending_points) >= self.upsert_batch_size or is_last_batch:
+                upserted, upsert_seconds = flush_points()
+
+            batch_timings.append({
+                "batch": batch_number,
+                "node_count": len(batch),
+                "embed_seconds": embed_seconds,
+                "upserted": upserted,
+                "upsert_seconds": upsert_seconds
+            })
+            if upsert_errors:
+                batch_timings[-1]["error"] = "; ".join(upsert_errors)
+                upsert_errors.clear()
+            logger.info(
+                f"Indexed batch {batch_number} for document {doc_id}: {len(batch)} nodes embedded in "
+                f"{embed_seconds:.2f}s, {upserted} points upserted in {upsert_seconds:.2f}s"
             )
+
+        # Flush anything left behind by a failed trailing embedding batch
+        if pending_points:
+            flush_points()
+            if upsert_errors:
+                batch_timings.append({
+                    "batch": len(batch_timings),
+                    "node_count": 0,
+                    "embed_seconds": 0.0,
+                    "upserted": 0,
+                    "upsert_seconds": 0.0,
+                    "error": "; ".join(upsert_errors)
+                })
+
+        return stored_ids, batch_timings
+
+    def delete_document(self, doc_id: str) -> bool:
+        """Delete a document from the RAG system."""
+        try:
+            logger.info(f"Deleting document {doc_id} from vector store")
             
-            # Try to also delete from metadata collection if it exists
-            try:
-                self.client.delete(
-                    collection_name=self.metadata_collection_name,
+            # Delete points from Qdrant with matching doc_id in metadata
+            with self.chunk_write_lock.hold(exclusive=False):
+                result = self.client.delete(
+                    collection_name=self.collection_name,
                     points_selector=qdrant_models.Filter(
                         must=[
                             qdrant_models.FieldCondition(
-                                key="doc_id",
+                                key="metadata.doc_id",
                                 match=qdrant_models.MatchValue(value=doc_id)
                             )
                         ]
                     )
                 )
+            
+            self.index_generation.bump()
+            
+            if self.bm25_index is not None:
+                try:
+                    self.bm25_index.delete_document(doc_id)
+                except Exception as e:
+                    logger.warning(f"Could not delete from BM25 index: {str(e)}")
+            
+            # Try to also delete the document's catalog record
+            try:
+                self.catalog.delete(doc_id)
             except Exception as e:
                 logger.warning(f"Could not delete from metadata collection: {str(e)}")
             
@@ -538,26 +1204,45 @@ class RAGSystem:
             logger.error(f"Error deleting document {doc_id}: {str(e)}")
             return False
     
-    def reindex_all_documents(self, force: bool = False) -> Dict[str, Any]:
-        """Reindex all documents in the RAG system."""
+    def reindex_all_documents(
+        self,
+        force: bool = False,
+        resume: bool = True,
+        claim: Optional[ReindexClaim] = None
+    ) -> Dict[str, Any]:
+        """
+        Reindex all documents in the RAG system.
+        
+        Documents are indexed in parallel by a bounded worker pool. Completed doc_ids are
+        checkpointed, so a run interrupted by a crash resumes where it stopped. Progress
+        can be followed with get_reindex_progress while the run is going, from any worker.
+        
+        Args:
+            force: Whether to reindex documents that are already indexed
+            resume: Whether to skip documents completed by a previous, interrupted run over
+                the same documents with the same force flag and indexing settings
+            claim: Run lock taken with claim_reindex before scheduling the run (taken here
+                if None); always released when this returns
+            
+        Returns:
+            Dict with reindexing results ("busy" status if another run is in progress)
+        """
+        if claim is None:
+            try:
+                claim = self.claim_reindex()
+            except RuntimeError as e:
+                return {"status": "busy", "message": str(e)}
         try:
             start_time = time.time()
             logger.info("Starting reindexing of all documents")
             
-            # Get document_parser from main application
-            from main import document_parser
-            if not document_parser:
-                return {
-                    "status": "error",
-                    "message": "Document parser not initialized",
-                    "error": "Document parser not initialized"
-                }
-                
-            # Get list of all document IDs from parser
+            # Get list of all document IDs
             try:
-                doc_ids = document_parser.get_all_document_ids()
+                doc_ids = self._get_all_document_ids()
             except Exception as e:
                 logger.error(f"Error getting document IDs: {str(e)}")
+                # Reported by /rag/reindex-progress, since a background run has no other output
+                self.reindexer.progress.finish("failed", f"Error getting document IDs: {str(e)}")
                 return {
                     "status": "error",
                     "message": f"Error getting document IDs: {str(e)}",
@@ -572,60 +1257,405 @@ class RAGSystem:
                     "count": 0,
                     "duration_seconds": time.time() - start_time
                 }
-                
-            # Reindex each document
-            results = []
-            success_count = 0
-            error_count = 0
             
-            for doc_id in doc_ids:
-                try:
-                    result = self.index_document(doc_id, force=force)
-                    results.append(result)
-                    
-                    if result.get("status") == "success":
-                        success_count += 1
-                    else:
-                        error_count += 1
-                except Exception as e:
-                    logger.error(f"Error reindexing document {doc_id}: {str(e)}")
-                    error_count += 1
-                    results.append({
-                        "status": "error",
-                        "doc_id": doc_id,
-                        "message": f"Error: {str(e)}",
-                        "error": str(e)
-                    })
+            # Reindex in parallel; only counters and a bounded list of failures are kept
+            progress = self.reindexer.run(
+                doc_ids,
+                index_fn=lambda doc_id: self.index_document(doc_id, force=force),
+                resume=resume,
+                claim=claim,
+                options={
+                    "force": force,
+                    "embedding_model": self.embedding_model_name,
+                    "chunk_size": self.doc_chunk_size,
+                    "chunk_overlap": self.doc_chunk_overlap,
+                }
+            )
             
-            duration = time.time() - start_time
             return {
                 "status": "success",
-                "message": f"Reindexed {success_count} documents successfully, {error_count} failed",
+                "message": progress["message"],
                 "count": len(doc_ids),
-                "success_count": success_count,
-                "error_count": error_count,
-                "duration_seconds": duration,
-                "results": results
+                "success_count": progress["succeeded"],
+                "error_count": progress["failed"],
+                "resumed_count": progress["resumed"],
+                "docs_per_second": progress["docs_per_second"],
+                "duration_seconds": time.time() - start_time,
+                "failures": progress["failures"]
             }
         except Exception as e:
             logger.error(f"Error reindexing documents: {str(e)}")
+            self.reindexer.progress.finish("failed", str(e))
             return {
                 "status": "error",
                 "message": f"Error reindexing documents: {str(e)}",
                 "error": str(e)
             }
+        finally:
+            claim.release()
+    
+    def claim_reindex(self) -> ReindexClaim:
+        """
+        Take the reindex run lock shared by every API and Celery worker.
+        
+        Raises:
+            RuntimeError: If a reindex run is already in progress
+        """
+        return self.reindexer.claim()
+    
+    def get_reindex_progress(self) -> Dict[str, Any]:
+        """Return the progress of the current or last reindex run, with docs/sec and ETA."""
+        return self.reindexer.snapshot()
+    
+    @property
+    def is_reindexing(self) -> bool:
+        """Whether a reindex run is in progress in any process."""
+        return self.reindexer.is_running
+    
+    def _get_all_document_ids(self) -> List[str]:
+        """
+        List the IDs of all known documents.
+        
+        Uses the document parser when it can enumerate documents, otherwise pages
+        through the document catalog.
+        
+        Returns:
+            List of document IDs
+        """
+        from main import document_parser
+        if document_parser and hasattr(document_parser, 'get_all_document_ids'):
+            return list(document_parser.get_all_document_ids())
+        
+        return self.catalog.document_ids()
+    
+    @staticmethod
+    def _is_placeholder_vector(vector: Any) -> bool:
+        """
+        Check whether a stored vector is one of the parser's constant dummy vectors.
+
+        Qdrant normalizes vectors in cosine collections, so [1.0] * dim is stored as a
+        constant vector of 1/sqrt(dim); any constant vector is treated as a placeholder.
+        """
+        if isinstance(vector, dict):
+            vector = vector.get("", None) or next(iter(vector.values()), None)
+        if not isinstance(vector, list) or not vector:
+            return False
+        return (max(vector) - min(vector)) < 1e-6
+
+    def migrate_placeholder_points(self, page_size: int = 256) -> Dict[str, Any]:
+        """
+        Remove the dummy-vector chunk points left behind by the two-pass ingest.
+
+        Every document that still has placeholder points is re-indexed first, so its
+        chunks are embedded once under their deterministic IDs; the diff in
+        index_chunks then deletes the placeholder copies. Placeholders that survive
+        (e.g. because the document could not be re-indexed) are reported, not deleted.
+
+        Args:
+            page_size: Number of points fetched per scroll page
+
+        Returns:
+            Dict with migration results
+        """
+        try:
+            start_time = time.time()
+            logger.info(f"Scanning {self.collection_name} for placeholder vectors")
+
+            # Collect the documents that still have placeholder points
+            placeholder_docs = {}
+            offset = None
+            while True:
+                points, offset = self.client.scroll(
+                    collection_name=self.collection_name,
+                    limit=page_size,
+                    offset=offset,
+                    with_payload=True,
+                    with_vectors=True
+                )
+                for point in points:
+                    payload = point.payload or {}
+                    if payload.get("is_placeholder") or self._is_placeholder_vector(point.vector):
+                        doc_id = payload.get("doc_id") or (payload.get("metadata") or {}).get("doc_id")
+                        placeholder_docs.setdefault(doc_id, []).append(point.id)
+                if offset is None:
+                    break
+
+            placeholder_count = sum(len(ids) for ids in placeholder_docs.values())
+            logger.info(f"Found {placeholder_count} placeholder points across {len(placeholder_docs)} documents")
+
+            migrated_docs = 0
+            failed_docs = []
+            for doc_id in placeholder_docs:
+                if not doc_id:
+                    failed_docs.append({"doc_id": None, "error": "Placeholder points without doc_id"})
+                    continue
+                result = self.index_document(doc_id, force=True)
+                if result.get("status") == "success":
+                    migrated_docs += 1
+                else:
+                    failed_docs.append({"doc_id": doc_id, "error": result.get("message", "Unknown error")})
+
+            duration = time.time() - start_time
+            return {
+                "status": "success",
+                "message": f"Migrated {migrated_docs} documents, {len(failed_docs)} failed",
+                "placeholder_points": placeholder_count,
+                "document_count": len(placeholder_docs),
+                "migrated_count": migrated_docs,
+                "failed": failed_docs,
+                "duration_seconds": duration
+            }
+        except Exception as e:
+            logger.error(f"Error migrating placeholder points: {str(e)}")
+            return {
+                "status": "error",
+                "message": f"Error migrating placeholder points: {str(e)}",
+                "error": str(e)
+            }
+
+    def migrate_to_sparse_vectors(self) -> Dict[str, Any]:
+        """
+        Copy the chunk collection into one with the named sparse vector, backfilling sparse vectors.
+        
+        Points are copied with their dense vectors to '<collection_name>_hybrid', with sparse
+        vectors computed from the stored chunk text, while indexing goes on. Points written,
+        updated or deleted during the copy are then synced by comparing payload and vector
+        digests, once while writes go on and once more with chunk writes paused across the
+        API and Celery workers. With writes still paused, the point counts are compared,
+        the old collection is dropped and '<collection_name>' becomes an alias of the new
+        one. A crash between the drop and the alias is repaired on the next start or run. Only one migration runs at
+        a time; re-running one after a failure is safe because copies are idempotent upserts.
+        
+        Returns:
+            Dict with migration results ("busy" status if another migration is running)
+        """
+        if self.sparse_encoder is None:
+            return {"status": "error", "message": "Sparse vectors are disabled"}
+        
+        try:
+            with self.sparse_migration_lock.hold(blocking=False):
+                return self._migrate_to_sparse_vectors()
+        except LockBusy:
+            return {"status": "busy", "message": "A sparse vector migration is already in progress"}
+    
+    @property
+    def is_migrating_sparse_vectors(self) -> bool:
+        """Whether a sparse vector migration is running in any process."""
+        return self.sparse_migration_lock.is_locked()
+    
+    def _migrate_to_sparse_vectors(self) -> Dict[str, Any]:
+        """Run the sparse vector migration; the caller holds the migration lock."""
+        target_name = f"{self.collection_name}_hybrid"
+        if self._recover_chunk_alias() or self._has_sparse_vectors(self.collection_name):
+            self.sparse_vectors_ready = True
+            return {"status": "success", "message": f"{self.collection_name} already has sparse vectors", "copied": 0}
+        
+        try:
+            start_time = time.time()
+            source_config = self.client.get_collection(self.collection_name).config
+            logger.info(f"Migrating chunk collection {self.collection_name} to {target_name} with sparse vectors")
+            
+            if target_name not in [c.name for c in self.client.get_collections().collections]:
+                self.client.create_collection(
+                    collection_name=target_name,
+                    vectors_config=source_config.params.vectors,
+                    sparse_vectors_config=self._sparse_vectors_config(),
+                    quantization_config=source_config.quantization_config
+                )
+            self._ensure_payload_indexes(target_name, CHUNK_PAYLOAD_INDEXES)
+            
+            copied = 0
+            offset = None
+            while True:
+                points, offset = self.client.scroll(
+                    collection_name=self.collection_name,
+                    limit=self.scroll_page_size,
+                    offset=offset,
+                    with_payload=True,
+                    with_vectors=True
+                )
+                if points:
+                    self._copy_points_with_sparse(points, target_name)
+                    copied += len(points)
+                    logger.info(f"Copied {copied} points to {target_name}")
+                if offset is None:
+                    break
+            
+            # Catch up with the writes made during the copy while writes go on, so the
+            # final sync with writes paused only has the last few changes to copy
+            synced, removed = self._sync_point_delta(self.collection_name, target_name)
+            
+            # Pause chunk writes everywhere until the alias points at the new collection
+            with self.chunk_write_lock.hold(exclusive=True):
+                final_synced, final_removed = self._sync_point_delta(self.collection_name, target_name)
+                synced += final_synced
+                removed += final_removed
+                source_count = self.client.count(collection_name=self.collection_name, exact=True).count
+                target_count = self.client.count(collection_name=target_name, exact=True).count
+                if source_count != target_count:
+                    raise RuntimeError(
+                        f"{target_name} has {target_count} points but {self.collection_name} has {source_count}; "
+                        f"keeping {self.collection_name}"
+                    )
+                
+                self.client.delete_collection(collection_name=self.collection_name)
+                if not self._recover_chunk_alias():
+                    raise RuntimeError(f"Could not alias {self.collection_name} to {target_name}")
+                self.sparse_vectors_ready = True
+            self.index_generation.bump()
+            
+            duration = time.time() - start_time
+            logger.info(
+                f"Migrated {copied} chunks to {target_name} ({synced} written and {removed} deleted "
+                f"during the copy), aliased as {self.collection_name}"
+            )
+            return {
+                "status": "success",
+                "message": f"Migrated {copied + synced} chunks to {target_name}",
+                "copied": copied + synced,
+                "removed": removed,
+                "collection_name": target_name,
+                "duration_seconds": duration
+            }
+        except Exception as e:
+            logger.error(f"Error migrating to sparse vectors: {str(e)}")
+            return {
+                "status": "error",
+                "message": f"Error migrating to sparse vectors: {str(e)}",
+                "error": str(e)
+            }
+    
+    def _copy_points_with_sparse(self, points: List[Any], target_name: str) -> None:
+        """Upsert points into target_name with sparse vectors computed from their chunk text."""
+        texts = [self._point_to_node(point, 0.0).node.get_content() for point in points]
+        sparse_embeddings = self.sparse_encoder.embed_documents(texts)
+        target_points = []
+        for point, text, sparse_embedding in zip(points, texts, sparse_embeddings):
+            vector = point.vector
+            # Placeholder points and empty chunks keep their dense vector only
+            if text and not (point.payload or {}).get("is_placeholder"):
+                vector = {"": point.vector, SPARSE_VECTOR_NAME: sparse_embedding}
+            target_points.append(
+                qdrant_models.PointStruct(id=point.id, vector=vector, payload=point.payload or {})
+            )
+        self.client.upsert(collection_name=target_name, points=target_points, wait=True)
+    
+    @staticmethod
+    def _point_digest(point: Any) -> str:
+        """Digest a point's payload and dense vector, to tell whether two copies of it differ."""
+        vector = point.vector.get("") if isinstance(point.vector, dict) else point.vector
+        digest = hashlib.sha256(json.dumps(point.payload or {}, sort_keys=True, default=str).encode("utf-8"))
+        if vector is not None:
+            # Rounded: Qdrant may renormalize a copied cosine vector in the last bits
+            digest.update(np.round(np.asarray(vector, dtype=np.float32), 5).tobytes())
+        return digest.hexdigest()
+    
+    def _collection_point_digests(self, collection_name: str) -> Dict[Any, str]:
+        """Map the ID of every point in a collection to its payload and vector digest."""
+        digests = {}
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=collection_name,
+                limit=self.scroll_page_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True
+            )
+            for point in points:
+                digests[point.id] = self._point_digest(point)
+            if offset is None:
+                break
+        return digests
+    
+    def _sync_point_delta(self, source_name: str, target_name: str) -> Tuple[int, int]:
+        """
+        Bring target_name in line with source_name after a copy made while writes went on.
+        
+        Point IDs are derived from the chunk content, but a point's payload or vector can
+        still change under the same ID (e.g. a placeholder point replaced by the embedded
+        chunk, or metadata rewritten by a forced reindex), so points are compared by a
+        digest of their payload and dense vector: points missing from target_name or
+        different there are copied again, and points missing from source_name are deleted.
+        
+        Returns:
+            Tuple of (points copied, points deleted)
+        """
+        source_digests = self._collection_point_digests(source_name)
+        target_digests = self._collection_point_digests(target_name)
+        missing_ids = [point_id for point_id, digest in source_digests.items() if target_digests.get(point_id) != digest]
+        extra_ids = [point_id for point_id in target_digests if point_id not in source_digests]
+        
+        for batch_start in range(0, len(missing_ids), self.scroll_page_size):
+            points = self.client.retrieve(
+                collection_name=source_name,
+                ids=missing_ids[batch_start:batch_start + self.scroll_page_size],
+                with_payload=True,
+                with_vectors=True
+            )
+            if points:
+                self._copy_points_with_sparse(points, target_name)
+        for batch_start in range(0, len(extra_ids), self.scroll_page_size):
+            self.client.delete(
+                collection_name=target_name,
+                points_selector=qdrant_models.PointIdsList(points=extra_ids[batch_start:batch_start + self.scroll_page_size])
+            )
+        return len(missing_ids), len(extra_ids)
+    
+    def _recover_chunk_alias(self) -> bool:
+        """
+        Point the chunk collection name at its migrated copy if the name is unassigned.
+        
+        Returns:
+            True if the name now aliases '<collection_name>_hybrid'
+        """
+        target_name = f"{self.collection_name}_hybrid"
+        try:
+            collection_names = [c.name for c in self.client.get_collections().collections]
+            aliases = {a.alias_name: a.collection_name for a in self.client.get_aliases().aliases}
+            if aliases.get(self.collection_name) == target_name:
+                return True
+            if self.collection_name in collection_names or self.collection_name in aliases:
+                return False
+            if target_name not in collection_names:
+                return False
+            logger.warning(f"{self.collection_name} is missing; aliasing it to the migrated collection {target_name}")
+            self.client.update_collection_aliases(
+                change_aliases_operations=[
+                    qdrant_models.CreateAliasOperation(
+                        create_alias=qdrant_models.CreateAlias(
+                            collection_name=target_name,
+                            alias_name=self.collection_name
+                        )
+                    )
+                ]
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Error restoring the {self.collection_name} alias: {str(e)}")
+            return False
     
     def _apply_context_reranking(
         self, 
         nodes: List[NodeWithScore], 
-        query: str
+        query: str,
+        query_embedding: Optional[List[float]] = None,
+        reranker: Optional[str] = None
     ) -> List[NodeWithScore]:
         """
-        Apply advanced reranking for Reliable RAG.
+        Apply advanced reranking for Reliable RAG to already retrieved nodes.
+        
+        Runs the post-retrieval stages of the retrieval pipeline (dedupe, rerank,
+        compress, diversify, length-normalize) over the given nodes, skipping those
+        the nodes have already been through, so ranked nodes are never reranked or
+        compressed twice.
         
         Args:
-            nodes: List of nodes with scores
+            nodes: List of nodes with scores. Nodes that carry their stored vector
+                (node.node.embedding) are not re-embedded.
             query: User query
+            query_embedding: Query embedding already computed for retrieval, if any
+            reranker: Relevance reranking mode for this call (defaults to self.reranker)
             
         Returns:
             Processed and reranked nodes
@@ -633,355 +1663,430 @@ class RAGSystem:
         if not nodes:
             return []
         
-        try:
-            # Step 1: Initial semantic relevancy scoring using embedding similarity
-            logger.info(f"Applying advanced Reliable RAG reranking for {len(nodes)} nodes")
-            
-            # Get query embedding once
-            query_embedding = self.embed_model.get_text_embedding(query)
+        state = self.retrieval_pipeline.run(
+            query,
+            top_k=len(nodes),
+            candidates=nodes,
+            query_embedding=query_embedding,
+            reranker=reranker
+        )
+        return state.nodes
+    
+    def _score_nodes(
+        self,
+        nodes: List[NodeWithScore],
+        query_vector: np.ndarray
+    ) -> List[Tuple[NodeWithScore, float]]:
+        """
+        Score nodes by embedding similarity to the query (bi-encoder step).
+        
+        All nodes are scored with one matrix-vector product over their vectors, then
+        normalized against the best score.
+        
+        Args:
+            nodes: Candidate nodes
+            query_vector: Query embedding
             
-            # Score each node by comparing embeddings directly (bi-encoder step)
-            node_scores = []
-            all_similarity_scores = []
+        Returns:
+            (node, normalized score) pairs in the input order
+        """
+        node_scores = []
+        all_similarity_scores = []
+        try:
+            candidate_matrix = self._node_embedding_matrix(nodes)
+            similarities = self._cosine_scores(candidate_matrix, query_vector)
+            all_similarity_scores = [float(score) for score in similarities]
+            node_scores = list(zip(nodes, all_similarity_scores))
+        except Exception as e:
+            logger.warning(f"Error scoring nodes: {str(e)}")
+            # Use original scores as fallback
+            node_scores = [(node, float(node.score or 0.5)) for node in nodes]
+        
+        # Apply score normalization to bi-encoder results
+        max_similarity = max(all_similarity_scores) if all_similarity_scores else 0.5
+        normalized_node_scores = []
+        
+        for node, score in node_scores:
+            # Min-max normalization with boost (negative similarities count as 0)
+            normalized_score = (max(score, 0.0) / max(max_similarity, 0.0001)) ** 0.5  # Square root to boost lower values
+            normalized_node_scores.append((node, float(normalized_score)))
             
-            for node in nodes:
-                try:
-                    # Get text content from node
-                    text = node.node.get_content()
-                    
-                    # Get embedding for text
-                    text_embedding = self.embed_model.get_text_embedding(text)
-                    
-                    # Calculate cosine similarity
-                    from numpy import dot
-                    from numpy.linalg import norm
-                    import numpy as np
-                    
-                    if isinstance(query_embedding, list) and isinstance(text_embedding, list):
-                        # Convert to numpy arrays to handle calculations properly
-                        query_array = np.array(query_embedding)
-                        text_array = np.array(text_embedding)
-                        
-                        # Ensure we get a real number by taking the real part if complex
-                        dot_product = np.dot(query_array, text_array)
-                        if isinstance(dot_product, complex):
-                            dot_product = dot_product.real
-                            
-                        norm_query = np.linalg.norm(query_array)
-                        norm_text = np.linalg.norm(text_array)
-                        
-                        # Avoid division by zero
-                        if norm_query > 0 and norm_text > 0:
-                            cos_sim = float(dot_product / (norm_query * norm_text))
-                        else:
-                            cos_sim = 0.0
-                            
-                        # Convert numpy types to Python native types
-                        if isinstance(cos_sim, (np.float32, np.float64)):
-                            cos_sim = float(cos_sim)
-                        elif isinstance(cos_sim, complex):
-                            cos_sim = float(cos_sim.real)
-                        relevancy_score = float(cos_sim)  # Convert to float to ensure it's JSON serializable
-                        all_similarity_scores.append(relevancy_score)
-                    else:
-                        # Fallback to original score
-                        relevancy_score = float(node.score or 0.5)
-                        
-                    # Create score entry
-                    node_scores.append((node, relevancy_score))
-                except Exception as e:
-                    logger.warning(f"Error scoring node: {str(e)}")
-                    # Use original score as fallback
-                    node_scores.append((node, float(node.score or 0.5)))
-            
-            # Apply score normalization to bi-encoder results
-            max_similarity = max(all_similarity_scores) if all_similarity_scores else 0.5
-            normalized_node_scores = []
-            
-            for node, score in node_scores:
-                # Min-max normalization with boost
-                normalized_score = (score / max(max_similarity, 0.0001)) ** 0.5  # Square root to boost lower values
-                normalized_node_scores.append((node, float(normalized_score)))
-                
-            node_scores = normalized_node_scores
+        return normalized_node_scores
+    
+    def _refine_relevance_scores(
+        self,
+        node_scores: List[Tuple[NodeWithScore, float]],
+        query: str,
+        reranker: Optional[str] = None
+    ) -> List[Tuple[NodeWithScore, float]]:
+        """
+        Refine bi-encoder scores with the cross-encoder or the LLM scorer.
+        
+        A local cross-encoder scores every candidate in one batch; the LLM scorer
+        (rating the top candidates) is kept as a fallback mode.
+        
+        Args:
+            node_scores: (node, normalized bi-encoder score) pairs
+            query: User query
+            reranker: Relevance reranking mode (defaults to self.reranker)
             
-            # Step 2: Contextual Compression - Focus on relevant information only
-            # Extract the most relevant sentences from each node
-            compressed_nodes = []
+        Returns:
+            (node, score) pairs in the input order
+        """
+        reranker = reranker or self.reranker
+        if not node_scores or reranker == "none":
+            return node_scores
+        
+        refined_scores = []
+        if reranker == "cross_encoder":
             try:
-                # Import re module inside this try block to ensure it's available in scope
-                import re
-                
-                for node, score in node_scores:
-                    text = node.node.get_content()
-                    
-                    # Split text into sentences
-                    sentences = re.split(r'(?<=[.!?])\s+', text)
-                    
-                    if len(sentences) <= 3:  # For very short nodes, keep as is
-                        compressed_nodes.append((node, float(score)))
-                        continue
-                    
-                    # Get relevance score for each sentence
-                    sentence_scores = []
-                    for sentence in sentences:
-                        if len(sentence.strip()) < 5:  # Skip very short sentences
-                            continue
-                            
-                        sent_embedding = self.embed_model.get_text_embedding(sentence)
-                        # Calculate similarity to query
-                        sent_sim = dot(query_embedding, sent_embedding) / (norm(query_embedding) * norm(sent_embedding))
-                        # Convert numpy types to Python native types
-                        if isinstance(sent_sim, (np.float32, np.float64)):
-                            sent_sim = float(sent_sim)
-                        elif isinstance(sent_sim, complex):
-                            sent_sim = float(sent_sim.real)
-                        sentence_scores.append((sentence, float(sent_sim)))
-                    
-                    # Select top sentences (50% of original or at least 3 sentences)
-                    top_k = max(3, len(sentences) // 2)
-                    top_sentences = sorted(sentence_scores, key=lambda x: x[1], reverse=True)[:top_k]
-                    
-                    # Reorder sentences to maintain original flow
-                    original_order = {}
-                    for i, s in enumerate([s for s, _ in top_sentences]):
-                        for j, orig_s in enumerate(sentences):
-                            if s == orig_s:
-                                original_order[s] = j
-                                break
-                    
-                    ordered_sentences = sorted(top_sentences, key=lambda x: original_order.get(x[0], 999))
-                    
-                    # Create new compressed text
-                    compressed_text = " ".join([s for s, _ in ordered_sentences])
-                    
-                    # Create new node with compressed text
-                    new_metadata = dict(node.node.metadata)
-                    new_metadata["compressed"] = True
-                    new_metadata["compression_ratio"] = float(len(compressed_text) / len(text))
-                    
-                    compressed_node = TextNode(
-                        text=compressed_text,
-                        metadata=new_metadata
-                    )
-                    
-                    # Adjust score slightly upward due to compression
-                    compressed_nodes.append((NodeWithScore(node=compressed_node, score=float(score * 1.05)), float(score * 1.05)))
-                
-                # If compression was successful, use compressed nodes
-                if compressed_nodes:
-                    node_scores = compressed_nodes
-                    logger.info(f"Applied contextual compression to {len(compressed_nodes)} nodes")
+                refined_scores = self._cross_encoder_relevance_scores(node_scores, query)
+            except Exception as e:
+                logger.warning(f"Cross-encoder unavailable, falling back to LLM relevance scoring: {str(e)}")
+                reranker = "llm"
+        
+        if reranker == "llm" and hasattr(self, 'llm'):
+            try:
+                refined_scores = self._llm_relevance_scores(node_scores, query)
             except Exception as e:
-                logger.warning(f"Error in contextual compression: {str(e)}, using original nodes")
+                logger.warning(f"Error in LLM relevance scoring: {str(e)}")
+        
+        if not refined_scores:
+            return node_scores
+        
+        # Replace the scores for the refined candidates
+        refined_dict = {id(node): float(score) for node, score in refined_scores}
+        logger.info(f"Applied {reranker} reranking with weighted combination to {len(refined_scores)} nodes")
+        return [(node, refined_dict.get(id(node), score)) for node, score in node_scores]
+    
+    def _diversity_lambda(self, query: str) -> float:
+        """
+        Choose the MMR relevance weight from a quick query complexity assessment.
+        
+        Args:
+            query: User query
             
-            # Step 3: Cross-encoder scoring for higher precision on top candidates
-            # This simulates a cross-encoder by using the LLM to evaluate relevance directly
-            if len(node_scores) > 0 and hasattr(self, 'llm'):
-                try:
-                    # Take top candidates from first stage for more expensive reranking
-                    top_k_first_stage = min(len(node_scores), 5)  # Limit to 5 for efficiency
-                    top_candidates = sorted(node_scores, key=lambda x: x[1], reverse=True)[:top_k_first_stage]
-                    
-                    refined_scores = []
-                    for node, initial_score in top_candidates:
-                        text = node.node.get_content()
-                        
-                        # Use LLM to assess relevance with specific criteria (more robust evaluation)
-                        prompt = f"""
-                        Evaluate how relevant the following text passage is to the query on a scale of 0 to 10.
-                        Consider these criteria:
-                        1. Semantic relevance to the query
-                        2. Contains specific information that helps answer the query
-                        3. Information quality and reliability
-                        4. Comprehensiveness of coverage related to the query
-                        
-                        Provide only a number as your answer.
-                        
-                        Query: {query}
-                        
-                        Text passage:
-                        {text[:500]}...
-                        
-                        Relevance score (0-10):
-                        """
-                        
-                        try:
-                            # Call LLM with low temperature for consistency
-                            response = self.llm.complete(prompt, temperature=0.1)
-                            response_text = response.text if hasattr(response, 'text') else str(response)
-                            
-                            # Extract the numeric score from the response
-                            import re
-                            score_match = re.search(r'(\d+(\.\d+)?)', response_text)
-                            if score_match:
-                                llm_score = float(score_match.group(1))
-                                # Normalize to 0-1 range
-                                llm_score = float(min(10, max(0, llm_score)) / 10)
-                                
-                                # Combine with initial score using weighted average instead of RRF
-                                # This works better with our normalized scores
-                                combined_score = 0.4 * initial_score + 0.6 * llm_score
-                                
-                                refined_scores.append((node, combined_score))
-                                
-                                # Add the LLM-based score to node metadata
-                                node.node.metadata["llm_relevance_score"] = float(llm_score)
-                                node.node.metadata["combined_score"] = float(combined_score)
-                            else:
-                                # If no score extracted, use the initial score
-                                refined_scores.append((node, float(initial_score)))
-                        except Exception as e:
-                            logger.warning(f"Error in LLM relevance scoring: {str(e)}")
-                            refined_scores.append((node, float(initial_score)))
-                    
-                    # Replace the scores for the top candidates
-                    if refined_scores:
-                        # Create a dictionary of node to score for quick lookup
-                        refined_dict = {id(node): float(score) for node, score in refined_scores}
-                        
-                        # Update the scores in the original list
-                        for i, (node, score) in enumerate(node_scores):
-                            if id(node) in refined_dict:
-                                node_scores[i] = (node, refined_dict[id(node)])
-                                
-                        logger.info(f"Applied cross-encoder reranking with weighted combination to {len(refined_scores)} nodes")
-                except Exception as e:
-                    logger.warning(f"Error in cross-encoder reranking: {str(e)}")
+        Returns:
+            Lambda for MMR (lower gives more weight to diversity)
+        """
+        # Quick query complexity assessment based on:
+        # - Number of distinct entities/concepts in the query
+        # - Presence of comparison or complex operators
+        # - Query length
+        
+        query_words = set(query.lower().split())
+        complexity_indicators = ["compare", "difference", "versus", "vs", "relationship", "how", "why", "explain"]
+        
+        complexity_score = 0.0
+        # Length factor
+        if len(query.split()) > 15:
+            complexity_score += 0.3
+        elif len(query.split()) > 8:
+            complexity_score += 0.2
+        
+        # Check for complexity indicators
+        for indicator in complexity_indicators:
+            if indicator in query_words:
+                complexity_score += 0.15
+        
+        # Adjust diversity vs relevance based on complexity
+        lambda_param = 0.7  # Default
+        if complexity_score > 0.3:
+            # More complex queries need more diverse context
+            lambda_param = 0.5  # Lower lambda gives more weight to diversity
+            logger.info(f"Complex query detected, adjusting diversity weight to {lambda_param}")
+        return lambda_param
+    
+    def _length_normalize(
+        self,
+        node_scores: List[Tuple[NodeWithScore, float]]
+    ) -> List[Tuple[NodeWithScore, float]]:
+        """
+        Apply length normalization to prevent bias towards longer passages.
+        
+        Args:
+            node_scores: (node, score) pairs
+            
+        Returns:
+            (node, normalized score) pairs in the input order
+        """
+        length_normalized = []
+        
+        for node, score in node_scores:
+            text = node.node.get_content()
+            text_length = len(text.split())
+            
+            # Advanced length normalization with diminishing penalty
+            length_factor = 1.0
+            if text_length < 20:  # Too short
+                length_factor = float(0.8 + (0.2 * text_length / 20))
+            elif text_length > 300:  # Too long
+                # Logarithmic penalty for very long texts to avoid severe penalties
+                length_factor = float(1.0 - 0.1 * math.log(1 + (text_length - 300) / 300))
+            
+            # Apply length normalization
+            normalized_score = float(score * length_factor)
+            
+            # Add to node metadata
+            node.node.metadata["original_score"] = float(score)
+            node.node.metadata["length_factor"] = float(length_factor)
+            node.node.metadata["final_score"] = float(normalized_score)
+            
+            length_normalized.append((node, normalized_score))
+        
+        return length_normalized
+    
+    def _compress_nodes(
+        self,
+        node_scores: List[Tuple[NodeWithScore, float]],
+        query_vector: np.ndarray
+    ) -> List[Tuple[NodeWithScore, float]]:
+        """
+        Keep only the sentences of each node that are most similar to the query.
+        
+        All sentences of all nodes are embedded in one batch and scored with a single
+        matrix product. Each node keeps its top half (at least 3) sentences, in their
+        original order.
+        
+        Args:
+            node_scores: (node, score) pairs to compress
+            query_vector: Query embedding
+            
+        Returns:
+            (node, score) pairs with compressed nodes, in the input order
+        """
+        # Split every node and collect the sentences worth scoring
+        split_nodes = []
+        batch_sentences = []
+        for node, score in node_scores:
+            text = node.node.get_content()
+            sentences = re.split(r'(?<=[.!?])\s+', text)
+            if len(sentences) <= 3:  # For very short nodes, keep as is
+                split_nodes.append((node, score, text, sentences, []))
+                continue
+            
+            # Skip very short sentences, remember the original position of the others
+            positions = [i for i, sentence in enumerate(sentences) if len(sentence.strip()) >= 5]
+            split_nodes.append((node, score, text, sentences, positions))
+            batch_sentences.extend(sentences[i] for i in positions)
+        
+        # Score all sentences against the query at once
+        sentence_scores = np.zeros(0)
+        if batch_sentences:
+            sentence_matrix = np.asarray(self.embed_model.get_text_embedding_batch(batch_sentences), dtype=np.float32)
+            sentence_scores = self._cosine_scores(sentence_matrix, query_vector)
+        
+        compressed_nodes = []
+        offset = 0
+        for node, score, text, sentences, positions in split_nodes:
+            if len(sentences) <= 3 or not positions:
+                compressed_nodes.append((node, float(score)))
+                continue
+            
+            scores = sentence_scores[offset:offset + len(positions)]
+            offset += len(positions)
+            
+            # Select top sentences (50% of original or at least 3 sentences), then restore their order
+            top_k = min(max(3, len(sentences) // 2), len(positions))
+            if top_k < len(positions):
+                top = np.argpartition(-scores, top_k - 1)[:top_k]
+            else:
+                top = np.arange(len(positions))
+            kept_positions = sorted(positions[i] for i in top)
+            
+            # Create new compressed text
+            compressed_text = " ".join(sentences[i] for i in kept_positions)
+            
+            # Create new node with compressed text
+            new_metadata = dict(node.node.metadata)
+            new_metadata["compressed"] = True
+            new_metadata["compression_ratio"] = float(len(compressed_text) / len(text))
+            
+            compressed_node = TextNode(
+                text=compressed_text,
+                metadata=new_metadata
+            )
+            
+            # Adjust score slightly upward due to compression
+            compressed_nodes.append((NodeWithScore(node=compressed_node, score=float(score * 1.05)), float(score * 1.05)))
+        
+        return compressed_nodes
+    
+    def _cross_encoder_relevance_scores(
+        self,
+        node_scores: List[Tuple[NodeWithScore, float]],
+        query: str
+    ) -> List[Tuple[NodeWithScore, float]]:
+        """
+        Rescore candidates with the local cross-encoder, all pairs in one batch.
+        
+        Args:
+            node_scores: (node, normalized bi-encoder score) pairs
+            query: User query
+            
+        Returns:
+            (node, combined score) pairs
+        """
+        texts = [node.node.get_content() for node, _ in node_scores]
+        cross_scores = self.cross_encoder.score(query, texts)
+        
+        refined_scores = []
+        for (node, initial_score), cross_score in zip(node_scores, cross_scores):
+            # Same weighting as the LLM scorer so both modes produce comparable scores
+            combined_score = 0.4 * initial_score + 0.6 * cross_score
+            refined_scores.append((node, combined_score))
+            node.node.metadata["cross_encoder_score"] = float(cross_score)
+            node.node.metadata["combined_score"] = float(combined_score)
+        return refined_scores
+    
+    def _llm_relevance_scores(
+        self,
+        node_scores: List[Tuple[NodeWithScore, float]],
+        query: str
+    ) -> List[Tuple[NodeWithScore, float]]:
+        """
+        Rescore the top candidates by asking the LLM to rate their relevance.
+        
+        Args:
+            node_scores: (node, normalized bi-encoder score) pairs
+            query: User query
             
-            # Step 4: Adaptive Retrieval based on query complexity
-            # Determine query complexity to adjust how much we focus on diversity vs relevance
-            try:
-                # Quick query complexity assessment based on:
-                # - Number of distinct entities/concepts in the query
-                # - Presence of comparison or complex operators
-                # - Query length
-                
-                query_words = set(query.lower().split())
-                complexity_indicators = ["compare", "difference", "versus", "vs", "relationship", "how", "why", "explain"]
-                
-                complexity_score = 0.0
-                # Length factor
-                if len(query.split()) > 15:
-                    complexity_score += 0.3
-                elif len(query.split()) > 8:
-                    complexity_score += 0.2
-                
-                # Check for complexity indicators
-                for indicator in complexity_indicators:
-                    if indicator in query_words:
-                        complexity_score += 0.15
-                
-                # Adjust diversity vs relevance based on complexity
-                lambda_param = 0.7  # Default
-                if complexity_score > 0.3:
-                    # More complex queries need more diverse context
-                    lambda_param = 0.5  # Lower lambda gives more weight to diversity
-                    logger.info(f"Complex query detected, adjusting diversity weight to {lambda_param}")
-            except Exception as e:
-                lambda_param = 0.7  # Default fallback
-                logger.warning(f"Error in query complexity assessment: {str(e)}")
+        Returns:
+            (node, combined score) pairs for the top candidates
+        """
+        # Take top candidates from first stage for more expensive reranking
+        top_k_first_stage = min(len(node_scores), 5)  # Limit to 5 for efficiency
+        top_candidates = sorted(node_scores, key=lambda x: x[1], reverse=True)[:top_k_first_stage]
+        
+        prompts = []
+        for node, initial_score in top_candidates:
+            text = node.node.get_content()
             
-            # Step 5: Apply diversity reranking to reduce redundancy with adjusted lambda
-            try:
-                # Sort by score first
-                sorted_nodes = sorted(node_scores, key=lambda x: x[1], reverse=True)
-                
-                # Apply maximal marginal relevance to increase diversity
-                if len(sorted_nodes) > 1:
-                    # Start with the highest scoring node
-                    selected = [sorted_nodes[0]]
-                    remaining = sorted_nodes[1:]
-                    
-                    # Iteratively select nodes that are relevant but diverse
-                    while remaining and len(selected) < len(sorted_nodes):
-                        best_node = None
-                        best_score = -float('inf')
-                        
-                        for i, (node, rel_score) in enumerate(remaining):
-                            # Calculate diversity score (max similarity to already selected nodes)
-                            node_text = node.node.get_content()
-                            node_embedding = self.embed_model.get_text_embedding(node_text)
-                            
-                            # Calculate similarity to each already selected node
-                            max_sim = 0.0
-                            for sel_node, _ in selected:
-                                sel_text = sel_node.node.get_content()
-                                sel_embedding = self.embed_model.get_text_embedding(sel_text)
-                                
-                                sim = dot(node_embedding, sel_embedding) / (norm(node_embedding) * norm(sel_embedding))
-                                # Convert numpy types to Python native types
-                                if isinstance(sim, (np.float32, np.float64)):
-                                    sim = float(sim)
-                                max_sim = max(max_sim, sim)
-                            
-                            # MMR score: relevance - lambda * similarity to selected
-                            mmr_score = float(lambda_param * rel_score - (1 - lambda_param) * max_sim)
-                            
-                            if mmr_score > best_score:
-                                best_score = float(mmr_score)
-                                best_node = (i, node, rel_score, mmr_score)
-                        
-                        if best_node:
-                            idx, node, rel_score, mmr_score = best_node
-                            # Add the best node to selected
-                            selected.append((node, float(mmr_score)))
-                            # Remove from remaining
-                            remaining.pop(idx)
-                        else:
-                            break
-                    
-                    # Replace original nodes with selected diverse nodes
-                    sorted_nodes = selected
-                    logger.info(f"Applied diversity reranking with MMR and lambda={lambda_param}")
-            except Exception as e:
-                logger.warning(f"Error in diversity reranking: {str(e)}")
-                # Fall back to sorted nodes without diversity
-                sorted_nodes = sorted(node_scores, key=lambda x: x[1], reverse=True)
+            # Use LLM to assess relevance with specific criteria (more robust evaluation)
+            prompts.append(f"""
+            Evaluate how relevant the following text passage is to the query on a scale of 0 to 10.
+            Consider these criteria:
+            1. Semantic relevance to the query
+            2. Contains specific information that helps answer the query
+            3. Information quality and reliability
+            4. Comprehensiveness of coverage related to the query
             
-            # Step 6: Apply length normalization to prevent bias towards longer passages
-            try:
-                length_normalized_nodes = []
-                
-                for node, score in sorted_nodes:
-                    text = node.node.get_content()
-                    text_length = len(text.split())
-                    
-                    # Advanced length normalization with diminishing penalty
-                    length_factor = 1.0
-                    if text_length < 20:  # Too short
-                        length_factor = float(0.8 + (0.2 * text_length / 20))
-                    elif text_length > 300:  # Too long
-                        # Logarithmic penalty for very long texts to avoid severe penalties
-                        import math
-                        length_factor = float(1.0 - 0.1 * math.log(1 + (text_length - 300) / 300))
-                    
-                    # Apply length normalization
-                    normalized_score = float(score * length_factor)
-                    
-                    # Add to node metadata
-                    node.node.metadata["original_score"] = float(score)
-                    node.node.metadata["length_factor"] = float(length_factor)
-                    node.node.metadata["final_score"] = float(normalized_score)
-                    
-                    # Update the score in the node
-                    node.score = float(normalized_score)
-                    
-                    length_normalized_nodes.append(node)
-                
-                logger.info(f"Applied advanced length normalization to nodes")
-            except Exception as e:
-                logger.warning(f"Error in length normalization: {str(e)}")
-                # Fall back to original sorted nodes
-                length_normalized_nodes = [node for node, _ in sorted_nodes]
+            Provide only a number as your answer.
             
-            logger.info(f"Successfully reranked {len(length_normalized_nodes)} nodes using Reliable RAG techniques")
-            return length_normalized_nodes
+            Query: {query}
             
-        except Exception as e:
-            logger.warning(f"Error in Reliable RAG reranking: {str(e)}, falling back to original scores")
-            # Fall back to original vector search scores
-            return sorted(nodes, key=lambda node: float(node.score or 0.0), reverse=True)
+            Text passage:
+            {text[:500]}...
+            
+            Relevance score (0-10):
+            """)
+        
+        # All candidates are rated concurrently within the stage budget
+        llm_scores = self.llm_scorer.score(prompts, template_id="relevance_rating")
+        
+        refined_scores = []
+        for (node, initial_score), llm_score in zip(top_candidates, llm_scores):
+            if llm_score is None:
+                # Failed, unparsable or over budget: keep the embedding score
+                refined_scores.append((node, float(initial_score)))
+                continue
+            
+            # Normalize to 0-1 range
+            llm_score = float(min(10, max(0, llm_score)) / 10)
+            
+            # Combine with initial score using weighted average instead of RRF
+            # This works better with our normalized scores
+            combined_score = 0.4 * initial_score + 0.6 * llm_score
+            
+            refined_scores.append((node, combined_score))
+            
+            # Add the LLM-based score to node metadata
+            node.node.metadata["llm_relevance_score"] = float(llm_score)
+            node.node.metadata["combined_score"] = float(combined_score)
+        
+        return refined_scores
+    
+    def _mmr_select(
+        self,
+        sorted_nodes: List[Tuple[NodeWithScore, float]],
+        lambda_param: float
+    ) -> List[Tuple[NodeWithScore, float]]:
+        """
+        Order nodes by maximal marginal relevance.
+        
+        The candidate-candidate cosine matrix is computed once from the node vectors;
+        each iteration then only updates every candidate's max similarity to the
+        selected set with the newly selected column.
+        
+        Args:
+            sorted_nodes: (node, relevance) pairs sorted by relevance, highest first
+            lambda_param: Weight of relevance versus diversity
+            
+        Returns:
+            (node, score) pairs in selection order; the first keeps its relevance score,
+            the others carry their MMR score
+        """
+        matrix = self._node_embedding_matrix([node for node, _ in sorted_nodes]).astype(np.float64)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+        similarity = matrix @ matrix.T
+        relevance = np.asarray([float(score) for _, score in sorted_nodes], dtype=np.float64)
+        
+        # Start with the highest scoring node
+        selected = [sorted_nodes[0]]
+        is_selected = np.zeros(len(sorted_nodes), dtype=bool)
+        is_selected[0] = True
+        # Max similarity of each candidate to the selected set (floored at 0)
+        max_similarity = np.maximum(similarity[:, 0], 0.0)
+        
+        # Iteratively select nodes that are relevant but diverse
+        for _ in range(len(sorted_nodes) - 1):
+            mmr_scores = lambda_param * relevance - (1 - lambda_param) * max_similarity
+            mmr_scores[is_selected] = -np.inf
+            # argmax returns the first maximum, i.e. the higher-ranked node on ties
+            best = int(np.argmax(mmr_scores))
+            selected.append((sorted_nodes[best][0], float(mmr_scores[best])))
+            is_selected[best] = True
+            max_similarity = np.maximum(max_similarity, similarity[:, best])
+        
+        return selected
+    
+    def _node_embedding_matrix(self, nodes: List[NodeWithScore]) -> np.ndarray:
+        """
+        Stack the vectors of the given nodes into a matrix.
+        
+        Vectors fetched from Qdrant along with the nodes are reused; nodes without one
+        are embedded in a single batch call and keep the result for later stages.
+        
+        Args:
+            nodes: Nodes to stack
+            
+        Returns:
+            Array of shape (len(nodes), embedding_dim)
+        """
+        missing = [i for i, node in enumerate(nodes) if not node.node.embedding]
+        if missing:
+            embeddings = self.embed_model.get_text_embedding_batch(
+                [nodes[i].node.get_content() for i in missing]
+            )
+            for i, embedding in zip(missing, embeddings):
+                nodes[i].node.embedding = list(embedding)
+        return np.asarray([node.node.embedding for node in nodes], dtype=np.float32)
+    
+    @staticmethod
+    def _cosine_scores(matrix: np.ndarray, vector: np.ndarray) -> np.ndarray:
+        """
+        Cosine similarity of every row of a matrix to a vector.
+        
+        Args:
+            matrix: Array of shape (n, dim)
+            vector: Array of shape (dim,)
+            
+        Returns:
+            Array of shape (n,), 0 where a norm is 0
+        """
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(vector)
+        return np.divide(matrix @ vector, norms, out=np.zeros(len(matrix), dtype=np.float64), where=norms > 0)
     
     def detect_hallucination(
         self, 
@@ -1251,9 +2356,8 @@ class RAGSystem:
                     # Select a few statements to verify (for efficiency)
                     statements_to_check = sorted(statements, key=lambda x: x["support_score"])[:3]
                     
-                    consistency_evaluations = []
-                    for statement in statements_to_check:
-                        prompt = f"""
+                    prompts = [
+                        f"""
                         Evaluate if the following statement is consistent with the provided context.
                         Answer with ONLY a number from 0 to 10, where:
                         - 0 means completely inconsistent or contradicted by the context
@@ -1266,21 +2370,27 @@ class RAGSystem:
                         
                         Consistency score (0-10):
                         """
-                        
-                        try:
-                            response = self.llm.complete(prompt, temperature=0.1)
-                            response_text = response.text if hasattr(response, 'text') else str(response)
-                            
-                            # Extract numeric score
-                            score_match = re.search(r'(\d+(\.\d+)?)', response_text)
-                            if score_match:
-                                consistency_score = float(score_match.group(1)) / 10
-                                consistency_evaluations.append({
-                                    "statement": statement['text'],
-                                    "consistency_score": float(consistency_score)
-                                })
-                        except Exception as e:
-                            logger.warning(f"Error evaluating statement consistency: {str(e)}")
+                        for statement in statements_to_check
+                    ]
+                    
+                    # Statements are checked concurrently within the stage budget
+                    llm_scores = self.llm_scorer.score(prompts, template_id="fact_consistency")
+                    
+                    consistency_evaluations = []
+                    for statement, llm_score in zip(statements_to_check, llm_scores):
+                        if llm_score is not None:
+                            consistency_evaluations.append({
+                                "statement": statement['text'],
+                                "consistency_score": float(llm_score / 10),
+                                "method": "llm"
+                            })
+                        else:
+                            # Failed or over budget: fall back to the embedding support score
+                            consistency_evaluations.append({
+                                "statement": statement['text'],
+                                "consistency_score": float(statement['support_score']),
+                                "method": "embedding"
+                            })
                     
                     if consistency_evaluations:
                         avg_score = sum(e["consistency_score"] for e in consistency_evaluations) / len(consistency_evaluations)
@@ -1399,6 +2509,111 @@ class RAGSystem:
                 }
             }
     
+    def retrieve(
+        self,
+        query: str,
+        top_k: int = 5,
+        search_filter: Optional[Dict[str, Any]] = None,
+        queries: Optional[List[str]] = None,
+        use_hybrid_search: bool = True,
+        vector_weight: float = 0.7,
+        semantic_weight: float = 0.3,
+        reranker: Optional[str] = None,
+        skip_stages: Optional[Iterable[str]] = None,
+        candidates: Optional[List[NodeWithScore]] = None,
+        query_embedding: Optional[List[float]] = None
+    ) -> RetrievalState:
+        """
+        Run the retrieval pipeline once for a query and its variants.
+        
+        Args:
+            query: User query, used for reranking and diversity
+            top_k: Number of nodes to return
+            search_filter: Optional filter for search
+            queries: Queries to search with (defaults to [query]); the original query
+                gets top_k results, the others fewer
+            use_hybrid_search: Whether to use hybrid search
+            vector_weight: Weight to give vector search in hybrid (0-1)
+            semantic_weight: Weight to give lexical (BM25) search in hybrid (0-1)
+            reranker: Relevance reranking mode (defaults to self.reranker)
+            skip_stages: Pipeline stages to skip for this query
+            candidates: Fused candidates from gather_candidates, which skip the search
+                and fuse stages and any stage they have already been through
+            query_embedding: Embedding of query, if already computed
+            
+        Returns:
+            Pipeline state holding the nodes, stage timings and skipped stages
+        """
+        return self.retrieval_pipeline.run(
+            query,
+            top_k=top_k,
+            search_filter=search_filter,
+            queries=queries,
+            use_hybrid_search=use_hybrid_search,
+            vector_weight=vector_weight,
+            semantic_weight=semantic_weight,
+            reranker=reranker,
+            skip_stages=skip_stages,
+            candidates=candidates,
+            query_embedding=query_embedding
+        )
+    
+    def gather_candidates(
+        self,
+        query: str,
+        top_k: int = 5,
+        search_filter: Optional[Dict[str, Any]] = None,
+        queries: Optional[List[str]] = None,
+        use_hybrid_search: bool = True,
+        vector_weight: float = 0.7,
+        semantic_weight: float = 0.3,
+        search_offset: int = 0,
+        search_limit: Optional[int] = None,
+        keep_all_candidates: bool = False,
+        query_embedding: Optional[List[float]] = None
+    ) -> RetrievalState:
+        """
+        Run only the search and fuse stages, so candidates from several searches started
+        independently can be merged and ranked by a single retrieve(candidates=...) call.
+        
+        Args:
+            query: User query
+            top_k: Number of candidates kept for the original query
+            search_filter: Optional filter for search
+            queries: Queries to search with (defaults to [query]); pass only variants to
+                search them without the original query
+            use_hybrid_search: Whether to use hybrid search
+            vector_weight: Weight to give vector search in hybrid (0-1)
+            semantic_weight: Weight to give lexical (BM25) search in hybrid (0-1)
+            search_offset: Number of search results skipped per query
+            search_limit: Number of search results fetched per query
+            keep_all_candidates: Whether to keep every fetched result, best first
+            query_embedding: Embedding of query, if already computed
+            
+        Returns:
+            Pipeline state whose nodes hold every fused candidate, best first, scored with
+            its fused score
+        """
+        state = self.retrieval_pipeline.run(
+            query,
+            top_k=top_k,
+            search_filter=search_filter,
+            queries=queries,
+            use_hybrid_search=use_hybrid_search,
+            vector_weight=vector_weight,
+            semantic_weight=semantic_weight,
+            skip_stages=[stage for stage in RETRIEVAL_STAGES if stage not in CANDIDATE_STAGES],
+            query_embedding=query_embedding,
+            search_offset=search_offset,
+            search_limit=search_limit,
+            keep_all_candidates=keep_all_candidates
+        )
+        state.nodes = []
+        for node, score in state.node_scores:
+            node.score = float(score)
+            state.nodes.append(node)
+        return state
+    
     def retrieve_context(
         self,
         query: str,
@@ -1406,7 +2621,8 @@ class RAGSystem:
         search_filter: Optional[Dict[str, Any]] = None,
         use_hybrid_search: bool = True,
         vector_weight: float = 0.7,
-        semantic_weight: float = 0.3
+        semantic_weight: float = 0.3,
+        reranker: Optional[str] = None
     ) -> List[NodeWithScore]:
         """
         Retrieve context nodes for a given query using hybrid search.
@@ -1417,144 +2633,294 @@ class RAGSystem:
             search_filter: Optional filter for search
             use_hybrid_search: Whether to use hybrid search
             vector_weight: Weight to give vector search in hybrid (0-1)
-            semantic_weight: Weight to give semantic search in hybrid (0-1)
+            semantic_weight: Weight to give lexical (BM25) search in hybrid (0-1)
+            reranker: Relevance reranking mode (defaults to self.reranker)
             
         Returns:
             List of NodeWithScore objects
         """
         try:
-            # Step 1: Perform vector search
-            vector_limit = min(15, top_k * 3)  # Get more results for reranking
-            
-            # Embed query
-            embed_results = self.embed_model.get_text_embedding(query)
+            return self.retrieve(
+                query,
+                top_k=top_k,
+                search_filter=search_filter,
+                use_hybrid_search=use_hybrid_search,
+                vector_weight=vector_weight,
+                semantic_weight=semantic_weight,
+                reranker=reranker
+            ).nodes
+        except Exception as e:
+            logger.error(f"Error retrieving context: {str(e)}")
+            return []
+    
+    def _vector_search_batch(
+        self,
+        query_vectors: List[List[float]],
+        limits: List[int],
+        search_filter: Optional[Dict[str, Any]] = None,
+        offset: int = 0
+    ) -> List[List[Any]]:
+        """
+        Search the chunk collection for several query vectors in one request.
+        
+        Args:
+            query_vectors: Query embeddings
+            limits: Maximum number of points per query
+            search_filter: Optional filter applied to every query
+            offset: Number of best points skipped per query
             
-            # Step 1a: Perform vector search
-            if search_filter:
-                vector_results = self.client.search(
-                    collection_name=self.collection_name,
-                    query_vector=embed_results,
-                    limit=vector_limit,
-                    filter=search_filter
-                )
-            else:
-                vector_results = self.client.search(
-                    collection_name=self.collection_name,
-                    query_vector=embed_results,
-                    limit=vector_limit
-                )
-                
-            # Ensure all scores are valid floats (not complex numbers)
-            for result in vector_results:
-                if 'score' in result and isinstance(result['score'], complex):
-                    result['score'] = float(result['score'].real)
-                elif 'score' in result:
-                    result['score'] = float(result['score'])
-                    
-            logger.info(f"Vector search retrieved {len(vector_results)} results")
-            
-            # Step 1b: Optionally perform semantic search
-            semantic_results = []
-            if use_hybrid_search and semantic_weight > 0:
-                # TODO: Implement semantic search here if available
-                # For now, we just use the same vector results and adjust scores
-                pass
-                
-            logger.info(f"Semantic search evaluated {len(semantic_results)} results")
-            
-            # Step 1c: Combine results with weights
-            if use_hybrid_search and semantic_weight > 0:
-                # Use our new hybrid search implementation that handles complex numbers
-                combined_results = self._hybrid_search(
-                    query=query,
-                    semantic_results=semantic_results,
-                    vector_results=vector_results,
-                    k=top_k,
-                    vector_weight=vector_weight,
-                    semantic_weight=semantic_weight
-                )
-                # Extract just the nodes with combined scores
-                results = [(r[0], r[1]) for r in combined_results]
-            else:
-                # Just use vector results
-                results = [(r, float(r.get('score', 0))) for r in vector_results[:top_k]]
-                
-            logger.info(f"Retrieved {len(results)} nodes using hybrid search (vector={vector_weight}, semantic={semantic_weight})")
+        Returns:
+            Scored points with their stored vectors, one list per query
+        """
+        requests = [
+            qdrant_models.SearchRequest(
+                vector=query_vector,
+                limit=limit,
+                offset=offset,
+                filter=search_filter,
+                params=self._search_params(),
+                with_payload=True,
+                with_vector=True
+            )
+            for query_vector, limit in zip(query_vectors, limits)
+        ]
+        vector_results = self.client.search_batch(collection_name=self.collection_name, requests=requests)
+        
+        logger.info(
+            f"Vector search for {len(requests)} queries retrieved "
+            f"{sum(len(results) for results in vector_results)} results"
+        )
+        return vector_results
+    
+    def _hybrid_query_batch(
+        self,
+        queries: List[str],
+        query_vectors: List[List[float]],
+        limits: List[int],
+        search_filter: Optional[Dict[str, Any]] = None,
+        offset: int = 0
+    ) -> List[List[Any]]:
+        """
+        Dense and sparse search fused server-side with Reciprocal Rank Fusion, for several
+        queries in one request.
+        
+        Args:
+            queries: Query texts, encoded into the sparse query vectors
+            query_vectors: Query embeddings
+            limits: Maximum number of points per query
+            search_filter: Optional filter applied to every query
+            offset: Number of best fused points skipped per query
             
-            # Step 2: Convert to NodeWithScore objects
-            nodes_with_scores = []
-            for result, score in results:
-                # Ensure the score is a valid float
-                if isinstance(score, complex):
-                    score = float(score.real)
-                else:
-                    score = float(score)
-                    
-                # Get payload from result
-                if hasattr(result, 'payload'):
-                    # ScoredPoint object
-                    payload = result.payload
-                else:
-                    # Dictionary-like object
-                    payload = result.get('payload', {})
-                
-                # Get text
-                text = ""
-                metadata = {}
-                if isinstance(payload, dict):
-                    # First try to get text directly
-                    text = payload.get('text', '')
-                    
-                    # If text is empty, try to extract from _node_content
-                    if not text and '_node_content' in payload:
-                        try:
-                            import json
-                            node_content = json.loads(payload['_node_content'])
-                            if 'text' in node_content:
-                                text = node_content['text']
-                        except Exception as e:
-                            logger.warning(f"Error extracting text from _node_content: {e}")
-                    
-                    metadata = payload.get('metadata', {})
-                    
-                    # If metadata is empty, try to extract from _node_content
-                    if (not metadata or len(metadata) == 0) and '_node_content' in payload:
-                        try:
-                            import json
-                            node_content = json.loads(payload['_node_content'])
-                            if 'metadata' in node_content:
-                                metadata = node_content['metadata']
-                        except Exception as e:
-                            logger.warning(f"Error extracting metadata from _node_content: {e}")
-                else:
-                    # If payload is not a dictionary, try to extract directly from result
-                    if hasattr(result, 'text'):
-                        text = result.text
-                    if hasattr(result, 'metadata'):
-                        metadata = result.metadata
-                
-                # Create node
-                node = TextNode(
-                    text=text,
-                    metadata=metadata
-                )
-                
-                # Create NodeWithScore
-                node_with_score = NodeWithScore(
-                    node=node,
-                    score=score
-                )
-                
-                nodes_with_scores.append(node_with_score)
-                
-            # Step 3: Apply reranking
-            reranked_nodes = self._apply_context_reranking(nodes_with_scores, query)
+        Returns:
+            Scored points carrying RRF scores and their dense vectors, one list per query
+        """
+        requests = [
+            qdrant_models.QueryRequest(
+                prefetch=[
+                    qdrant_models.Prefetch(
+                        query=query_vector,
+                        limit=limit + offset,
+                        params=self._search_params()
+                    ),
+                    qdrant_models.Prefetch(
+                        query=self.sparse_encoder.embed_query(query),
+                        using=SPARSE_VECTOR_NAME,
+                        limit=limit + offset
+                    ),
+                ],
+                query=qdrant_models.FusionQuery(fusion=qdrant_models.Fusion.RRF),
+                filter=search_filter,
+                limit=limit,
+                offset=offset,
+                with_payload=True,
+                with_vector=True
+            )
+            for query, query_vector, limit in zip(queries, query_vectors, limits)
+        ]
+        responses = self.client.query_batch_points(collection_name=self.collection_name, requests=requests)
+        
+        hybrid_results = [response.points for response in responses]
+        logger.info(
+            f"Hybrid dense+sparse query for {len(requests)} queries retrieved "
+            f"{sum(len(results) for results in hybrid_results)} results"
+        )
+        return hybrid_results
+    
+    def _lexical_search(
+        self,
+        query: str,
+        limit: int,
+        search_filter: Optional[Dict[str, Any]] = None
+    ) -> List[Any]:
+        """
+        BM25 search over chunk text, returning the matching points with their stored vectors.
+        
+        The BM25 corpus holds no payload, so filtered searches use vector search only.
+        
+        Args:
+            query: Query text
+            limit: Maximum number of points
+            search_filter: Optional filter for search
             
-            return reranked_nodes
+        Returns:
+            Scored points carrying BM25 scores
+        """
+        if self.bm25_index is None or search_filter:
+            return []
+        
+        hits = self.bm25_index.search(query, limit)
+        if not hits:
+            return []
+        
+        records = self.client.retrieve(
+            collection_name=self.collection_name,
+            ids=[point_id for point_id, _ in hits],
+            with_payload=True,
+            with_vectors=True
+        )
+        records_by_id = {str(record.id): record for record in records}
+        
+        lexical_results = []
+        for point_id, score in hits:
+            record = records_by_id.get(point_id)
+            # Points deleted from Qdrant but not yet from the corpus are dropped
+            if record is None:
+                continue
+            lexical_results.append(qdrant_models.ScoredPoint(
+                id=record.id,
+                version=0,
+                score=score,
+                payload=record.payload,
+                vector=record.vector
+            ))
+        
+        logger.info(f"BM25 search retrieved {len(lexical_results)} results")
+        return lexical_results
+    
+    def rebuild_bm25_index(self) -> Dict[str, Any]:
+        """
+        Rebuild the BM25 corpus from the chunks stored in Qdrant.
+        
+        Backfills documents indexed before the BM25 index existed, or repairs a
+        corpus that drifted from the vector store.
+        
+        Returns:
+            Dict with rebuild results
+        """
+        if self.bm25_index is None:
+            return {"status": "error", "message": "BM25 index is disabled"}
+        try:
+            start_time = time.time()
+            chunk_count = self.bm25_index.replace_all(self._iter_lexical_chunks())
+            self.index_generation.bump()
             
+            duration = time.time() - start_time
+            logger.info(f"Rebuilt BM25 corpus with {chunk_count} chunks in {duration:.2f}s")
+            return {
+                "status": "success",
+                "message": f"BM25 index rebuilt with {chunk_count} chunks",
+                "chunk_count": chunk_count,
+                "duration_seconds": duration
+            }
         except Exception as e:
-            logger.error(f"Error retrieving context: {str(e)}")
-            return []
+            logger.error(f"Error rebuilding BM25 index: {str(e)}")
+            return {
+                "status": "error",
+                "message": f"Error rebuilding BM25 index: {str(e)}",
+                "error": str(e)
+            }
+    
+    def _iter_lexical_chunks(self) -> Iterator[Tuple[str, str, str, str]]:
+        """Stream (doc_id, point_id, text, language) for every stored chunk with text."""
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                limit=self.scroll_page_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=False
+            )
+            for point in points:
+                node = self._point_to_node(point, 0.0).node
+                text = node.get_content()
+                doc_id = node.metadata.get('doc_id') or (point.payload or {}).get('doc_id')
+                if not text or not doc_id or (point.payload or {}).get('is_placeholder'):
+                    continue
+                yield doc_id, str(point.id), text, guess_language(text, node.metadata.get('language'))
+            if offset is None:
+                break
+    
+    def _point_to_node(self, result: Any, score: float) -> NodeWithScore:
+        """
+        Convert a search result into a NodeWithScore.
+        
+        Args:
+            result: ScoredPoint or dictionary-like search result
+            score: Score to give the node
+            
+        Returns:
+            NodeWithScore carrying the stored vector, if any
+        """
+        # Ensure the score is a valid float
+        if isinstance(score, complex):
+            score = float(score.real)
+        else:
+            score = float(score)
+            
+        # Get payload from result
+        if hasattr(result, 'payload'):
+            # ScoredPoint object
+            payload = result.payload
+        else:
+            # Dictionary-like object
+            payload = result.get('payload', {})
+        
+        # Get text
+        text = ""
+        metadata = {}
+        if isinstance(payload, dict):
+            # First try to get text directly
+            text = payload.get('text', '')
+            
+            # If text is empty, try to extract from _node_content
+            if not text and '_node_content' in payload:
+                try:
+                    node_content = json.loads(payload['_node_content'])
+                    if 'text' in node_content:
+                        text = node_content['text']
+                except Exception as e:
+                    logger.warning(f"Error extracting text from _node_content: {e}")
+            
+            metadata = payload.get('metadata', {})
+            
+            # If metadata is empty, try to extract from _node_content
+            if (not metadata or len(metadata) == 0) and '_node_content' in payload:
+                try:
+                    node_content = json.loads(payload['_node_content'])
+                    if 'metadata' in node_content:
+                        metadata = node_content['metadata']
+                except Exception as e:
+                    logger.warning(f"Error extracting metadata from _node_content: {e}")
+        else:
+            # If payload is not a dictionary, try to extract directly from result
+            if hasattr(result, 'text'):
+                text = result.text
+            if hasattr(result, 'metadata'):
+                metadata = result.metadata
+        
+        # Keep the stored vector so reranking does not re-embed the text
+        vector = getattr(result, 'vector', None)
+        if isinstance(vector, dict):
+            # Named-vector points: the dense vector is the default one
+            vector = vector.get("")
+        
+        node = TextNode(
+            text=text,
+            metadata=metadata,
+            embedding=list(vector) if isinstance(vector, list) else None
+        )
+        return NodeWithScore(node=node, score=score)
     
     def close(self):
         """Clean up resources."""
@@ -1575,6 +2941,15 @@ class RAGSystem:
                 except Exception as e:
                     logger.warning(f"Error closing embedding model: {str(e)}")
             
+            if hasattr(self, 'llm_scorer'):
+                self.llm_scorer.close()
+            
+            if getattr(self, 'bm25_index', None) is not None:
+                self.bm25_index.close()
+            
+            if hasattr(self, 'index_generation'):
+                self.index_generation.close()
+            
             logger.info("RAG system resources closed successfully")
         except Exception as e:
             logger.error(f"Error closing RAG system resources: {str(e)}")
@@ -1609,7 +2984,7 @@ class RAGSystem:
             else:
                 # Get all document IDs
                 try:
-                    doc_ids = document_parser.get_all_document_ids()
+                    doc_ids = self._get_all_document_ids()
                 except Exception as e:
                     logger.error(f"Error getting document IDs: {str(e)}")
                     return {
@@ -1636,22 +3011,8 @@ class RAGSystem:
             
             for doc_id in doc_ids:
                 try:
-                    # Check if document has metadata in the metadata collection
-                    meta_points = self.client.scroll(
-                        collection_name=self.metadata_collection_name,
-                        scroll_filter=qdrant_models.Filter(
-                            must=[
-                                qdrant_models.FieldCondition(
-                                    key="doc_id",
-                                    match=qdrant_models.MatchValue(value=doc_id)
-                                )
-                            ]
-                        ),
-                        limit=1
-                    )
-                    
-                    # If metadata exists, skip unless force=True
-                    if meta_points and len(meta_points[0]) > 0:
+                    # Check if document has a catalog record
+                    if self.catalog.get(doc_id) is not None:
                         logger.info(f"Document {doc_id} already has metadata")
                         continue
                     
@@ -1663,39 +3024,8 @@ class RAGSystem:
                         failed_count += 1
                         continue
                     
-                    # Create payload for metadata
-                    payload = {
-                        "doc_id": doc_id,
-                        "metadata": doc_metadata
-                    }
-                    
-                    # Generate embedding for metadata
-                    if isinstance(doc_metadata, dict):
-                        # Use title or filename for embedding
-                        text_for_embedding = doc_metadata.get('title', doc_metadata.get('filename', ''))
-                        if not text_for_embedding:
-                            # Combine values as fallback
-                            text_for_embedding = ' '.join([str(v) for v in doc_metadata.values() if v])
-                    else:
-                        text_for_embedding = str(doc_metadata)
-                    
-                    if text_for_embedding:
-                        embedding = self.embed_model.get_text_embedding(text_for_embedding)
-                    else:
-                        # Use zero vector as fallback
-                        embedding = [0.0] * self.embedding_dim
-                    
-                    # Store in metadata collection
-                    self.client.upsert(
-                        collection_name=self.metadata_collection_name,
-                        points=[
-                            qdrant_models.PointStruct(
-                                id=doc_id,  # Use doc_id directly as point ID
-                                vector=embedding,
-                                payload=payload
-                            )
-                        ]
-                    )
+                    # Store the catalog record
+                    self.catalog.upsert(doc_id, {"metadata": doc_metadata}, merge=False)
                     
                     repaired_count += 1
                     logger.info(f"Repaired metadata for document {doc_id}")
@@ -1777,15 +3107,15 @@ class RAGSystem:
         semantic_weight: float = 0.3
     ) -> List[Tuple[Dict[str, Any], float]]:
         """
-        Combine vector search and semantic search results.
+        Combine vector search and lexical (BM25) search results.
         
         Args:
             query: User query
-            semantic_results: Results from semantic search
+            semantic_results: Results from BM25 search
             vector_results: Results from vector search
             k: Number of results to return
             vector_weight: Weight to give vector search results
-            semantic_weight: Weight to give semantic search results
+            semantic_weight: Weight to give BM25 search results
             
         Returns:
             List of tuples with (node, score)
@@ -1813,7 +3143,7 @@ class RAGSystem:
             vector_scores = {}
             
         if semantic_results:
-            # Extract semantic search scores
+            # Extract BM25 search scores
             semantic_scores = {}
             for result in semantic_results:
                 # Check if result is a dictionary-like object or a ScoredPoint object
@@ -1833,13 +3163,16 @@ class RAGSystem:
         else:
             semantic_scores = {}
             
-        # Normalize scores between 0 and 1
+        # Normalize scores between 0 and 1; equal scores (or a single hit) are all top
+        # of their leg, so they map to 1.0 rather than keeping raw, unbounded BM25 scores
         if vector_scores:
             max_vector = max(vector_scores.values()) if vector_scores else 1
             min_vector = min(vector_scores.values()) if vector_scores else 0
             range_vector = max_vector - min_vector
             if range_vector > 0:
                 vector_scores = {k: float((v - min_vector) / range_vector) for k, v in vector_scores.items()}
+            else:
+                vector_scores = {k: 1.0 for k in vector_scores}
         
         if semantic_scores:
             max_semantic = max(semantic_scores.values()) if semantic_scores else 1
@@ -1847,6 +3180,8 @@ class RAGSystem:
             range_semantic = max_semantic - min_semantic
             if range_semantic > 0:
                 semantic_scores = {k: float((v - min_semantic) / range_semantic) for k, v in semantic_scores.items()}
+            else:
+                semantic_scores = {k: 1.0 for k in semantic_scores}
                 
         # Combine scores
         combined_scores = {}
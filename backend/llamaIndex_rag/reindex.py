@@ -0,0 +1,444 @@
+"""
+Parallel, resumable reindexing for the RAG system.
+
+Documents are indexed by a bounded pool of worker threads. Every finished doc_id
+is appended to a checkpoint file, so an interrupted run resumes where it stopped
+instead of starting over. The checkpoint starts with a fingerprint of the run
+(its doc_ids and options such as force and the embedding model); a run only
+resumes from a recent checkpoint with the same fingerprint, so a different run
+never skips documents because an earlier one completed them. An optional rate
+limit keeps a full reindex from starving live queries of embedding and Qdrant
+capacity. The run lock and the progress report live next to the checkpoint, so
+every API worker sees the run started by any of them.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Iterable, Callable, Set
+
+from llamaIndex_rag.file_lock import FileLock, LockBusy
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REINDEX_CHECKPOINT_PATH = "/var/cache/regulaite/reindex_checkpoint.jsonl"
+
+# A checkpoint left untouched for longer than this is not resumed
+DEFAULT_RESUME_MAX_AGE_SECONDS = 24 * 3600.0
+
+# Keep at most this many failure records in the progress report
+MAX_REPORTED_FAILURES = 100
+
+# Minimum seconds between two writes of the shared progress report during a run
+PROGRESS_SAVE_INTERVAL = 1.0
+
+
+def run_fingerprint(doc_ids: Iterable[str], options: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Identify a reindex run by what it indexes and how.
+
+    Args:
+        doc_ids: Document IDs of the run
+        options: Settings the indexing result depends on (e.g. force, embedding model)
+
+    Returns:
+        Hex digest, equal for runs over the same doc_ids with the same options
+    """
+    digest = hashlib.sha256(json.dumps(options or {}, sort_keys=True, default=str).encode("utf-8"))
+    for doc_id in sorted(set(doc_ids)):
+        digest.update(b"\0" + str(doc_id).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ReindexCheckpoint:
+    """
+    Append-only log of the doc_ids completed by a reindex run.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Initialize the checkpoint.
+
+        Args:
+            path: JSONL file holding the run fingerprint, then one completed doc_id per
+                line (None disables persistence)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+    def load(self, fingerprint: Optional[str] = None, max_age: Optional[float] = None) -> Set[str]:
+        """
+        Return the doc_ids recorded as completed.
+
+        Args:
+            fingerprint: Only return them if the checkpoint was written by a run with
+                this fingerprint (None accepts any run)
+            max_age: Only return them if the checkpoint was written to within this many
+                seconds (None for no limit)
+
+        Returns:
+            Completed doc_ids, empty if the checkpoint belongs to another or an old run
+        """
+        completed = set()
+        if not self.path or not os.path.exists(self.path):
+            return completed
+        try:
+            if max_age is not None and time.time() - os.path.getmtime(self.path) > max_age:
+                logger.info(f"Reindex checkpoint {self.path} is older than {max_age:.0f}s, not resuming it")
+                return completed
+            run = None
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                        if "run" in record:
+                            run = record["run"]
+                        else:
+                            completed.add(record["doc_id"])
+                    except (json.JSONDecodeError, KeyError, TypeError):
+                        # A crash can leave a truncated last line
+                        continue
+            if fingerprint is not None and run != fingerprint:
+                if completed:
+                    logger.info(f"Reindex checkpoint {self.path} belongs to a different run, not resuming it")
+                return set()
+        except Exception as e:
+            logger.warning(f"Could not read reindex checkpoint {self.path}: {str(e)}")
+        return completed
+
+    def record(self, doc_id: str) -> None:
+        """Append a completed doc_id."""
+        if not self.path:
+            return
+        with self._lock:
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"doc_id": doc_id, "completed_at": time.time()}) + "\n")
+            except Exception as e:
+                logger.warning(f"Could not write reindex checkpoint {self.path}: {str(e)}")
+
+    def reset(self, fingerprint: Optional[str] = None) -> None:
+        """
+        Forget all completed doc_ids.
+
+        Args:
+            fingerprint: Fingerprint of the run the checkpoint now belongs to
+        """
+        if not self.path:
+            return
+        with self._lock:
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, "w", encoding="utf-8") as f:
+                    if fingerprint is not None:
+                        f.write(json.dumps({"run": fingerprint, "started_at": time.time()}) + "\n")
+            except Exception as e:
+                logger.warning(f"Could not reset reindex checkpoint {self.path}: {str(e)}")
+
+
+class ReindexProgress:
+    """
+    Thread-safe counters describing the current or last reindex run.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Initialize the counters.
+
+        Args:
+            path: JSON file the progress is written to for other processes (None keeps it local)
+        """
+        self.path = path
+        self._last_save = 0.0
+        self._lock = threading.Lock()
+        self.status = "idle"
+        self.total = 0
+        self.resumed = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.failures: List[Dict[str, Any]] = []
+        self.message = ""
+
+    def start(self, total: int, resumed: int) -> None:
+        with self._lock:
+            self.status = "running"
+            self.total = total
+            self.resumed = resumed
+            self.succeeded = 0
+            self.failed = 0
+            self.in_flight = 0
+            self.started_at = time.time()
+            self.finished_at = None
+            self.failures = []
+            self.message = ""
+        self.save()
+
+    def task_started(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+
+    def task_finished(self, doc_id: str, success: bool, error: Optional[str] = None) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            if success:
+                self.succeeded += 1
+            else:
+                self.failed += 1
+                if len(self.failures) < MAX_REPORTED_FAILURES:
+                    self.failures.append({"doc_id": doc_id, "error": error})
+        if time.time() - self._last_save >= PROGRESS_SAVE_INTERVAL:
+            self.save()
+
+    def finish(self, status: str, message: str = "") -> None:
+        with self._lock:
+            self.status = status
+            self.message = message
+            self.finished_at = time.time()
+        self.save()
+
+    @property
+    def is_running(self) -> bool:
+        return self.status == "running"
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the progress as a dict, including throughput and ETA."""
+        with self._lock:
+            processed = self.succeeded + self.failed
+            remaining = max(0, self.total - self.resumed - processed)
+            elapsed = 0.0
+            if self.started_at is not None:
+                elapsed = (self.finished_at or time.time()) - self.started_at
+            docs_per_second = processed / elapsed if elapsed > 0 else 0.0
+            eta_seconds = None
+            if self.status == "running" and docs_per_second > 0:
+                eta_seconds = remaining / docs_per_second
+            return {
+                "status": self.status,
+                "message": self.message,
+                "total": self.total,
+                "resumed": self.resumed,
+                "succeeded": self.succeeded,
+                "failed": self.failed,
+                "in_flight": self.in_flight,
+                "remaining": remaining,
+                "percent_complete": float(100.0 * (self.total - remaining) / self.total) if self.total else 0.0,
+                "elapsed_seconds": elapsed,
+                "docs_per_second": docs_per_second,
+                "eta_seconds": eta_seconds,
+                "failures": list(self.failures)
+            }
+
+    def save(self) -> None:
+        """Write the progress for other processes to read."""
+        if not self.path:
+            return
+        self._last_save = time.time()
+        snapshot = self.snapshot()
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"Could not write reindex progress {self.path}: {str(e)}")
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """Return the progress last written by any process, if any."""
+        if not self.path or not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"Could not read reindex progress {self.path}: {str(e)}")
+            return None
+
+
+class ReindexClaim:
+    """
+    Exclusive right to run the next reindex, taken before the run is scheduled.
+    """
+
+    def __init__(self, lock: FileLock, handle: Optional[int]):
+        self._lock = lock
+        self._handle = handle
+        self._released = False
+        self._release_guard = threading.Lock()
+
+    def release(self) -> None:
+        """Give the right up; safe to call more than once."""
+        with self._release_guard:
+            if self._released:
+                return
+            self._released = True
+        self._lock.release(self._handle)
+
+
+class ReindexRunner:
+    """
+    Reindex documents through a bounded thread pool with checkpointing and throttling.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        max_docs_per_second: Optional[float] = None,
+        checkpoint_path: Optional[str] = None,
+        resume_max_age: Optional[float] = DEFAULT_RESUME_MAX_AGE_SECONDS,
+    ):
+        """
+        Initialize the runner.
+
+        Args:
+            max_workers: Number of documents indexed concurrently
+            max_docs_per_second: Upper bound on document starts per second (None for no limit)
+            checkpoint_path: JSONL file of completed doc_ids used to resume interrupted runs
+            resume_max_age: Seconds after its last write a checkpoint can still be resumed
+                (None for no limit)
+        """
+        self.max_workers = max(1, max_workers)
+        self.max_docs_per_second = max_docs_per_second if max_docs_per_second and max_docs_per_second > 0 else None
+        self.checkpoint = ReindexCheckpoint(checkpoint_path)
+        self.resume_max_age = resume_max_age
+        self.progress = ReindexProgress(f"{checkpoint_path}.progress.json" if checkpoint_path else None)
+        # Held for the whole run, by whichever API or Celery worker runs it
+        self.run_lock = FileLock(f"{checkpoint_path}.lock" if checkpoint_path else None)
+        self._next_start = 0.0
+
+    def claim(self) -> ReindexClaim:
+        """
+        Take the run lock ahead of a run, so a check and a background start cannot race.
+
+        Returns:
+            Claim to pass to run, which releases it
+
+        Raises:
+            RuntimeError: If a reindex run is already in progress in any process
+        """
+        try:
+            return ReindexClaim(self.run_lock, self.run_lock.acquire(blocking=False))
+        except LockBusy:
+            raise RuntimeError("A reindex run is already in progress")
+
+    @property
+    def is_running(self) -> bool:
+        """Whether a reindex run is in progress in any process."""
+        return self.progress.is_running or self.run_lock.is_locked()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the progress of the current or last run, whichever process runs it."""
+        if self.progress.is_running:
+            return self.progress.snapshot()
+        shared = self.progress.load()
+        if shared is None:
+            return self.progress.snapshot()
+        if shared.get("status") == "running" and not self.run_lock.is_locked():
+            # The process running it died; the checkpoint lets the next run resume
+            shared["status"] = "interrupted"
+            shared["eta_seconds"] = None
+        return shared
+
+    def run(
+        self,
+        doc_ids: Iterable[str],
+        index_fn: Callable[[str], Dict[str, Any]],
+        resume: bool = True,
+        claim: Optional[ReindexClaim] = None,
+        options: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Reindex the given documents, skipping those already recorded in the checkpoint.
+
+        Args:
+            doc_ids: Document IDs to reindex
+            index_fn: Function indexing one doc_id and returning an index_document result dict
+            resume: Whether to skip doc_ids completed by a previous, interrupted run over
+                the same doc_ids with the same options
+            claim: Run lock taken with claim (taken here if None); released when the run ends
+            options: Settings the indexing result depends on; part of the run fingerprint
+
+        Returns:
+            Final progress snapshot
+
+        Raises:
+            RuntimeError: If no claim is given and a reindex run is already in progress
+        """
+        if claim is None:
+            claim = self.claim()
+
+        try:
+            doc_ids = list(dict.fromkeys(doc_ids))
+            fingerprint = run_fingerprint(doc_ids, options)
+            completed = self.checkpoint.load(fingerprint, self.resume_max_age) if resume else set()
+            if not completed:
+                self.checkpoint.reset(fingerprint)
+            pending = [doc_id for doc_id in doc_ids if doc_id not in completed]
+            resumed = len(doc_ids) - len(pending)
+
+            self.progress.start(total=len(doc_ids), resumed=resumed)
+            if resumed:
+                logger.info(f"Resuming reindex: {resumed} documents already completed, {len(pending)} remaining")
+
+            # Bound the number of queued futures so large corpora are not submitted all at once
+            slots = threading.BoundedSemaphore(self.max_workers * 2)
+            self._next_start = time.time()
+
+            def worker(doc_id: str) -> None:
+                try:
+                    self.progress.task_started()
+                    try:
+                        result = index_fn(doc_id)
+                        success = isinstance(result, dict) and result.get("status") == "success"
+                        error = None if success else (result or {}).get("message", "Indexing failed")
+                    except Exception as e:
+                        logger.error(f"Error reindexing document {doc_id}: {str(e)}")
+                        success, error = False, str(e)
+                    if success:
+                        self.checkpoint.record(doc_id)
+                    self.progress.task_finished(doc_id, success, error)
+                finally:
+                    slots.release()
+
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="reindex") as executor:
+                for doc_id in pending:
+                    slots.acquire()
+                    self._throttle()
+                    executor.submit(worker, doc_id)
+
+            snapshot = self.progress.snapshot()
+            if snapshot["failed"] == 0:
+                # A clean run leaves nothing to resume
+                self.checkpoint.reset()
+            message = (
+                f"Reindexed {snapshot['succeeded']} documents successfully, {snapshot['failed']} failed"
+                + (f", {resumed} skipped from checkpoint" if resumed else "")
+            )
+            self.progress.finish("completed", message)
+            logger.info(message)
+            return self.progress.snapshot()
+        except Exception as e:
+            logger.error(f"Reindex run failed: {str(e)}")
+            self.progress.finish("failed", str(e))
+            raise
+        finally:
+            claim.release()
+
+    def _throttle(self) -> None:
+        """Space out document starts to honour max_docs_per_second."""
+        if not self.max_docs_per_second:
+            return
+        now = time.time()
+        if self._next_start > now:
+            time.sleep(self._next_start - now)
+        self._next_start = max(now, self._next_start) + 1.0 / self.max_docs_per_second
@@ -0,0 +1,440 @@
+"""
+Staged retrieval pipeline for the RAG system.
+
+Retrieval runs as a fixed sequence of named stages:
+
+    search -> fuse -> dedupe -> rerank -> compress -> diversify -> length_normalize
+
+Each stage can be skipped (per pipeline or per query) and reports its
+wall-clock time. The stages call into RAGSystem for the actual work; the
+pipeline only owns ordering, skipping, timing and error isolation.
+
+Candidates record the stages they have been through in their metadata, so
+nodes handed back to the pipeline (e.g. candidates gathered separately, or
+already ranked nodes passed to _apply_context_reranking) skip the stages they
+already went through: no stage, and in particular no LLM or cross-encoder
+scoring or compression, is ever applied twice to the same candidates.
+"""
+
+import logging
+import time
+from typing import Dict, List, Any, Optional, Tuple, Iterable, Callable
+
+import numpy as np
+
+from llama_index.core.schema import NodeWithScore
+
+logger = logging.getLogger(__name__)
+
+RETRIEVAL_STAGES = ("search", "fuse", "dedupe", "rerank", "compress", "diversify", "length_normalize")
+
+# Stages producing candidates; the rest rank them
+CANDIDATE_STAGES = ("search", "fuse")
+
+# Vector search fetches more candidates than requested, for reranking
+MAX_SEARCH_LIMIT = 15
+
+# Node metadata key listing the stages a candidate has been through
+STAGES_METADATA_KEY = "retrieval_stages"
+
+
+def completed_stages(node: NodeWithScore) -> List[str]:
+    """Return the pipeline stages a node has been through."""
+    return list(node.node.metadata.get(STAGES_METADATA_KEY, ()))
+
+
+def _mark_stage(node: NodeWithScore, stage: str) -> None:
+    stages = completed_stages(node)
+    if stage in stages:
+        return
+    # A new list: compressed nodes copy their metadata from the original node
+    node.node.metadata[STAGES_METADATA_KEY] = stages + [stage]
+    for excluded in (node.node.excluded_llm_metadata_keys, node.node.excluded_embed_metadata_keys):
+        if STAGES_METADATA_KEY not in excluded:
+            excluded.append(STAGES_METADATA_KEY)
+
+
+class RetrievalState:
+    """
+    Per-query state threaded through the pipeline stages.
+    """
+
+    def __init__(
+        self,
+        query: str,
+        queries: List[str],
+        top_k: int,
+        search_filter: Optional[Dict[str, Any]] = None,
+        reranker: Optional[str] = None,
+        use_hybrid_search: bool = True,
+        vector_weight: float = 0.7,
+        semantic_weight: float = 0.3,
+        query_embedding: Optional[List[float]] = None,
+        search_offset: int = 0,
+        search_limit: Optional[int] = None,
+        keep_all_candidates: bool = False,
+    ):
+        self.query = query
+        self.queries = queries
+        self.top_k = top_k
+        self.search_filter = search_filter
+        self.reranker = reranker
+        self.use_hybrid_search = use_hybrid_search
+        self.vector_weight = vector_weight
+        self.semantic_weight = semantic_weight
+        self.query_embedding = query_embedding
+        # Incremental fetches skip the results already retrieved
+        self.search_offset = search_offset
+        self.search_limit = search_limit
+        # Keep every fused result instead of each query's top results
+        self.keep_all_candidates = keep_all_candidates
+
+        # Raw search results per query, as (point, node) pairs
+        self.search_results: List[List[Tuple[Any, NodeWithScore]]] = []
+        self.lexical_results: List[List[Tuple[Any, NodeWithScore]]] = []
+        # Whether Qdrant already fused dense and sparse results
+        self.server_fused = False
+        # Current candidates with their working scores
+        self.node_scores: List[Tuple[NodeWithScore, float]] = []
+
+        self.completed: List[str] = []
+        self.skipped: List[str] = []
+        self.errors: Dict[str, str] = {}
+        self.timings: Dict[str, float] = {}
+        self.nodes: List[NodeWithScore] = []
+
+    def report(self) -> Dict[str, Any]:
+        """Return the stages run and skipped, with their timings in milliseconds."""
+        return {
+            "stages": list(self.completed),
+            "skipped_stages": list(self.skipped),
+            "errors": dict(self.errors),
+            "timings_ms": {stage: round(seconds * 1000.0, 2) for stage, seconds in self.timings.items()},
+            "total_ms": round(sum(self.timings.values()) * 1000.0, 2),
+        }
+
+
+class RetrievalPipeline:
+    """
+    Runs the retrieval stages of a RAGSystem exactly once per query.
+    """
+
+    def __init__(self, rag_system: Any, skip_stages: Optional[Iterable[str]] = None):
+        """
+        Initialize the pipeline.
+
+        Args:
+            rag_system: RAGSystem providing search, scoring and compression
+            skip_stages: Stages skipped for every query
+        """
+        self.rag_system = rag_system
+        self.skip_stages = self._validate_stages(skip_stages)
+        self._stages: Dict[str, Callable[[RetrievalState], None]] = {
+            "search": self._search,
+            "fuse": self._fuse,
+            "dedupe": self._dedupe,
+            "rerank": self._rerank,
+            "compress": self._compress,
+            "diversify": self._diversify,
+            "length_normalize": self._length_normalize,
+        }
+
+    @staticmethod
+    def _validate_stages(stages: Optional[Iterable[str]]) -> set:
+        stages = set(stages or ())
+        unknown = stages - set(RETRIEVAL_STAGES)
+        if unknown:
+            raise ValueError(f"Unknown retrieval stages {sorted(unknown)}, expected some of {RETRIEVAL_STAGES}")
+        return stages
+
+    def run(
+        self,
+        query: str,
+        top_k: int = 5,
+        search_filter: Optional[Dict[str, Any]] = None,
+        queries: Optional[List[str]] = None,
+        use_hybrid_search: bool = True,
+        vector_weight: float = 0.7,
+        semantic_weight: float = 0.3,
+        reranker: Optional[str] = None,
+        skip_stages: Optional[Iterable[str]] = None,
+        candidates: Optional[List[NodeWithScore]] = None,
+        query_embedding: Optional[List[float]] = None,
+        search_offset: int = 0,
+        search_limit: Optional[int] = None,
+        keep_all_candidates: bool = False,
+    ) -> RetrievalState:
+        """
+        Retrieve and rank context for a query.
+
+        Args:
+            query: User query, used for reranking and diversity
+            top_k: Number of nodes to return
+            search_filter: Optional filter for search
+            queries: Queries to search with (defaults to [query]); queries other than
+                query are treated as reformulations
+            use_hybrid_search: Whether to fuse vector and BM25 scores
+            vector_weight: Weight to give vector search in hybrid (0-1)
+            semantic_weight: Weight to give lexical (BM25) search in hybrid (0-1)
+            reranker: Relevance reranking mode (defaults to the RAG system setting)
+            skip_stages: Stages skipped for this query, on top of the pipeline defaults
+            candidates: Already retrieved nodes; search and fuse are skipped, as are the
+                stages every candidate has already been through
+            query_embedding: Embedding of query, if already computed
+            search_offset: Number of search results skipped per query, to fetch more
+                candidates after an earlier search
+            search_limit: Number of search results fetched per query (defaults to
+                three times the per-query top_k, at most MAX_SEARCH_LIMIT)
+            keep_all_candidates: Whether fusion keeps every result rather than each
+                query's top results (read them from state.node_scores)
+
+        Returns:
+            Final state; state.nodes holds the ranked nodes
+
+        Raises:
+            ValueError: If some candidates have been through a ranking stage and others
+                have not, since running it again would rank the former twice
+        """
+        skip = self.skip_stages | self._validate_stages(skip_stages)
+        state = RetrievalState(
+            query=query,
+            queries=list(queries) if queries else [query],
+            top_k=top_k,
+            search_filter=search_filter,
+            reranker=reranker,
+            use_hybrid_search=use_hybrid_search,
+            vector_weight=vector_weight,
+            semantic_weight=semantic_weight,
+            query_embedding=query_embedding,
+            search_offset=search_offset,
+            search_limit=search_limit,
+            keep_all_candidates=keep_all_candidates,
+        )
+        if candidates is not None:
+            state.node_scores = [(node, float(node.score or 0.0)) for node in candidates]
+            skip = skip | {"search", "fuse"} | self._stages_done(candidates)
+
+        for stage in RETRIEVAL_STAGES:
+            if stage in skip:
+                state.skipped.append(stage)
+                continue
+            self._run_stage(stage, state)
+
+        if "diversify" not in state.completed:
+            # Without MMR the candidates are still in retrieval order
+            state.node_scores.sort(key=lambda x: x[1], reverse=True)
+
+        state.nodes = []
+        for node, score in state.node_scores[:top_k]:
+            node.score = float(score)
+            state.nodes.append(node)
+
+        logger.info(
+            f"Retrieved {len(state.nodes)} nodes in {state.report()['total_ms']}ms "
+            f"(skipped: {state.skipped or 'none'})"
+        )
+        return state
+
+    @staticmethod
+    def _stages_done(candidates: List[NodeWithScore]) -> set:
+        """Return the ranking stages every candidate has already been through."""
+        if not candidates:
+            return set()
+        stage_sets = [set(completed_stages(node)) - set(CANDIDATE_STAGES) for node in candidates]
+        done = set.intersection(*stage_sets)
+        partial = set.union(*stage_sets) - done
+        if partial:
+            raise ValueError(
+                f"Candidates mix nodes that have and have not been through retrieval stages {sorted(partial)}"
+            )
+        return done
+
+    def _run_stage(self, stage: str, state: RetrievalState) -> None:
+        start = time.perf_counter()
+        try:
+            self._stages[stage](state)
+            state.completed.append(stage)
+            for node, _ in state.node_scores:
+                _mark_stage(node, stage)
+        except Exception as e:
+            # Stages only replace the state on success, so later stages see the last good candidates
+            logger.warning(f"Error in retrieval stage {stage}: {str(e)}")
+            state.errors[stage] = str(e)
+        finally:
+            state.timings[stage] = time.perf_counter() - start
+
+    def _query_vector(self, state: RetrievalState) -> np.ndarray:
+        if state.query_embedding is None:
+            state.query_embedding = self.rag_system.embed_model.get_text_embedding(state.query)
+        return np.asarray(state.query_embedding, dtype=np.float32)
+
+    @staticmethod
+    def _per_query_k(state: RetrievalState, index: int) -> int:
+        # The original query gets the full top_k, variants fewer results each
+        return state.top_k if state.queries[index] == state.query else max(2, state.top_k // 2)
+
+    @staticmethod
+    def search_limit(per_query_k: int) -> int:
+        """Number of search results fetched for a query keeping per_query_k results."""
+        return min(MAX_SEARCH_LIMIT, per_query_k * 3)
+
+    def _search(self, state: RetrievalState) -> None:
+        """
+        Vector search for every query. Hybrid retrieval adds a lexical leg: a
+        dense+sparse query fused by Qdrant when the collection has sparse vectors,
+        otherwise a BM25 search fused in the next stage.
+
+        All query variants are embedded in one batch and searched in one Qdrant
+        request.
+        """
+        rag = self.rag_system
+        hybrid = state.use_hybrid_search and state.semantic_weight > 0
+        state.server_fused = hybrid and rag.sparse_vectors_ready
+
+        query_vectors = self._query_vectors(state)
+        limits = [
+            state.search_limit or self.search_limit(self._per_query_k(state, i))
+            for i in range(len(state.queries))
+        ]
+        try:
+            points_per_query = self._search_points(state, state.queries, query_vectors, limits)
+        except Exception as e:
+            if len(state.queries) == 1:
+                raise
+            # Keep the first (usually original) query's results rather than failing the whole retrieval
+            logger.warning(f"Error in batched search for {len(state.queries)} queries, retrying the first query: {str(e)}")
+            points_per_query = self._search_points(state, state.queries[:1], query_vectors[:1], limits[:1])
+            points_per_query += [[] for _ in state.queries[1:]]
+
+        search_results = []
+        lexical_results = []
+        for i, (query, points) in enumerate(zip(state.queries, points_per_query)):
+            search_results.append([(point, rag._point_to_node(point, getattr(point, 'score', 0.0))) for point in points])
+
+            lexical_points = []
+            if hybrid and not state.server_fused:
+                try:
+                    lexical_points = rag._lexical_search(
+                        query, limits[i] + state.search_offset, state.search_filter
+                    )[state.search_offset:]
+                except Exception as e:
+                    logger.warning(f"Error in BM25 search for query {i}: {str(e)}")
+            lexical_results.append([(point, rag._point_to_node(point, point.score)) for point in lexical_points])
+        state.search_results = search_results
+        state.lexical_results = lexical_results
+        state.node_scores = [(node, float(node.score or 0.0)) for results in search_results for _, node in results]
+
+    def _query_vectors(self, state: RetrievalState) -> List[List[float]]:
+        """Embed every query variant in one batch, reusing the query embedding if known."""
+        query_vectors: List[Optional[List[float]]] = [None] * len(state.queries)
+        missing = []
+        for i, query in enumerate(state.queries):
+            if query == state.query and state.query_embedding is not None:
+                query_vectors[i] = list(state.query_embedding)
+            else:
+                missing.append(i)
+
+        if missing:
+            embeddings = self.rag_system.embed_model.get_text_embedding_batch([state.queries[i] for i in missing])
+            for i, embedding in zip(missing, embeddings):
+                query_vectors[i] = list(embedding)
+                if state.queries[i] == state.query:
+                    state.query_embedding = query_vectors[i]
+        return query_vectors
+
+    def _search_points(
+        self,
+        state: RetrievalState,
+        queries: List[str],
+        query_vectors: List[List[float]],
+        limits: List[int]
+    ) -> List[List[Any]]:
+        rag = self.rag_system
+        if state.server_fused:
+            try:
+                return rag._hybrid_query_batch(queries, query_vectors, limits, state.search_filter, state.search_offset)
+            except Exception as e:
+                logger.warning(f"Error in dense+sparse query, falling back to vector search: {str(e)}")
+                state.server_fused = False
+        return rag._vector_search_batch(query_vectors, limits, state.search_filter, state.search_offset)
+
+    def _fuse(self, state: RetrievalState) -> None:
+        """Fuse vector and BM25 scores per query (unless Qdrant already did), keeping each query's top results."""
+        rag = self.rag_system
+        # Tag where candidates came from when they will be merged with other queries' results
+        tag_method = len(state.queries) > 1 or state.queries[0] != state.query
+        first_variant = 1 if state.queries[0] == state.query else 0
+        node_scores = []
+        for i, results in enumerate(state.search_results):
+            k = self._per_query_k(state, i)
+            if state.keep_all_candidates:
+                k = len(results) + (len(state.lexical_results[i]) if i < len(state.lexical_results) else 0)
+            if state.use_hybrid_search and state.semantic_weight > 0 and not state.server_fused:
+                lexical = state.lexical_results[i] if i < len(state.lexical_results) else []
+                nodes_by_point = {id(point): node for point, node in results + lexical}
+                fused = rag._hybrid_search(
+                    query=state.queries[i],
+                    semantic_results=[point for point, _ in lexical],
+                    vector_results=[point for point, _ in results],
+                    k=k,
+                    vector_weight=state.vector_weight,
+                    semantic_weight=state.semantic_weight
+                )
+                query_scores = [(nodes_by_point[id(point)], float(score)) for point, score in fused]
+            else:
+                query_scores = [(node, float(node.score or 0.0)) for _, node in results[:k]]
+
+            if tag_method:
+                method = "original_query" if state.queries[i] == state.query else f"reformulation_{i + 1 - first_variant}"
+                for node, _ in query_scores:
+                    node.node.metadata["retrieval_method"] = method
+            node_scores.extend(query_scores)
+
+        logger.info(
+            f"Fused {len(node_scores)} results from {len(state.queries)} queries "
+            f"(vector={state.vector_weight}, bm25={state.semantic_weight})"
+        )
+        state.node_scores = node_scores
+
+    def _dedupe(self, state: RetrievalState) -> None:
+        """Drop candidates retrieved more than once, keeping the best scored copy."""
+        seen_texts = set()
+        unique = []
+        for node, score in sorted(state.node_scores, key=lambda x: x[1], reverse=True):
+            # Use the first 100 characters to identify duplicates
+            text_key = node.node.get_content()[:100]
+            if text_key in seen_texts:
+                continue
+            seen_texts.add(text_key)
+            unique.append((node, score))
+        state.node_scores = unique
+
+    def _rerank(self, state: RetrievalState) -> None:
+        """Bi-encoder scoring, refined by the cross-encoder or LLM scorer."""
+        if not state.node_scores:
+            return
+        rag = self.rag_system
+        node_scores = rag._score_nodes([node for node, _ in state.node_scores], self._query_vector(state))
+        state.node_scores = rag._refine_relevance_scores(node_scores, state.query, state.reranker)
+
+    def _compress(self, state: RetrievalState) -> None:
+        """Keep the sentences of each candidate most similar to the query."""
+        if not state.node_scores:
+            return
+        compressed = self.rag_system._compress_nodes(state.node_scores, self._query_vector(state))
+        if compressed:
+            state.node_scores = compressed
+            logger.info(f"Applied contextual compression to {len(compressed)} nodes")
+
+    def _diversify(self, state: RetrievalState) -> None:
+        """Order candidates by maximal marginal relevance."""
+        sorted_nodes = sorted(state.node_scores, key=lambda x: x[1], reverse=True)
+        if len(sorted_nodes) > 1:
+            lambda_param = self.rag_system._diversity_lambda(state.query)
+            sorted_nodes = self.rag_system._mmr_select(sorted_nodes, lambda_param)
+            logger.info(f"Applied diversity reranking with MMR and lambda={lambda_param}")
+        state.node_scores = sorted_nodes
+
+    def _length_normalize(self, state: RetrievalState) -> None:
+        """Correct scores for passage length."""
+        state.node_scores = self.rag_system._length_normalize(state.node_scores)
@@ -0,0 +1,95 @@
+"""
+Sparse text vectors for Qdrant-native hybrid search.
+
+Chunks carry a named sparse vector next to the default dense vector, computed
+locally with fastembed (BM25 term weights by default, or BM42 attention
+weights). Qdrant applies the IDF part server-side, so a query fuses the dense
+and sparse legs with Reciprocal Rank Fusion in a single round trip.
+"""
+
+import logging
+import threading
+from typing import List, Any, Optional
+
+from qdrant_client import models as qdrant_models
+
+logger = logging.getLogger(__name__)
+
+# Name of the sparse vector in the chunk collection
+SPARSE_VECTOR_NAME = "text-sparse"
+
+DEFAULT_SPARSE_MODEL = "Qdrant/bm25"
+
+
+def sparse_vector_params() -> qdrant_models.SparseVectorParams:
+    """Sparse vector config of the chunk collection; Qdrant computes IDF from the collection."""
+    return qdrant_models.SparseVectorParams(
+        index=qdrant_models.SparseIndexParams(on_disk=False),
+        modifier=qdrant_models.Modifier.IDF
+    )
+
+
+class SparseTextEncoder:
+    """
+    Lazily loaded fastembed sparse model producing Qdrant SparseVectors.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_SPARSE_MODEL, language: str = "english", batch_size: int = 64):
+        """
+        Initialize the encoder. The model is loaded on first use.
+
+        Args:
+            model_name: fastembed sparse model ("Qdrant/bm25", "Qdrant/bm42-all-minilm-l6-v2-attentions", ...)
+            language: Stemming and stopword language of the BM25 model
+            batch_size: Number of texts encoded per model call
+        """
+        self.model_name = model_name
+        self.language = language
+        self.batch_size = max(1, batch_size)
+        self._model: Any = None
+        self._load_error: Optional[Exception] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Any:
+        with self._lock:
+            if self._model is not None:
+                return self._model
+            if self._load_error is not None:
+                raise self._load_error
+            try:
+                from fastembed import SparseTextEmbedding
+                kwargs = {"language": self.language} if self.model_name == "Qdrant/bm25" else {}
+                self._model = SparseTextEmbedding(model_name=self.model_name, **kwargs)
+            except Exception as e:
+                # Remember the failure so every call does not retry the load
+                self._load_error = e
+                raise
+            logger.info(f"Loaded sparse model {self.model_name}")
+            return self._model
+
+    @staticmethod
+    def _to_qdrant(embedding: Any) -> qdrant_models.SparseVector:
+        return qdrant_models.SparseVector(
+            indices=[int(i) for i in embedding.indices],
+            values=[float(v) for v in embedding.values]
+        )
+
+    def embed_documents(self, texts: List[str]) -> List[qdrant_models.SparseVector]:
+        """
+        Encode chunk texts.
+
+        Args:
+            texts: Chunk texts
+
+        Returns:
+            Sparse vectors aligned with texts
+        """
+        if not texts:
+            return []
+        model = self._load()
+        return [self._to_qdrant(embedding) for embedding in model.embed(texts, batch_size=self.batch_size)]
+
+    def embed_query(self, query: str) -> qdrant_models.SparseVector:
+        """Encode a query (BM25 queries weight every term equally)."""
+        model = self._load()
+        return self._to_qdrant(next(iter(model.query_embed(query))))
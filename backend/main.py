@@ -181,7 +181,8 @@ def init_document_parser():
             chunking_strategy="fixed",
             extract_tables=True,
             extract_metadata=True,
-            extract_images=False
+            extract_images=False,
+            rag_system=rag_system  # Embed chunks once at ingest time when available
         )
         logger.info(f"Document parser initialized successfully with embedding_dim: {embedding_dim}")
     except Exception as e:
@@ -247,7 +248,15 @@ def init_rag_system():
             model_name="gpt-4.1",
             temperature=0.1,
             max_tokens=1500,
-            use_self_critique=True
+            use_self_critique=True,
+            use_query_cache=os.getenv("RAG_QUERY_CACHE", "true").lower() in ("1", "true", "yes"),
+            query_cache_threshold=float(os.getenv("RAG_QUERY_CACHE_THRESHOLD", "0.95")),
+            query_cache_ttl_seconds=float(os.getenv("RAG_QUERY_CACHE_TTL_SECONDS", "3600")),
+            query_cache_max_entries=int(os.getenv("RAG_QUERY_CACHE_MAX_ENTRIES", "1000")),
+            query_cache_max_mb=float(os.getenv("RAG_QUERY_CACHE_MAX_MB", "256")),
+            cache_answers=os.getenv("RAG_QUERY_CACHE_ANSWERS", "false").lower() in ("1", "true", "yes"),
+            complexity_confidence_threshold=float(os.getenv("RAG_COMPLEXITY_CONFIDENCE", "0.6")),
+            complexity_llm_fallback=os.getenv("RAG_COMPLEXITY_LLM_FALLBACK", "false").lower() in ("1", "true", "yes")
         )
         
         logger.info("RAG system initialized successfully!")
@@ -560,7 +569,8 @@ async def process_document(
             try:
                 parser = BaseParser.get_parser(
                     parser_type=ParserType(parser_type),
-                    qdrant_url=QDRANT_URL
+                    qdrant_url=QDRANT_URL,
+                    rag_system=rag_system
                 )
             except Exception as e:
                 logger.error(f"Error creating parser of type {parser_type}: {str(e)}")
@@ -4,6 +4,7 @@ import sys
 import logging
 import json
 from celery import Celery
+from celery.signals import worker_process_shutdown
 from typing import Dict, Any, Optional, Union, List, BinaryIO
 import time
 import uuid
@@ -119,6 +120,7 @@ def get_document_parser(parser_type: str = ParserType.UNSTRUCTURED):
             # Use factory method to create the appropriate parser
             parser = BaseParser.get_parser(
                 parser_type=parser_type_enum,
+                rag_system=get_ingest_rag_system(),
                 **parser_kwargs
             )
             logger.info(f"{parser_type} parser initialized successfully")
@@ -130,8 +132,16 @@ def get_document_parser(parser_type: str = ParserType.UNSTRUCTURED):
 
     raise Exception(f"Failed to initialize {parser_type} parser after multiple attempts")
 
+# RAG system shared by all tasks of this worker process
+_rag_system = None
+
+
 def get_rag_system():
-    """Get or initialize RAG system with retry logic"""
+    """Get or initialize the worker process's RAG system with retry logic"""
+    global _rag_system
+    if _rag_system is not None:
+        return _rag_system
+
     max_retries = 5
     retry_count = 0
 
@@ -149,6 +159,7 @@ def get_rag_system():
                 semantic_weight=0.3
             )
             logger.info("RAG system initialized successfully")
+            _rag_system = rag
             return rag
         except Exception as e:
             retry_count += 1
@@ -157,6 +168,30 @@ def get_rag_system():
 
     raise Exception("Failed to initialize RAG system after multiple attempts")
 
+
+def get_ingest_rag_system() -> Optional[RAGSystem]:
+    """
+    Return the RAG system parsers use to embed chunks at ingest time.
+
+    Returns:
+        The worker process's RAG system, or None if it cannot be initialized, in which
+        case documents are parsed and left for index_document to embed
+    """
+    try:
+        return get_rag_system()
+    except Exception as e:
+        logger.warning(f"Parsing without ingest-time embedding: {str(e)}")
+        return None
+
+
+@worker_process_shutdown.connect
+def close_rag_system(**kwargs):
+    """Release the shared RAG system when the worker process exits"""
+    global _rag_system
+    if _rag_system is not None:
+        _rag_system.close()
+        _rag_system = None
+
 # Task definitions
 @app.task(bind=True, name="process_document", max_retries=3)
 def process_document(self, file_content_b64: str, file_name: str, doc_id: Optional[str] = None,
@@ -238,6 +273,7 @@ def process_document(self, file_content_b64: str, file_name: str, doc_id: Option
 
         parser = BaseParser.get_parser(
             parser_type=parser_type_enum,
+            rag_system=get_ingest_rag_system(),
             **parser_kwargs
         )
 
@@ -352,9 +388,6 @@ def execute_agent_task(self, agent_type: str, task: str, config: Optional[Dict[s
         # Use RAG system's query method directly
         result = rag_system.query(query)
         
-        # Clean up
-        rag_system.close()
-
         return {
             "agent_id": agent_id,
             "agent_type": agent_type,
@@ -434,9 +467,6 @@ def bulk_index_documents(self, doc_ids: List[str]) -> Dict[str, Any]:
                     "error": str(e)
                 })
 
-        # Clean up
-        rag_system.close()
-
         return {
             "status": "completed",
             "total": len(doc_ids),
@@ -467,9 +497,6 @@ def retrieve_context(self, query: str, top_k: int = 5) -> Dict[str, Any]:
         # Retrieve context
         results = rag_system.retrieve_context(query, top_k=top_k)
 
-        # Clean up
-        rag_system.close()
-
         return {
             "status": "success",
             "query": query,
@@ -527,9 +554,6 @@ def check_unindexed_documents():
             except Exception as e:
                 logger.error(f"Failed to initialize language {lang}: {str(e)}")
         
-        # Clean up RAG system
-        rag_system.close()
-        
         indexed_count = 0
         for lang, docs in language_groups.items():
             if docs:
@@ -559,6 +583,19 @@ def check_unindexed_documents():
             "message": str(e)
         }
 
+@app.task(name="migrate_placeholder_vectors")
+def migrate_placeholder_vectors():
+    """Re-index documents whose chunks were stored with dummy vectors and drop the dummy points"""
+    try:
+        rag_system = get_rag_system()
+        return rag_system.migrate_placeholder_points()
+    except Exception as e:
+        logger.error(f"Error migrating placeholder vectors: {str(e)}")
+        return {
+            "status": "error",
+            "message": str(e)
+        }
+
 # Optional: Celery beat tasks for scheduled operations
 app.conf.beat_schedule = {
     'check-unindexed-documents': {
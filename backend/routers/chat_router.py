@@ -53,6 +53,7 @@ class ChatRequest(BaseModel):
     tree_template: Optional[str] = Field(None, description="ID of the decision tree template to use")
     custom_tree: Optional[Dict[str, Any]] = Field(None, description="Custom decision tree for reasoning")
     session_id: Optional[str] = Field(None, description="Session ID for chat history")
+    deadline_ms: Optional[int] = Field(None, gt=0, description="Latency budget for RAG retrieval in milliseconds; optional stages are skipped to meet it")
 
 
 class SourceInfo(BaseModel):
@@ -81,6 +82,7 @@ class ChatResponse(BaseModel):
     context_quality: Optional[str] = Field(None, description="Quality assessment of the context")
     hallucination_risk: Optional[float] = Field(None, description="Risk of hallucination in the response")
     internal_thoughts: Optional[str] = Field(None, description="Internal thoughts and reasoning process")
+    skipped_stages: Optional[List[str]] = Field(None, description="Optional RAG stages skipped to meet the deadline")
 
 
 class ChatHistoryEntry(BaseModel):
@@ -355,6 +357,102 @@ async def extract_user_id_from_request(req: Request, provided_user_id: Optional[
     return user_id
 
 
+def add_context_to_messages(
+    messages: List[ChatMessage],
+    context_texts: List[str],
+    sources: List[Dict[str, Any]]
+) -> List[ChatMessage]:
+    """
+    Add retrieved context, with source attributions, to the chat messages as system messages.
+    
+    Args:
+        messages: Chat messages of the request
+        context_texts: Retrieved context chunks, most relevant first
+        sources: Source information aligned with context_texts
+        
+    Returns:
+        New list of messages with the context instructions and context
+    """
+    # Format context for prompt with source attributions
+    formatted_contexts = []
+    for i, text in enumerate(context_texts):
+        source_info = ""
+        if i < len(sources):
+            source = sources[i]
+            doc_id = source.get("doc_id", "unknown")
+            page = source.get("page_number")
+            page_info = f", page {page}" if page else ""
+            title = source.get("title", "")
+            title_info = f" - {title}" if title else ""
+            source_info = f" [Source {i+1}: Document {doc_id}{page_info}{title_info}]"
+        
+        formatted_contexts.append(f"Context {i+1}:{source_info}\n{text}")
+    
+    # Add a system instruction to use source attributions
+    source_instruction = """
+You will be provided with context information from various sources. When answering:
+1. Include source attributions like [Source 1], [Source 2], etc. when referencing specific information
+2. Address all aspects of the query using the given context
+3. If the context is insufficient to fully answer the query, acknowledge the limitations
+4. Prioritize information from sources with higher relevance (they are provided in order of relevance)
+"""
+    
+    # Add the system instruction at the beginning of messages
+    messages_with_context = list(messages)  # Create a copy of the messages
+    
+    if messages_with_context and messages_with_context[0].role == "system":
+        # Append to existing system message
+        messages_with_context[0].content = source_instruction + "\n\n" + messages_with_context[0].content
+    else:
+        # Add a new system message
+        messages_with_context.insert(0, ChatMessage(role="system", content=source_instruction))
+    
+    context = "\n\n".join(formatted_contexts)
+    
+    # Add system message with the formatted context
+    context_message = ChatMessage(
+        role="system",
+        content=f"Please use the following context information to answer the user's question:\n\n{context}"
+    )
+    messages_with_context.insert(1 if messages_with_context[0].role == "system" else 0, context_message)
+    return messages_with_context
+
+
+def sources_from_contexts(contexts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Build the source information returned to the client from RAG query contexts.
+    
+    Args:
+        contexts: The "contexts" of a RAG query result
+        
+    Returns:
+        Source dicts aligned with contexts
+    """
+    sources = []
+    for ctx in contexts:
+        metadata = ctx.get("metadata", {})
+        doc_id = metadata.get("doc_id", ctx.get("document_id", "unknown"))
+        
+        # Basic source info
+        source = {
+            "doc_id": doc_id,
+            "page_number": metadata.get("page_number"),
+            "score": float(ctx.get("score") or 0),
+            "reliability_score": float(metadata.get("reliability_score", ctx.get("reliability_score")) or 0),
+            "retrieval_method": metadata.get("retrieval_method", ctx.get("retrieval_method", "default")),
+            "title": metadata.get("title") or metadata.get("filename", ""),
+            "content": ctx.get("text", "")  # Include the actual content
+        }
+        
+        # Include enhanced details from Reliable RAG if available
+        for key in ["original_score", "length_factor", "final_score", "llm_relevance_score", "cross_encoder_score", "rrf_score", "compressed"]:
+            if key in metadata:
+                source[key] = metadata[key]
+        
+        sources.append(source)
+    return sources
+
+
 @router.post("", response_model=ChatResponse)
 async def chat(request: ChatRequest, req: Request, background_tasks: BackgroundTasks):
     """
@@ -387,7 +485,12 @@ async def chat(request: ChatRequest, req: Request, background_tasks: BackgroundT
     context_used = False
     context_result = None
     
-    if request.include_context and last_user_message:
+    # Streaming answers retrieve context inside the stream, so the client sees
+    # progress events instead of waiting for the whole RAG pipeline
+    stream_context_query = None
+    if request.include_context and last_user_message and request.stream and not (request.use_agent and request.agent_type):
+        stream_context_query = request.context_query or last_user_message
+    elif request.include_context and last_user_message:
         # Use context_query if provided, otherwise use last user message
         query = request.context_query or last_user_message
         
@@ -400,7 +503,8 @@ async def chat(request: ChatRequest, req: Request, background_tasks: BackgroundT
                 query=query,
                 top_k=5,
                 search_filter=None,
-                rag_query_engine=rag_query_engine
+                rag_query_engine=rag_query_engine,
+                deadline_ms=request.deadline_ms
             )
             
             if context_result.get("status") == "success" and context_result.get("context"):
@@ -408,54 +512,9 @@ async def chat(request: ChatRequest, req: Request, background_tasks: BackgroundT
                 context_texts = context_result.get("context", [])
                 sources = context_result.get("sources", [])
                 
-                # Format context for prompt with source attributions
                 if context_texts:
-                    formatted_contexts = []
-                    for i, text in enumerate(context_texts):
-                        source_info = ""
-                        if i < len(sources):
-                            source = sources[i]
-                            doc_id = source.get("doc_id", "unknown")
-                            page = source.get("page_number")
-                            page_info = f", page {page}" if page else ""
-                            title = source.get("title", "")
-                            title_info = f" - {title}" if title else ""
-                            source_info = f" [Source {i+1}: Document {doc_id}{page_info}{title_info}]"
-                        
-                        formatted_contexts.append(f"Context {i+1}:{source_info}\n{text}")
-                    
-                    # Add a system instruction to use source attributions
-                    source_instruction = """
-You will be provided with context information from various sources. When answering:
-1. Include source attributions like [Source 1], [Source 2], etc. when referencing specific information
-2. Address all aspects of the query using the given context
-3. If the context is insufficient to fully answer the query, acknowledge the limitations
-4. Prioritize information from sources with higher relevance (they are provided in order of relevance)
-"""
-                    
-                    # Add the system instruction at the beginning of messages
-                    messages_with_context = list(request.messages)  # Create a copy of the messages
-                    
-                    if messages_with_context and messages_with_context[0].role == "system":
-                        # Append to existing system message
-                        messages_with_context[0].content = source_instruction + "\n\n" + messages_with_context[0].content
-                    else:
-                        # Add a new system message
-                        messages_with_context.insert(0, ChatMessage(role="system", content=source_instruction))
-                    
-                    context = "\n\n".join(formatted_contexts)
+                    request.messages = add_context_to_messages(request.messages, context_texts, sources)
                     context_used = True
-                    
-                    # Add system message with the formatted context
-                    context_message = ChatMessage(
-                        role="system",
-                        content=f"Please use the following context information to answer the user's question:\n\n{context}"
-                    )
-                    messages_with_context.insert(1 if messages_with_context[0].role == "system" else 0, context_message)
-                    
-                    # Use the updated messages with context
-                    request.messages = messages_with_context
-                    
                     logger.info(f"Retrieved {len(context_texts)} context chunks for query: {query}")
                 else:
                     logger.info(f"No context found for query: {query}")
@@ -712,17 +771,19 @@ Your task is to analyze the request and provide a comprehensive response."""
             # Standard RAG-based processing
             # Import OpenAI client from main application
             from main import OpenAI, OPENAI_API_KEY
+            from openai import AsyncOpenAI
 
             # Create OpenAI client
             client = OpenAI(api_key=OPENAI_API_KEY)
 
-            # Convert messages for OpenAI API
-            openai_messages = [{"role": msg.role, "content": msg.content} for msg in messages]
-            
-            # Add system message with instruction to include internal thoughts
-            openai_messages.insert(0, {
-                "role": "system", 
-                "content": """You are a helpful assistant specializing in regulatory analysis.
+            def to_openai_messages(chat_messages: List[ChatMessage]) -> List[Dict[str, str]]:
+                # Convert messages for OpenAI API
+                converted = [{"role": msg.role, "content": msg.content} for msg in chat_messages]
+                
+                # Add system message with instruction to include internal thoughts
+                converted.insert(0, {
+                    "role": "system", 
+                    "content": """You are a helpful assistant specializing in regulatory analysis.
                 
 When responding, include your internal thoughts and reasoning process wrapped in <internal_thoughts> tags. 
 These thoughts should explain your approach to answering the question and any key insights.
@@ -736,12 +797,77 @@ The key considerations seem to be X, Y, and Z.
 
 Then provide your actual response to the user without these tags.
 """
-            })
+                })
+                return converted
+
+            openai_messages = to_openai_messages(messages)
 
             # Get chat completion
             if request.stream:
+                async_client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+                
+                async def stream_chat_tokens(chat_messages: List[Dict[str, str]]):
+                    stream = await async_client.chat.completions.create(
+                        model=request.model,
+                        messages=chat_messages,
+                        temperature=request.temperature,
+                        max_tokens=request.max_tokens,
+                        stream=True
+                    )
+                    async for chunk in stream:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            yield chunk.choices[0].delta.content
+                
+                async def rag_tokens(contexts: List[Dict[str, Any]]):
+                    # Called by the RAG query engine once the context is retrieved
+                    nonlocal openai_messages
+                    context_texts = [ctx.get("text", "") for ctx in contexts]
+                    if context_texts:
+                        openai_messages = to_openai_messages(
+                            add_context_to_messages(messages, context_texts, sources_from_contexts(contexts))
+                        )
+                        logger.info(f"Retrieved {len(context_texts)} context chunks for query: {stream_context_query}")
+                    async for token in stream_chat_tokens(openai_messages):
+                        yield token
+                
+                async def chat_events():
+                    # RAG stage, source, token and hallucination events, or only tokens without context
+                    if stream_context_query:
+                        rag_query_engine = await get_rag_query_engine()
+                        if rag_query_engine:
+                            answered = False
+                            async for event in rag_query_engine.stream_query(
+                                query_text=stream_context_query,
+                                top_k=5,
+                                deadline_ms=request.deadline_ms,
+                                token_stream=rag_tokens
+                            ):
+                                if event["type"] == "error":
+                                    logger.warning(f"RAG streaming failed: {event['error']}")
+                                    if answered:
+                                        # Part of the answer is out: tell the client it is incomplete
+                                        yield event
+                                        return
+                                    break
+                                answered = answered or event["type"] == "token"
+                                yield event
+                            if answered:
+                                return
+                        else:
+                            logger.warning("RAG query engine not available")
+                    
+                    # Answer without context
+                    try:
+                        async for token in stream_chat_tokens(openai_messages):
+                            yield {"type": "token", "content": token}
+                    except Exception as e:
+                        logger.error(f"Chat streaming failed: {str(e)}")
+                        yield {"type": "error", "error": str(e)}
+                
                 # Handle streaming response
                 async def generate():
+                    nonlocal context_result, context_used
+                    
                     # Start streaming response
                     yield json.dumps({
                         "type": "start",
@@ -752,6 +878,7 @@ Then provide your actual response to the user without these tags.
                     collected_tokens = []
                     internal_thought_tokens = []
                     in_internal_thoughts = False
+                    stream_error = None
                     
                     # Send initial processing state
                     yield json.dumps({
@@ -760,19 +887,10 @@ Then provide your actual response to the user without these tags.
                         "timestamp": datetime.now().isoformat()
                     }) + "\n"
                     
-                    # Create streaming completion
-                    stream = client.chat.completions.create(
-                        model=request.model,
-                        messages=openai_messages,
-                        temperature=request.temperature,
-                        max_tokens=request.max_tokens,
-                        stream=True
-                    )
-                    
-                    # Process the stream (non-async iteration)
-                    for chunk in stream:
-                        if hasattr(chunk.choices[0], 'delta') and hasattr(chunk.choices[0].delta, 'content') and chunk.choices[0].delta.content:
-                            content = chunk.choices[0].delta.content
+                    # Process the stream: RAG stages and sources first, then the answer tokens
+                    async for event in chat_events():
+                        if event["type"] == "token":
+                            content = event["content"]
                             
                             # Track if we're inside internal thoughts tags
                             if "<internal_thoughts>" in content:
@@ -819,6 +937,38 @@ Then provide your actual response to the user without these tags.
                                 "type": "token",
                                 "content": content
                             }) + "\n"
+                        elif event["type"] == "processing":
+                            yield json.dumps(dict(event, timestamp=datetime.now().isoformat()), default=str) + "\n"
+                        elif event["type"] == "sources":
+                            context_used = bool(event["contexts"])
+                            context_result = {
+                                "sources": sources_from_contexts(event["contexts"]),
+                                "context_quality": event["context_quality"]
+                            }
+                            yield json.dumps({
+                                "type": "sources",
+                                "sources": context_result["sources"],
+                                "context_quality": context_result["context_quality"],
+                                "timestamp": datetime.now().isoformat()
+                            }, default=str) + "\n"
+                        elif event["type"] == "hallucination" and context_result is not None:
+                            # Checked once the whole answer is known, so it trails the tokens
+                            context_result["hallucination_risk"] = event["hallucination_risk"]
+                            yield json.dumps({
+                                "type": "hallucination",
+                                "hallucination_risk": event["hallucination_risk"],
+                                "hallucination_metrics": event["hallucination_metrics"],
+                                "timestamp": datetime.now().isoformat()
+                            }, default=str) + "\n"
+                        elif event["type"] == "end" and context_result is not None:
+                            context_result["skipped_stages"] = event.get("skipped_stages")
+                        elif event["type"] == "error":
+                            stream_error = event["error"]
+                            yield json.dumps({
+                                "type": "error",
+                                "error": stream_error,
+                                "timestamp": datetime.now().isoformat()
+                            }) + "\n"
                     
                     # Combine tokens to get the full response
                     assistant_response = "".join(collected_tokens)
@@ -864,7 +1014,9 @@ Then provide your actual response to the user without these tags.
                         "session_id": session_id,
                         "token_usage": token_usage,
                         "context_used": context_used,
-                        "internal_thoughts": internal_thoughts
+                        "internal_thoughts": internal_thoughts,
+                        # The answer stopped early on an error
+                        "incomplete": stream_error is not None
                     }
                     
                     # Include source information if available
@@ -872,6 +1024,7 @@ Then provide your actual response to the user without these tags.
                         completion_data["sources"] = context_result.get("sources")
                         completion_data["context_quality"] = context_result.get("context_quality")
                         completion_data["hallucination_risk"] = context_result.get("hallucination_risk")
+                        completion_data["skipped_stages"] = context_result.get("skipped_stages")
                     
                     yield json.dumps(completion_data) + "\n"
                 
@@ -940,7 +1093,8 @@ Then provide your actual response to the user without these tags.
                 sources=context_result.get("sources") if context_result else None,
                 context_quality=context_result.get("context_quality") if context_result else None,
                 hallucination_risk=context_result.get("hallucination_risk") if context_result else None,
-                internal_thoughts=internal_thoughts
+                internal_thoughts=internal_thoughts,
+                skipped_stages=context_result.get("skipped_stages") if context_result else None
             )
         # For streaming responses, we've already returned a StreamingResponse
 
@@ -1861,7 +2015,8 @@ async def chat_with_rag(
         use_tree_reasoning=payload.get("use_tree_reasoning", False),
         tree_template=payload.get("tree_template"),
         custom_tree=payload.get("custom_tree"),
-        session_id=payload.get("session_id")
+        session_id=payload.get("session_id"),
+        deadline_ms=payload.get("deadline_ms")
     )
     
     # TEMPORARY TESTING WORKAROUND:
@@ -1903,7 +2058,8 @@ async def retrieve_context_for_query(
     query: str,
     top_k: int = 5,
     search_filter: Optional[Dict[str, Any]] = None,
-    rag_query_engine = None
+    rag_query_engine = None,
+    deadline_ms: Optional[int] = None
 ) -> Dict[str, Any]:
     """
     Retrieve context for a query using the RAG system.
@@ -1913,6 +2069,7 @@ async def retrieve_context_for_query(
         top_k: Maximum number of results to retrieve
         search_filter: Optional metadata filters
         rag_query_engine: Optional pre-fetched RAG query engine
+        deadline_ms: Optional latency budget for the RAG query in milliseconds
         
     Returns:
         Dict with retrieved context and status
@@ -1939,7 +2096,8 @@ async def retrieve_context_for_query(
             top_k=top_k,
             search_filter=search_filter,
             streaming=False,
-            custom_prompt=None
+            custom_prompt=None,
+            deadline_ms=deadline_ms
         )
         
         # Check if we have valid context in the response
@@ -1947,30 +2105,7 @@ async def retrieve_context_for_query(
             # Extract contexts and prepare response
             contexts = result.get("contexts", [])
             context_texts = [ctx.get("text", "") for ctx in contexts]
-            sources = []
-            
-            # Extract source information with metadata directly from Qdrant
-            for ctx in contexts:
-                metadata = ctx.get("metadata", {})
-                doc_id = metadata.get("doc_id", ctx.get("document_id", "unknown"))
-                
-                # Basic source info
-                source = {
-                    "doc_id": doc_id,
-                    "page_number": metadata.get("page_number"),
-                    "score": float(ctx.get("score", 0)),
-                    "reliability_score": float(metadata.get("reliability_score", ctx.get("reliability_score", 0))),
-                    "retrieval_method": metadata.get("retrieval_method", ctx.get("retrieval_method", "default")),
-                    "title": metadata.get("title") or metadata.get("filename", ""),
-                    "content": ctx.get("text", "")  # Include the actual content
-                }
-                
-                # Include enhanced details from Reliable RAG if available
-                for key in ["original_score", "length_factor", "final_score", "llm_relevance_score", "rrf_score", "compressed"]:
-                    if key in metadata:
-                        source[key] = metadata[key]
-                
-                sources.append(source)
+            sources = sources_from_contexts(contexts)
             
             # Extract hallucination risk from result if available
             hallucination_risk = None
@@ -1984,7 +2119,8 @@ async def retrieve_context_for_query(
                 "sources": sources,
                 "context_quality": result.get("context_quality", "medium"),
                 "query_complexity": result.get("query_complexity", "medium"),
-                "hallucination_risk": hallucination_risk
+                "hallucination_risk": hallucination_risk,
+                "skipped_stages": result.get("skipped_stages", [])
             }
         elif "answer" in result:
             # If there's an answer but no contexts, return the answer as context
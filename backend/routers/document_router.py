@@ -6,7 +6,7 @@ import json
 import uuid
 from typing import List, Dict, Any, Optional
 from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form, Query
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 import os
 from datetime import datetime
@@ -665,6 +665,31 @@ async def delete_document(doc_id: str, delete_from_index: bool = True):
         )
 
 
+@router.get("/{doc_id}/chunks/export")
+async def export_document_chunks(
+    doc_id: str,
+    page_size: int = Query(256, ge=1, le=1000, description="Chunks fetched from the vector store per page")
+):
+    """Export all chunks of a document as newline-delimited JSON, streamed page by page."""
+    rag_system = await get_rag_system()
+    if not rag_system:
+        raise HTTPException(status_code=500, detail="RAG system not available")
+    
+    def generate():
+        for chunk in rag_system.iter_document_chunks(doc_id, page_size=page_size):
+            yield json.dumps(
+                {"text": chunk.get("text", ""), "metadata": chunk.get("metadata", {})},
+                ensure_ascii=False,
+                default=datetime_serializer
+            ) + "\n"
+    
+    return StreamingResponse(
+        generate(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{doc_id}_chunks.jsonl"'}
+    )
+
+
 @router.post("/index/{doc_id}", response_model=DocumentIndexStatus)
 async def index_document(doc_id: str, force_reindex: bool = False):
     """Index a document in the vector store."""
@@ -909,82 +934,29 @@ async def repair_document_sizes():
         if not rag_system:
             raise HTTPException(status_code=500, detail="RAG system not available")
         
-        # Get all documents
-        search_result = rag_system.qdrant_client.scroll(
-            collection_name=rag_system.metadata_collection_name,
-            limit=100,
-            with_payload=True
-        )
-        
-        metadata_points = search_result[0] if search_result and len(search_result) > 0 else []
-        
         updated_count = 0
         failed_count = 0
         
-        # Process each document
-        for point in metadata_points:
-            if not point.payload or "doc_id" not in point.payload:
+        # Process each document in the catalog
+        for record in rag_system.catalog.iter_documents():
+            if "doc_id" not in record:
                 continue
                 
-            doc_id = point.payload["doc_id"]
+            doc_id = record["doc_id"]
             
             try:
-                # Get document chunks
-                chunks = rag_system.qdrant_client.search(
-                    collection_name=rag_system.collection_name,
-                    query_vector=[0.0] * rag_system.embedding_dim,
-                    query_filter=qdrant_models.Filter(
-                        must=[
-                            qdrant_models.FieldCondition(
-                                key="doc_id",
-                                match=qdrant_models.MatchValue(value=doc_id)
-                            )
-                        ]
-                    ),
-                    limit=1000,
-                    with_vectors=False
-                )
-                
-                # Calculate size from chunks
+                # Calculate size from the document's chunks, streamed page by page
                 total_size_bytes = 0
                 
-                for chunk in chunks:
-                    if not chunk.payload:
-                        continue
-                        
-                    # Try to get text from payload
-                    if "text" in chunk.payload and isinstance(chunk.payload["text"], str):
-                        total_size_bytes += len(chunk.payload["text"].encode('utf-8'))
-                        
-                    # Try to extract from _node_content
-                    elif "_node_content" in chunk.payload and isinstance(chunk.payload["_node_content"], str):
-                        try:
-                            node_content = json.loads(chunk.payload["_node_content"])
-                            if "text" in node_content and isinstance(node_content["text"], str):
-                                total_size_bytes += len(node_content["text"].encode('utf-8'))
-                        except (json.JSONDecodeError, TypeError):
-                            pass
+                for chunk in rag_system.iter_document_chunks(doc_id):
+                    text = chunk.get("text")
+                    if isinstance(text, str) and text:
+                        total_size_bytes += len(text.encode('utf-8'))
                 
                 # Update metadata with correct size
                 if total_size_bytes > 0:
-                    # Get point ID for metadata document
-                    metadata_point_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, doc_id))
-                    
-                    # Update existing metadata
-                    metadata = point.payload.copy()
-                    metadata["size"] = total_size_bytes
-                    
-                    # Upsert updated metadata
-                    rag_system.qdrant_client.upsert(
-                        collection_name=rag_system.metadata_collection_name,
-                        points=[
-                            qdrant_models.PointStruct(
-                                id=metadata_point_id,
-                                vector=[1.0],  # Dummy vector for metadata
-                                payload=metadata
-                            )
-                        ]
-                    )
+                    # Update the catalog record
+                    rag_system.catalog.update_fields(doc_id, size=total_size_bytes)
                     
                     logger.info(f"Updated size for document {doc_id} to {total_size_bytes} bytes ({total_size_bytes/1024:.2f} KB)")
                     updated_count += 1
@@ -1021,15 +993,6 @@ async def repair_document_file_types():
         if not rag_system:
             raise HTTPException(status_code=500, detail="RAG system not available")
         
-        # Get all documents
-        search_result = rag_system.qdrant_client.scroll(
-            collection_name=rag_system.metadata_collection_name,
-            limit=100,
-            with_payload=True
-        )
-        
-        metadata_points = search_result[0] if search_result and len(search_result) > 0 else []
-        
         updated_count = 0
         failed_count = 0
         
@@ -1067,17 +1030,17 @@ async def repair_document_file_types():
             "svg": "svg"
         }
         
-        # Process each document
-        for point in metadata_points:
-            if not point.payload or "doc_id" not in point.payload:
+        # Process each document in the catalog
+        for record in rag_system.catalog.iter_documents():
+            if "doc_id" not in record:
                 continue
                 
-            doc_id = point.payload["doc_id"]
+            doc_id = record["doc_id"]
             
             try:
                 # Get the filename
-                original_filename = point.payload.get("original_filename") or point.payload.get("name")
-                current_file_type = point.payload.get("file_type")
+                original_filename = record.get("original_filename") or record.get("name")
+                current_file_type = record.get("file_type")
                 
                 # Skip if already has a valid file type
                 if current_file_type and current_file_type != "unknown":
@@ -1091,24 +1054,8 @@ async def repair_document_file_types():
                     
                 # Update only if we found a valid file type
                 if file_type != "unknown":
-                    # Get point ID for metadata document
-                    metadata_point_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, doc_id))
-                    
-                    # Update existing metadata
-                    metadata = point.payload.copy()
-                    metadata["file_type"] = file_type
-                    
-                    # Upsert updated metadata
-                    rag_system.qdrant_client.upsert(
-                        collection_name=rag_system.metadata_collection_name,
-                        points=[
-                            qdrant_models.PointStruct(
-                                id=metadata_point_id,
-                                vector=[1.0],  # Dummy vector for metadata
-                                payload=metadata
-                            )
-                        ]
-                    )
+                    # Update the catalog record
+                    rag_system.catalog.update_fields(doc_id, file_type=file_type)
                     
                     logger.info(f"Updated file type for document {doc_id} to {file_type}")
                     updated_count += 1
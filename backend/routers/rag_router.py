@@ -1,11 +1,13 @@
 """
 Router for LlamaIndex RAG system operations.
 """
+import json
 import logging
 import os
-from typing import Dict, List, Any, Optional
-from fastapi import APIRouter, Depends, HTTPException, Body, Query
-from fastapi.responses import JSONResponse
+from typing import Dict, List, Any, Optional, Literal
+from fastapi import APIRouter, Depends, HTTPException, Body, Query, BackgroundTasks
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 
 # Import query engine
@@ -34,9 +36,12 @@ class RAGQuery(BaseModel):
     search_filter: Optional[Dict[str, Any]] = Field(None, description="Metadata filters")
     synthesize: bool = Field(True, description="Whether to synthesize a response")
     custom_prompt: Optional[str] = Field(None, description="Custom prompt for synthesis")
-    streaming: Optional[bool] = Field(None, description="Whether to stream the response")
+    streaming: Optional[bool] = Field(None, description="Whether to stream stage, source, token and hallucination events instead of returning the full result")
     show_hallucination_indicators: bool = Field(True, description="Whether to return hallucination indicators for UI")
     use_self_critique: bool = Field(True, description="Whether to use self-critique for hallucination reduction")
+    reranker: Optional[Literal["cross_encoder", "llm", "none"]] = Field(None, description="Relevance reranking mode, defaults to the RAG config")
+    deadline_ms: Optional[int] = Field(None, gt=0, description="Latency budget in milliseconds; optional stages are skipped to meet it")
+    use_cache: bool = Field(True, description="Whether the result of a near-identical earlier query may be reused")
 
 
 class RAGIndexRequest(BaseModel):
@@ -64,6 +69,7 @@ class RAGConfig(BaseModel):
     semantic_weight: Optional[float] = Field(None, description="Weight for semantic search in hybrid retrieval (0-1)")
     sentence_window_size: Optional[int] = Field(None, description="Number of sentences for context window")
     default_prompt: Optional[str] = Field(None, description="Default prompt template for answer synthesis")
+    reranker: Optional[Literal["cross_encoder", "llm", "none"]] = Field(None, description="Relevance reranking mode: local cross-encoder, LLM-rated relevance or none")
 
 
 class RepairMetadataRequest(BaseModel):
@@ -101,6 +107,30 @@ async def query_rag(
     query_engine: RAGQueryEngine = Depends(get_query_engine)
 ):
     """Query the RAG system with context retrieval and optional response synthesis."""
+    if request.streaming:
+        async def generate():
+            async for event in query_engine.stream_query(
+                query_text=request.query,
+                top_k=request.top_k,
+                search_filter=request.search_filter,
+                custom_prompt=request.custom_prompt,
+                reranker=request.reranker,
+                deadline_ms=request.deadline_ms,
+                use_cache=request.use_cache
+            ):
+                if not request.show_hallucination_indicators:
+                    if event["type"] == "hallucination":
+                        continue
+                    event.pop("hallucination_metrics", None)
+                # Server-sent events, named after the event type so EventSource clients can listen per stage
+                yield f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+        
+        return StreamingResponse(
+            generate(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    
     try:
         result = await query_engine.query(
             query_text=request.query,
@@ -108,7 +138,10 @@ async def query_rag(
             search_filter=request.search_filter,
             custom_prompt=request.custom_prompt,
             streaming=request.streaming,
-            use_self_critique=request.use_self_critique
+            use_self_critique=request.use_self_critique,
+            reranker=request.reranker,
+            deadline_ms=request.deadline_ms,
+            use_cache=request.use_cache
         )
         
         # If hallucination indicators are not requested, remove hallucination metrics from result
@@ -137,18 +170,99 @@ async def index_document(
 
 @router.post("/reindex-all", response_model=Dict[str, Any])
 async def reindex_all_documents(
+    background_tasks: BackgroundTasks,
     force: bool = False,
+    resume: bool = Query(True, description="Skip documents completed by a recent, interrupted run over the same documents with the same settings"),
+    wait: bool = Query(False, description="Block until the reindex finishes instead of running it in the background"),
     rag_system: RAGSystem = Depends(get_rag_system)
 ):
-    """Reindex all documents in the RAG system."""
+    """Reindex all documents in the RAG system. Follow a background run with /rag/reindex-progress."""
+    # Claimed here rather than in the run, so two requests cannot both pass the check
     try:
-        result = rag_system.reindex_all_documents(force=force)
-        return result
+        claim = rag_system.claim_reindex()
+    except RuntimeError:
+        raise HTTPException(status_code=409, detail="A reindex is already in progress")
+    try:
+        if wait:
+            return await run_in_threadpool(rag_system.reindex_all_documents, force=force, resume=resume, claim=claim)
+        
+        background_tasks.add_task(rag_system.reindex_all_documents, force=force, resume=resume, claim=claim)
+        return {
+            "status": "started",
+            "message": "Reindex started in the background",
+            "progress_url": "/rag/reindex-progress"
+        }
     except Exception as e:
+        claim.release()
         logger.error(f"Error reindexing documents: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error reindexing documents: {str(e)}")
 
 
+@router.post("/rebuild-bm25", response_model=Dict[str, Any])
+async def rebuild_bm25_index(
+    background_tasks: BackgroundTasks,
+    wait: bool = Query(False, description="Block until the rebuild finishes instead of running it in the background"),
+    rag_system: RAGSystem = Depends(get_rag_system)
+):
+    """Rebuild the BM25 lexical index from the chunks stored in the vector store."""
+    if rag_system.bm25_index is None:
+        raise HTTPException(status_code=400, detail="BM25 index is disabled")
+    try:
+        if wait:
+            return await run_in_threadpool(rag_system.rebuild_bm25_index)
+        
+        background_tasks.add_task(rag_system.rebuild_bm25_index)
+        return {
+            "status": "started",
+            "message": "BM25 index rebuild started in the background"
+        }
+    except Exception as e:
+        logger.error(f"Error rebuilding BM25 index: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error rebuilding BM25 index: {str(e)}")
+
+
+@router.post("/migrate-sparse-vectors", response_model=Dict[str, Any])
+async def migrate_to_sparse_vectors(
+    background_tasks: BackgroundTasks,
+    wait: bool = Query(False, description="Block until the migration finishes instead of running it in the background"),
+    rag_system: RAGSystem = Depends(get_rag_system)
+):
+    """Copy the chunk collection into the dense+sparse layout, backfilling sparse vectors."""
+    if rag_system.sparse_encoder is None:
+        raise HTTPException(status_code=400, detail="Sparse vectors are disabled")
+    if rag_system.is_migrating_sparse_vectors:
+        raise HTTPException(status_code=409, detail="A sparse vector migration is already in progress")
+    try:
+        if wait:
+            result = await run_in_threadpool(rag_system.migrate_to_sparse_vectors)
+            if result.get("status") == "busy":
+                raise HTTPException(status_code=409, detail=result["message"])
+            return result
+        
+        background_tasks.add_task(rag_system.migrate_to_sparse_vectors)
+        return {
+            "status": "started",
+            "message": "Sparse vector migration started in the background"
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error migrating to sparse vectors: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error migrating to sparse vectors: {str(e)}")
+
+
+@router.get("/reindex-progress", response_model=Dict[str, Any])
+async def get_reindex_progress(
+    rag_system: RAGSystem = Depends(get_rag_system)
+):
+    """Report progress of the current or last reindex run, including docs/sec and ETA."""
+    try:
+        return rag_system.get_reindex_progress()
+    except Exception as e:
+        logger.error(f"Error getting reindex progress: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error getting reindex progress: {str(e)}")
+
+
 @router.post("/bulk-index", response_model=Dict[str, Any])
 async def bulk_index_documents(
     request: RAGBulkIndexRequest,
@@ -192,6 +306,7 @@ async def get_rag_config(
             "vector_weight": getattr(rag_system, "vector_weight", 0.7),
             "semantic_weight": getattr(rag_system, "semantic_weight", 0.3),
             "sentence_window_size": getattr(rag_system, "sentence_window_size", 3),
+            "reranker": getattr(rag_system, "reranker", "llm"),
             "llm_model": query_engine.model_name,
             "temperature": query_engine.temperature,
             "max_tokens": query_engine.max_tokens,
@@ -229,6 +344,9 @@ async def update_rag_config(
         
         if hasattr(rag_system, "sentence_window_size") and config.sentence_window_size is not None:
             rag_system.sentence_window_size = config.sentence_window_size
+        
+        if hasattr(rag_system, "reranker") and config.reranker is not None:
+            rag_system.reranker = config.reranker
   
         # Return current config
         updated_config = {
@@ -239,6 +357,7 @@ async def update_rag_config(
             "vector_weight": getattr(rag_system, "vector_weight", 0.7),
             "semantic_weight": getattr(rag_system, "semantic_weight", 0.3),
             "sentence_window_size": getattr(rag_system, "sentence_window_size", 3),
+            "reranker": getattr(rag_system, "reranker", "llm"),
             "llm_model": query_engine.model_name,
             "temperature": query_engine.temperature,
             "max_tokens": query_engine.max_tokens,
@@ -297,7 +416,7 @@ async def rag_health_check(
         llm_ok = query_engine.llm is not None
         
         # Return health status
-        return {
+        health = {
             "status": "healthy" if (qdrant_ok and llm_ok) else "unhealthy",
             "components": {
                 "qdrant": "connected" if qdrant_ok else "disconnected",
@@ -305,6 +424,31 @@ async def rag_health_check(
                 "embedding_model": rag_system.embedding_model
             }
         }
+        
+        # Report embedding cache effectiveness if the cache is enabled
+        if hasattr(rag_system.embed_model, "cache"):
+            health["components"]["embedding_cache"] = rag_system.embed_model.cache.stats()
+        
+        if rag_system.sparse_encoder is not None:
+            health["components"]["sparse_vectors"] = "ready" if rag_system.sparse_vectors_ready else "migration pending"
+        
+        if rag_system.bm25_index is not None:
+            health["components"]["bm25_index"] = rag_system.bm25_index.stats()
+        
+        if rag_system.llm_cache is not None:
+            health["components"]["llm_cache"] = rag_system.llm_cache.stats()
+        
+        if getattr(query_engine, "query_cache", None) is not None:
+            health["components"]["query_cache"] = query_engine.query_cache.stats()
+        
+        if getattr(query_engine, "complexity_classifier", None) is not None:
+            health["components"]["query_complexity"] = query_engine.complexity_classifier.stats()
+        
+        # Stage duration estimates used to meet request deadlines
+        if hasattr(query_engine, "stage_latency"):
+            health["stage_latency_ms"] = query_engine.stage_latency.snapshot()
+        
+        return health
     except Exception as e:
         logger.error(f"Error checking RAG health: {str(e)}")
         return {
@@ -0,0 +1,114 @@
+"""
+BM25 index: add, replace, delete and search round-trips on the shared SQLite corpus.
+"""
+
+import time
+
+import pytest
+
+pytest.importorskip("llama_index.retrievers.bm25")
+pytest.importorskip("Stemmer")
+
+from llamaIndex_rag.bm25_index import BM25Index, guess_language
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = BM25Index(db_path=str(tmp_path / "bm25.sqlite"), min_rebuild_interval=0.0)
+    yield index
+    index.close()
+
+
+def search_fresh(index, query, k=5, timeout=10.0):
+    """Search once the retrievers have caught up with the latest change (rebuilt in the background)."""
+    give_up = time.time() + timeout
+    while True:
+        index.search(query, k)
+        stats = index.stats()
+        if stats["built_generation"] == stats["generation"]:
+            return index.search(query, k)
+        assert time.time() < give_up, "BM25 retrievers were not rebuilt"
+        time.sleep(0.01)
+
+
+def ids(hits):
+    return [point_id for point_id, _ in hits]
+
+
+ENGLISH = [
+    ("p1", "Article 32 requires appropriate security of processing", "en"),
+    ("p2", "The controller keeps records of processing activities", "en"),
+    ("p3", "Data subjects may request erasure of personal data", "en"),
+]
+FRENCH = [
+    ("p4", "Le responsable du traitement tient un registre des activités", "fr"),
+    ("p5", "La personne concernée peut demander l'effacement des données", "fr"),
+]
+
+
+def test_add_and_search(index):
+    index.add_chunks("doc-en", ENGLISH)
+    index.add_chunks("doc-fr", FRENCH)
+
+    assert ids(index.search("article 32 security", 5))[0] == "p1"
+    assert ids(index.search("effacement", 5)) == ["p5"]
+    assert index.stats()["chunks"] == {"en": 3, "fr": 2}
+
+
+def test_search_edge_cases(index):
+    assert index.search("anything", 5) == []
+    index.add_chunks("doc-en", ENGLISH)
+
+    assert index.search("   ", 5) == []
+    assert index.search("erasure", 0) == []
+    # Built once while empty, so this change is picked up by a background rebuild
+    assert len(search_fresh(index, "processing", k=1)) == 1
+
+
+def test_replaced_chunk_is_searched_with_its_new_text(index):
+    index.add_chunks("doc-en", ENGLISH)
+    assert ids(index.search("erasure", 5)) == ["p3"]
+
+    index.add_chunks("doc-en", [("p3", "Data subjects may object to profiling", "en")])
+
+    assert ids(search_fresh(index, "erasure")) == []
+    assert ids(search_fresh(index, "profiling")) == ["p3"]
+
+
+def test_delete_points_and_documents(index):
+    index.add_chunks("doc-en", ENGLISH)
+    index.add_chunks("doc-fr", FRENCH)
+    index.search("registre", 5)
+
+    index.delete_points(["p1"])
+    assert "p1" not in ids(search_fresh(index, "article 32 security"))
+
+    index.delete_document("doc-fr")
+    assert ids(search_fresh(index, "registre effacement")) == []
+    assert index.stats()["chunks"] == {"en": 2}
+
+
+def test_replace_all_keeps_chunks_written_during_the_rebuild(index):
+    index.add_chunks("doc-en", ENGLISH)
+    generation = index.stats()["generation"]
+
+    def corpus():
+        yield ("doc-en", "p1", "Article 32 requires encryption at rest", "en")
+        # Live indexing while the rebuild streams the vector store
+        index.add_chunks("doc-new", [("p9", "Breach notification within 72 hours", "en")])
+        yield ("doc-fr", "p4", "Le responsable du traitement tient un registre", "fr")
+
+    assert index.replace_all(corpus()) == 2
+    # One bump for the live write, one for the swap
+    assert index.stats()["generation"] == generation + 2
+    assert ids(search_fresh(index, "encryption")) == ["p1"]
+    assert ids(search_fresh(index, "breach notification")) == ["p9"]
+    assert ids(search_fresh(index, "erasure")) == []
+    assert ids(search_fresh(index, "registre")) == ["p4"]
+
+
+def test_guess_language():
+    assert guess_language("Le responsable du traitement est la personne qui") == "fr"
+    assert guess_language("The controller is the person who") == "en"
+    assert guess_language("anything", declared="fr-FR") == "fr"
+    assert guess_language("Le traitement des données", declared="de") == "fr"
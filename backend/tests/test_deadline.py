@@ -0,0 +1,89 @@
+"""
+Query deadline: which optional stages are skipped, in which order, and what budget is reserved.
+"""
+
+import pytest
+
+pytest.importorskip("llama_index.core")
+
+from llamaIndex_rag.deadline import OPTIONAL_QUERY_STAGES, QueryDeadline, StageLatencyTracker
+
+STAGE_MS = 100.0
+
+
+def tracker():
+    """Every stage is estimated at STAGE_MS."""
+    stages = OPTIONAL_QUERY_STAGES + ("retrieval", "generation", "complexity_llm")
+    return StageLatencyTracker(defaults={stage: STAGE_MS for stage in stages})
+
+
+def test_no_deadline_allows_everything():
+    deadline = QueryDeadline(None, tracker())
+
+    assert all(deadline.allows(stage) for stage in OPTIONAL_QUERY_STAGES)
+    assert deadline.fits("generation", "self_critique")
+    assert deadline.report()["skipped_stages"] == []
+
+
+def test_reserves_required_and_higher_priority_stages():
+    # reformulation needs itself, the three optional stages after it and both required ones: 600ms
+    deadline = QueryDeadline(550, tracker())
+    assert not deadline.allows("reformulation")
+
+    # llm_rerank needs itself, two optional stages and both required ones: 500ms
+    assert deadline.allows("llm_rerank")
+
+
+def test_stages_are_given_up_in_order():
+    # 350ms: only the last optional stage fits next to the required ones
+    deadline = QueryDeadline(350, tracker())
+    decisions = [deadline.allows(stage) for stage in OPTIONAL_QUERY_STAGES]
+
+    assert decisions == [False, False, False, True]
+    assert deadline.report()["skipped_stages"] == ["reformulation", "llm_rerank", "self_critique"]
+
+
+def test_excluded_stages_are_not_reserved():
+    deadline = QueryDeadline(450, tracker())
+    deadline.exclude("self_critique", "hallucination_check")
+
+    # reformulation + llm_rerank + retrieval + generation = 400ms
+    assert deadline.allows("reformulation")
+
+
+def test_finished_required_stage_frees_its_reservation():
+    deadline = QueryDeadline(250, tracker())
+    deadline.exclude("llm_rerank", "self_critique", "hallucination_check")
+    assert not deadline.allows("reformulation")
+
+    deadline = QueryDeadline(250, tracker())
+    deadline.exclude("llm_rerank", "self_critique", "hallucination_check")
+    deadline.finished("retrieval", 0.0)
+    assert deadline.allows("reformulation")
+
+
+def test_fits_does_not_record_a_skip():
+    deadline = QueryDeadline(150, tracker())
+
+    assert deadline.fits("complexity_llm")
+    assert not deadline.fits("complexity_llm", "retrieval", "generation")
+    assert deadline.report()["skipped_stages"] == []
+
+
+def test_expired_deadline_skips_and_reports_missed():
+    deadline = QueryDeadline(0, tracker())
+
+    assert not deadline.allows("hallucination_check")
+    report = deadline.report()
+    assert report["skipped_stages"] == ["hallucination_check"]
+    assert report["met"] is False
+
+
+def test_tracker_moving_average():
+    latency = StageLatencyTracker(alpha=0.5, defaults={"generation": 1000.0})
+    latency.observe("generation", 2000.0)
+    latency.observe("new_stage", 40.0)
+
+    assert latency.estimate("generation") == pytest.approx(1500.0)
+    assert latency.estimate("new_stage") == pytest.approx(40.0)
+    assert latency.estimate("unknown") == 0.0
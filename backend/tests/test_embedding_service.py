@@ -0,0 +1,79 @@
+"""
+Embedding service batcher: concurrent query requests share one model call.
+"""
+
+import asyncio
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("llama_index.core")
+
+from llamaIndex_rag.embedding_service import EmbeddingBatcher
+
+
+class FakeFastEmbedModel:
+    """Stands in for fastembed.TextEmbedding, counting batched query calls."""
+
+    def __init__(self):
+        self.query_calls = []
+
+    def query_embed(self, texts, batch_size=256):
+        self.query_calls.append(list(texts))
+        for text in texts:
+            yield np.array([float(len(text)), 1.0])
+
+
+class FakeEmbedding:
+    def __init__(self):
+        self._model = FakeFastEmbedModel()
+
+    def get_query_embedding(self, text):
+        raise AssertionError("queries must be embedded in one batched call")
+
+
+class QueryOnlyEmbedding:
+    """A model without a batched query API."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def get_query_embedding(self, text):
+        self.calls += 1
+        return [float(len(text))]
+
+
+async def embed_concurrently(batcher, queries):
+    batcher.start()
+    try:
+        return await asyncio.gather(*(batcher.embed([query], kind="query") for query in queries))
+    finally:
+        await batcher.stop()
+
+
+def test_concurrent_queries_share_one_model_call():
+    embed_model = FakeEmbedding()
+    batcher = EmbeddingBatcher(embed_model, max_batch_size=16, max_wait_ms=50)
+    queries = ["a", "bb", "ccc", "dddd", "eeeee"]
+
+    results = asyncio.run(embed_concurrently(batcher, queries))
+
+    assert results == [[[float(len(query)), 1.0]] for query in queries]
+    assert embed_model._model.query_calls == [queries]
+    assert batcher.stats()["batches"] == 1
+
+
+def test_batches_are_capped_at_max_batch_size():
+    embed_model = FakeEmbedding()
+    batcher = EmbeddingBatcher(embed_model, max_batch_size=2, max_wait_ms=50)
+
+    assert batcher._embed_sync(["a", "b", "c"], "query") == [[1.0, 1.0], [1.0, 1.0], [1.0, 1.0]]
+    assert embed_model._model.query_calls == [["a", "b"], ["c"]]
+
+
+def test_models_without_batched_queries_are_embedded_one_by_one():
+    embed_model = QueryOnlyEmbedding()
+    batcher = EmbeddingBatcher(embed_model, max_batch_size=16)
+
+    assert batcher._embed_sync(["a", "bb"], "query") == [[1.0], [2.0]]
+    assert embed_model.calls == 2
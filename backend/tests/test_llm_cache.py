@@ -0,0 +1,124 @@
+"""
+LLM response cache: cache keys, memory tier, Redis tier and fallback, per-template counters.
+"""
+
+import time
+
+import pytest
+
+pytest.importorskip("llama_index.core")
+
+from llamaIndex_rag.llm_cache import LLMResponseCache
+
+
+class FakeRedis:
+    """Dict-backed stand-in for the two Redis commands the cache uses."""
+
+    def __init__(self, fail: bool = False):
+        self.data = {}
+        self.fail = fail
+        self.calls = 0
+
+    def mget(self, keys):
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError("redis down")
+        return [self.data.get(key) for key in keys]
+
+    def setex(self, key, ttl, value):
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError("redis down")
+        self.data[key] = value.encode("utf-8")
+
+
+def with_redis(client, **kwargs):
+    cache = LLMResponseCache(redis_url="redis://test", **kwargs)
+    cache._redis = client
+    return cache
+
+
+def test_key_depends_on_every_input():
+    cache = LLMResponseCache()
+    base = cache.key("gpt-4.1", "reformulation", "prompt", 0.0)
+
+    assert base == cache.key("gpt-4.1", "reformulation", "prompt", 0.0)
+    assert base.startswith("regulaite:llm:reformulation:gpt-4.1:")
+    assert len({
+        base,
+        cache.key("gpt-4.1-mini", "reformulation", "prompt", 0.0),
+        cache.key("gpt-4.1", "relevance", "prompt", 0.0),
+        cache.key("gpt-4.1", "reformulation", "prompt!", 0.0),
+        cache.key("gpt-4.1", "reformulation", "prompt", 0.2),
+    }) == 5
+
+
+def test_memory_tier_round_trip():
+    cache = LLMResponseCache()
+    assert cache.get("m", "t", "p", 0.0) is None
+    cache.put("m", "t", "p", 0.0, "response")
+
+    assert cache.get("m", "t", "p", 0.0) == "response"
+    assert cache.get_many("m", "t", ["p", "other"], 0.0) == ["response", None]
+
+
+def test_memory_tier_expires_and_evicts():
+    cache = LLMResponseCache(ttl_seconds=0.05, max_memory_entries=2)
+    cache.put("m", "t", "a", 0.0, "A")
+    cache.put("m", "t", "b", 0.0, "B")
+    cache.get("m", "t", "a", 0.0)
+    cache.put("m", "t", "c", 0.0, "C")
+
+    assert cache.get_many("m", "t", ["a", "b", "c"], 0.0) == ["A", None, "C"]
+    time.sleep(0.1)
+    assert cache.get("m", "t", "a", 0.0) is None
+
+
+def test_redis_hit_is_promoted_to_memory():
+    client = FakeRedis()
+    writer = with_redis(client)
+    writer.put("m", "t", "p", 0.0, "shared")
+
+    # Another process: empty memory tier, same Redis
+    reader = with_redis(client)
+    assert reader.get("m", "t", "p", 0.0) == "shared"
+    calls = client.calls
+    assert reader.get("m", "t", "p", 0.0) == "shared"
+    assert client.calls == calls
+
+    counters = reader.stats()["call_sites"]["t"]
+    assert counters["redis_hits"] == 1
+    assert counters["memory_hits"] == 1
+
+
+def test_redis_errors_fall_back_to_memory():
+    client = FakeRedis(fail=True)
+    cache = with_redis(client)
+    cache.put("m", "t", "p", 0.0, "local")
+
+    assert cache.get("m", "t", "p", 0.0) == "local"
+    assert cache.get("m", "t", "other", 0.0) is None
+    # Redis is left alone for a while after an error
+    calls = client.calls
+    cache.get("m", "t", "other", 0.0)
+    assert client.calls == calls
+
+
+def test_unreachable_redis_url_does_not_break_lookups():
+    cache = LLMResponseCache(redis_url="redis://127.0.0.1:1/0")
+    cache.put("m", "t", "p", 0.0, "local")
+
+    assert cache.get("m", "t", "p", 0.0) == "local"
+    assert cache.get("m", "t", "missing", 0.0) is None
+
+
+def test_counters_are_kept_per_template():
+    cache = LLMResponseCache()
+    cache.put("m", "reformulation", "p", 0.0, "r")
+    cache.get("m", "reformulation", "p", 0.0)
+    cache.get("m", "reformulation", "q", 0.0)
+    cache.get_many("m", "relevance", ["a", "b", "c"], 0.0)
+
+    call_sites = cache.stats()["call_sites"]
+    assert call_sites["reformulation"] == {"memory_hits": 1, "redis_hits": 0, "misses": 1, "hit_rate": 0.5}
+    assert call_sites["relevance"] == {"memory_hits": 0, "redis_hits": 0, "misses": 3, "hit_rate": 0.0}
@@ -0,0 +1,107 @@
+"""
+MMR selection order of RAGSystem._mmr_select against the original per-pair loop.
+"""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("llama_index.core")
+pytest.importorskip("qdrant_client")
+
+from llama_index.core.schema import NodeWithScore, TextNode
+
+from llamaIndex_rag.rag import RAGSystem
+
+
+def make_nodes(vectors, scores):
+    """Build (node, relevance) pairs sorted by relevance, as _mmr_select expects."""
+    nodes = [
+        (NodeWithScore(node=TextNode(id_=f"n{i}", text=f"chunk {i}", embedding=list(vector)), score=score), score)
+        for i, (vector, score) in enumerate(zip(vectors, scores))
+    ]
+    return sorted(nodes, key=lambda pair: pair[1], reverse=True)
+
+
+def reference_mmr(sorted_nodes, lambda_param):
+    """The selection loop _mmr_select replaced, reading the stored vectors instead of re-embedding."""
+    def cosine(a, b):
+        return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+    selected = [sorted_nodes[0]]
+    remaining = sorted_nodes[1:]
+    while remaining:
+        best = None
+        best_score = -float("inf")
+        for i, (node, relevance) in enumerate(remaining):
+            max_sim = 0.0
+            for selected_node, _ in selected:
+                max_sim = max(max_sim, cosine(node.node.embedding, selected_node.node.embedding))
+            mmr_score = lambda_param * relevance - (1 - lambda_param) * max_sim
+            if mmr_score > best_score:
+                best_score = mmr_score
+                best = (i, node, mmr_score)
+        i, node, mmr_score = best
+        selected.append((node, mmr_score))
+        remaining.pop(i)
+    return selected
+
+
+def select(sorted_nodes, lambda_param):
+    # Every node carries its vector, so no embedding model is needed
+    rag = RAGSystem.__new__(RAGSystem)
+    return rag._mmr_select(sorted_nodes, lambda_param)
+
+
+def ids(pairs):
+    return [node.node.node_id for node, _ in pairs]
+
+
+VECTORS = [
+    [1.0, 0.0, 0.0],
+    [0.99, 0.14, 0.0],   # near duplicate of n0
+    [0.0, 1.0, 0.0],
+    [0.0, 0.0, 1.0],
+    [0.7, 0.7, 0.0],
+    [-1.0, 0.0, 0.0],    # opposite of n0: similarity floored at 0
+]
+SCORES = [0.95, 0.93, 0.80, 0.60, 0.85, 0.40]
+
+
+@pytest.mark.parametrize("lambda_param", [0.0, 0.3, 0.5, 0.7, 1.0])
+def test_matches_reference_order(lambda_param):
+    sorted_nodes = make_nodes(VECTORS, SCORES)
+    selected = select(sorted_nodes, lambda_param)
+    expected = reference_mmr(sorted_nodes, lambda_param)
+
+    assert ids(selected) == ids(expected)
+    assert [score for _, score in selected] == pytest.approx([score for _, score in expected], abs=1e-6)
+
+
+def test_diversity_demotes_near_duplicate():
+    selected = select(make_nodes(VECTORS, SCORES), 0.5)
+
+    assert ids(selected)[0] == "n0"
+    assert ids(selected).index("n1") > ids(selected).index("n2")
+
+
+def test_first_node_keeps_relevance_score():
+    selected = select(make_nodes(VECTORS, SCORES), 0.5)
+
+    assert selected[0][1] == pytest.approx(0.95)
+
+
+def test_ties_keep_relevance_order():
+    # Identical vectors and scores: both implementations pick the higher-ranked node first
+    vectors = [[1.0, 0.0], [0.0, 1.0], [0.0, 1.0], [0.0, 1.0]]
+    scores = [0.9, 0.5, 0.5, 0.5]
+    sorted_nodes = make_nodes(vectors, scores)
+
+    selected = select(sorted_nodes, 0.5)
+
+    assert ids(selected) == ids(reference_mmr(sorted_nodes, 0.5)) == ["n0", "n1", "n2", "n3"]
+
+
+def test_single_node():
+    sorted_nodes = make_nodes([[1.0, 0.0]], [0.7])
+
+    assert ids(select(sorted_nodes, 0.5)) == ["n0"]
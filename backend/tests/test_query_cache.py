@@ -0,0 +1,144 @@
+"""
+Semantic query cache: similarity threshold, TTL, LRU eviction and index generation invalidation.
+"""
+
+import time
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("llama_index.core")
+
+from llamaIndex_rag.query_cache import IndexGeneration, SemanticQueryCache
+
+
+def test_hit_above_threshold_only():
+    cache = SemanticQueryCache(similarity_threshold=0.95)
+    cache.store([1.0, 0.0], "k", generation=0, result="answer")
+
+    hit = cache.lookup([2.0, 0.0], "k", generation=0)
+    assert hit["result"] == "answer"
+    assert hit["similarity"] == pytest.approx(1.0)
+
+    # cos = 0.9
+    assert cache.lookup([0.9, 0.43589], "k", generation=0) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_best_match_wins():
+    cache = SemanticQueryCache(similarity_threshold=0.9)
+    cache.store([1.0, 0.0], "k", generation=0, result="first")
+    cache.store([0.96, 0.28], "k", generation=0, result="second")
+
+    assert cache.lookup([0.97, 0.24], "k", generation=0)["result"] == "second"
+
+
+def test_cache_key_isolates_entries():
+    cache = SemanticQueryCache()
+    cache.store([1.0, 0.0], "filters-a", generation=0, result="a")
+
+    assert cache.lookup([1.0, 0.0], "filters-b", generation=0) is None
+    assert cache.lookup([1.0, 0.0], "filters-a", generation=0)["result"] == "a"
+
+
+def test_entries_expire():
+    cache = SemanticQueryCache(ttl_seconds=0.05)
+    cache.store([1.0, 0.0], "k", generation=0, result="answer")
+    time.sleep(0.1)
+
+    assert cache.lookup([1.0, 0.0], "k", generation=0) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_is_evicted():
+    cache = SemanticQueryCache(max_entries=2)
+    cache.store([1.0, 0.0, 0.0], "k", generation=0, result="a")
+    cache.store([0.0, 1.0, 0.0], "k", generation=0, result="b")
+    # Using "a" makes "b" the least recently used
+    assert cache.lookup([1.0, 0.0, 0.0], "k", generation=0)["result"] == "a"
+    cache.store([0.0, 0.0, 1.0], "k", generation=0, result="c")
+
+    assert cache.lookup([0.0, 1.0, 0.0], "k", generation=0) is None
+    assert cache.lookup([1.0, 0.0, 0.0], "k", generation=0)["result"] == "a"
+    assert cache.lookup([0.0, 0.0, 1.0], "k", generation=0)["result"] == "c"
+
+
+def test_zero_entries_disables_cache():
+    cache = SemanticQueryCache(max_entries=0)
+    cache.store([1.0, 0.0], "k", generation=0, result="a")
+
+    assert cache.lookup([1.0, 0.0], "k", generation=0) is None
+
+
+def test_new_generation_drops_entries():
+    cache = SemanticQueryCache()
+    cache.store([1.0, 0.0], "k", generation=3, result="old")
+
+    assert cache.lookup([1.0, 0.0], "k", generation=4) is None
+    assert cache.stats()["generation"] == 4
+
+
+def test_results_of_an_older_generation_are_not_stored():
+    cache = SemanticQueryCache()
+    cache.lookup([1.0, 0.0], "k", generation=5)
+    cache.store([1.0, 0.0], "k", generation=4, result="stale")
+
+    assert cache.lookup([1.0, 0.0], "k", generation=5) is None
+
+
+def test_index_generation_is_shared_through_the_file(tmp_path):
+    path = str(tmp_path / "generation.sqlite")
+    writer = IndexGeneration(path)
+    reader = IndexGeneration(path)
+    try:
+        assert reader.current() == 0
+        writer.bump()
+        writer.bump()
+        assert reader.current() == 2
+    finally:
+        writer.close()
+        reader.close()
+
+
+def test_index_generation_without_path_is_local():
+    generation = IndexGeneration(None)
+    generation.bump()
+
+    assert generation.current() == 1
+    assert IndexGeneration(None).current() == 0
+
+
+def test_hits_get_their_own_copy_of_the_nodes():
+    schema = pytest.importorskip("llama_index.core.schema")
+    cache = SemanticQueryCache()
+    node = schema.NodeWithScore(node=schema.TextNode(text="Article 32", metadata={"doc_id": "d1"}), score=0.8)
+    cache.store([1.0, 0.0], "k", generation=0, nodes=[node])
+    node.node.metadata["retrieval_method"] = "stored"
+
+    first = cache.lookup([1.0, 0.0], "k", generation=0)["nodes"]
+    first[0].node.metadata["retrieval_method"] = "first caller"
+    first[0].score = 0.1
+    second = cache.lookup([1.0, 0.0], "k", generation=0)["nodes"]
+
+    assert second[0].node.get_content() == "Article 32"
+    assert second[0].node.metadata == {"doc_id": "d1"}
+    assert second[0].score == 0.8
+
+
+def test_byte_cap_evicts_least_recently_used():
+    cache = SemanticQueryCache(max_bytes=5000)
+    cache.store([1.0, 0.0, 0.0], "k", generation=0, result="a" * 2000)
+    cache.store([0.0, 1.0, 0.0], "k", generation=0, result="b" * 2000)
+    cache.lookup([1.0, 0.0, 0.0], "k", generation=0)
+    cache.store([0.0, 0.0, 1.0], "k", generation=0, result="c" * 2000)
+
+    assert cache.lookup([0.0, 1.0, 0.0], "k", generation=0) is None
+    assert cache.lookup([1.0, 0.0, 0.0], "k", generation=0)["result"] == "a" * 2000
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["bytes"] <= 5000
+
+    # Larger than the whole cache: not stored
+    cache.store([0.5, 0.5, 0.0], "k", generation=0, result="d" * 6000)
+    assert cache.lookup([0.5, 0.5, 0.0], "k", generation=0) is None
+    assert cache.stats()["entries"] == 2
@@ -0,0 +1,69 @@
+"""
+Local query complexity classifier: levels and confidences around the rule boundaries.
+"""
+
+import pytest
+
+pytest.importorskip("llama_index.core")
+
+from llamaIndex_rag.query_complexity import (
+    HIGH_WORD_COUNT,
+    MEDIUM_WORD_COUNT,
+    QueryComplexityClassifier,
+    parse_complexity_level,
+)
+
+
+def words(count):
+    """A query of plain words that match no complexity indicator."""
+    return " ".join(["policy"] * count)
+
+
+@pytest.mark.parametrize("count, level, confidence", [
+    (3, "low", 1.0),
+    (MEDIUM_WORD_COUNT - 3, "low", 0.75),
+    (MEDIUM_WORD_COUNT, "low", 0.5),
+    (MEDIUM_WORD_COUNT + 1, "medium", 0.583),
+    (MEDIUM_WORD_COUNT + 6, "medium", 1.0),
+    (HIGH_WORD_COUNT, "medium", 0.5),
+    (HIGH_WORD_COUNT + 1, "high", 0.55),
+    (HIGH_WORD_COUNT + 10, "high", 1.0),
+])
+def test_word_count_boundaries(count, level, confidence):
+    assert QueryComplexityClassifier().classify(words(count)) == (level, confidence)
+
+
+def test_indicators_and_questions():
+    classifier = QueryComplexityClassifier()
+
+    assert classifier.classify("Explain encryption") == ("medium", 0.75)
+    assert classifier.classify("Compare and contrast these policies") == ("high", 0.75)
+    assert classifier.classify("What is GDPR? Who enforces it?") == ("high", 1.0)
+    assert classifier.classify("What is GDPR?") == ("low", 1.0)
+
+
+def test_ambiguity_threshold():
+    classifier = QueryComplexityClassifier(confidence_threshold=0.6)
+
+    assert classifier.is_ambiguous(0.583)
+    assert not classifier.is_ambiguous(0.6)
+
+
+def test_stats_count_decisions_and_llm_agreement():
+    classifier = QueryComplexityClassifier(confidence_threshold=0.6)
+    classifier.classify(words(3))
+    level, confidence = classifier.classify(words(MEDIUM_WORD_COUNT + 1))
+    classifier.record_llm_decision(words(MEDIUM_WORD_COUNT + 1), level, confidence, "medium")
+    classifier.record_llm_decision(words(MEDIUM_WORD_COUNT), "low", 0.5, "medium")
+
+    stats = classifier.stats()
+    assert stats["decisions"] == {"low": 1, "medium": 1}
+    assert stats["ambiguous"] == 1
+    assert stats["llm_decisions"] == {"medium->medium": 1, "low->medium": 1}
+    assert stats["llm_agreement"] == 0.5
+
+
+def test_parse_complexity_level():
+    assert parse_complexity_level("Complexity: HIGH.") == "high"
+    assert parse_complexity_level("low") == "low"
+    assert parse_complexity_level("I cannot tell") is None
@@ -0,0 +1,184 @@
+"""
+Reindex runs: checkpoint resume and reset, the shared run claim and the 409 of /rag/reindex-all.
+"""
+
+import os
+import time
+
+import pytest
+
+pytest.importorskip("llama_index.core")
+
+from llamaIndex_rag.reindex import ReindexCheckpoint, ReindexRunner, run_fingerprint
+
+DOC_IDS = ["doc-1", "doc-2", "doc-3"]
+
+
+class Indexer:
+    """index_fn recording the doc_ids it was called with, failing those in fail."""
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.calls = []
+
+    def __call__(self, doc_id):
+        self.calls.append(doc_id)
+        if doc_id in self.fail:
+            return {"status": "error", "message": f"{doc_id} failed"}
+        return {"status": "success"}
+
+
+@pytest.fixture
+def checkpoint_path(tmp_path):
+    return str(tmp_path / "reindex_checkpoint.jsonl")
+
+
+def runner(checkpoint_path, **kwargs):
+    return ReindexRunner(max_workers=1, checkpoint_path=checkpoint_path, **kwargs)
+
+
+def test_failed_run_is_resumed_by_the_same_run(checkpoint_path):
+    first = runner(checkpoint_path).run(DOC_IDS, Indexer(fail={"doc-2"}), options={"force": False})
+    assert (first["succeeded"], first["failed"]) == (2, 1)
+
+    retry = Indexer()
+    progress = runner(checkpoint_path).run(DOC_IDS, retry, options={"force": False})
+
+    assert retry.calls == ["doc-2"]
+    assert progress["resumed"] == 2
+    assert progress["succeeded"] == 1
+
+
+def test_clean_run_leaves_nothing_to_resume(checkpoint_path):
+    runner(checkpoint_path).run(DOC_IDS, Indexer())
+
+    again = Indexer()
+    runner(checkpoint_path).run(DOC_IDS, again)
+    assert again.calls == DOC_IDS
+
+
+@pytest.mark.parametrize("doc_ids, options", [
+    (DOC_IDS, {"force": True}),
+    (DOC_IDS, {"force": False, "embedding_model": "other-model"}),
+    (DOC_IDS + ["doc-4"], {"force": False}),
+])
+def test_a_different_run_does_not_resume(checkpoint_path, doc_ids, options):
+    runner(checkpoint_path).run(DOC_IDS, Indexer(fail={"doc-2"}), options={"force": False})
+
+    other = Indexer()
+    progress = runner(checkpoint_path).run(doc_ids, other, options=options)
+
+    assert other.calls == doc_ids
+    assert progress["resumed"] == 0
+
+
+def test_old_checkpoint_is_not_resumed(checkpoint_path):
+    runner(checkpoint_path).run(DOC_IDS, Indexer(fail={"doc-2"}))
+    two_days_ago = time.time() - 2 * 24 * 3600
+    os.utime(checkpoint_path, (two_days_ago, two_days_ago))
+
+    later = Indexer()
+    runner(checkpoint_path).run(DOC_IDS, later)
+    assert later.calls == DOC_IDS
+
+
+def test_resume_false_starts_over(checkpoint_path):
+    runner(checkpoint_path).run(DOC_IDS, Indexer(fail={"doc-2"}))
+
+    again = Indexer()
+    runner(checkpoint_path).run(DOC_IDS, again, resume=False)
+    assert again.calls == DOC_IDS
+
+
+def test_checkpoint_ignores_a_truncated_line(checkpoint_path):
+    fingerprint = run_fingerprint(DOC_IDS)
+    checkpoint = ReindexCheckpoint(checkpoint_path)
+    checkpoint.reset(fingerprint)
+    checkpoint.record("doc-1")
+    with open(checkpoint_path, "a", encoding="utf-8") as f:
+        f.write('{"doc_id": "doc-')
+
+    assert checkpoint.load(fingerprint) == {"doc-1"}
+    assert checkpoint.load(run_fingerprint(DOC_IDS[:2])) == set()
+
+
+def test_fingerprint_ignores_order_and_duplicates():
+    assert run_fingerprint(["b", "a", "a"], {"force": False}) == run_fingerprint(["a", "b"], {"force": False})
+    assert run_fingerprint(["a", "b"], {"force": False}) != run_fingerprint(["a", "b"], {"force": True})
+
+
+def test_claim_excludes_other_runners(checkpoint_path):
+    worker_a = runner(checkpoint_path)
+    worker_b = runner(checkpoint_path)
+    claim = worker_a.claim()
+
+    assert worker_b.is_running
+    with pytest.raises(RuntimeError):
+        worker_b.claim()
+    with pytest.raises(RuntimeError):
+        worker_b.run(DOC_IDS, Indexer())
+
+    worker_a.run(DOC_IDS, Indexer(), claim=claim)
+    assert not worker_b.is_running
+    assert worker_b.snapshot()["status"] == "completed"
+    worker_b.claim().release()
+
+
+def test_run_of_a_dead_process_is_reported_interrupted(checkpoint_path):
+    worker = runner(checkpoint_path)
+    worker.progress.start(total=3, resumed=0)
+
+    assert runner(checkpoint_path).snapshot()["status"] == "interrupted"
+
+
+class FakeRAGSystem:
+    """The two RAGSystem methods /rag/reindex-all calls, over a real ReindexRunner."""
+
+    def __init__(self, reindexer):
+        self.reindexer = reindexer
+        self.indexer = Indexer()
+
+    def claim_reindex(self):
+        return self.reindexer.claim()
+
+    def reindex_all_documents(self, force=False, resume=True, claim=None):
+        return self.reindexer.run(DOC_IDS, self.indexer, resume=resume, claim=claim, options={"force": force})
+
+
+@pytest.fixture
+def client(checkpoint_path):
+    pytest.importorskip("httpx")
+    fastapi = pytest.importorskip("fastapi")
+    from fastapi.testclient import TestClient
+    from routers import rag_router
+
+    rag_system = FakeRAGSystem(runner(checkpoint_path))
+    app = fastapi.FastAPI()
+    app.include_router(rag_router.router)
+    app.dependency_overrides[rag_router.get_rag_system] = lambda: rag_system
+    with TestClient(app) as client:
+        client.rag_system = rag_system
+        yield client
+
+
+def test_reindex_all_is_refused_while_a_run_holds_the_claim(client, checkpoint_path):
+    claim = runner(checkpoint_path).claim()
+    try:
+        response = client.post("/rag/reindex-all")
+        assert response.status_code == 409
+        assert client.rag_system.indexer.calls == []
+    finally:
+        claim.release()
+
+    response = client.post("/rag/reindex-all", params={"wait": True})
+    assert response.status_code == 200
+    assert response.json()["succeeded"] == 3
+
+
+def test_background_reindex_releases_the_claim(client, checkpoint_path):
+    response = client.post("/rag/reindex-all")
+    assert response.json()["status"] == "started"
+
+    # The test client runs background tasks before returning
+    assert client.rag_system.indexer.calls == DOC_IDS
+    assert not runner(checkpoint_path).is_running
@@ -0,0 +1,127 @@
+"""
+Retrieval pipeline: the query path reranks and compresses its candidates exactly once.
+"""
+
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("llama_index.core")
+pytest.importorskip("qdrant_client")
+
+from llama_index.core.schema import NodeWithScore, TextNode
+
+from llamaIndex_rag.rag import RAGSystem
+from llamaIndex_rag.retrieval_pipeline import RetrievalPipeline, completed_stages
+
+VECTORS = {
+    "q": [1.0, 0.0, 0.0],
+    "alpha": [0.9, 0.1, 0.0],
+    "beta": [0.7, 0.7, 0.0],
+    "gamma": [0.1, 0.9, 0.4],
+    "delta": [0.0, 0.2, 0.9],
+}
+
+
+class FakeEmbedding:
+    def get_text_embedding(self, text):
+        return VECTORS["q"]
+
+    def get_text_embedding_batch(self, texts):
+        return [VECTORS["q"] for _ in texts]
+
+
+class CountingRAGSystem(RAGSystem):
+    """RAGSystem over an in-memory search, counting reranker and compression calls."""
+
+    def __init__(self):
+        self.calls = Counter()
+        self.reranker = "llm"
+        self.embed_model = FakeEmbedding()
+        self.retrieval_pipeline = RetrievalPipeline(self)
+
+    def _vector_search_batch(self, query_vectors, limits, search_filter=None, offset=0):
+        points = [
+            SimpleNamespace(id=name, score=float(np.dot(VECTORS["q"], vector)), vector=vector)
+            for name, vector in VECTORS.items() if name != "q"
+        ]
+        return [sorted(points, key=lambda p: p.score, reverse=True)[offset:offset + limit] for limit in limits]
+
+    def _point_to_node(self, point, score):
+        text = f"Chunk {point.id} about the security of processing under article 32"
+        return NodeWithScore(node=TextNode(id_=point.id, text=text, embedding=point.vector), score=score)
+
+    def _refine_relevance_scores(self, node_scores, query, reranker=None):
+        self.calls["rerank"] += len(node_scores)
+        return [(node, score * 0.9) for node, score in node_scores]
+
+    def _compress_nodes(self, node_scores, query_vector):
+        self.calls["compress"] += len(node_scores)
+        # Compression replaces the nodes, copying their metadata
+        return [
+            (NodeWithScore(
+                node=TextNode(
+                    id_=f"{node.node.node_id}-compressed",
+                    text=node.node.get_content()[:40],
+                    embedding=node.node.embedding,
+                    metadata=dict(node.node.metadata, compressed=True)
+                ),
+                score=score
+            ), score)
+            for node, score in node_scores
+        ]
+
+
+def query_path(rag):
+    """What RAGQueryEngine._retrieve does: gather candidates for the query and a variant, rank them once."""
+    original = rag.gather_candidates("q", top_k=3, use_hybrid_search=False, keep_all_candidates=True)
+    variants = rag.gather_candidates("q", top_k=3, use_hybrid_search=False, queries=["variant"])
+    return rag.retrieve("q", top_k=3, use_hybrid_search=False, candidates=original.nodes[:3] + variants.nodes)
+
+
+def test_query_path_reranks_and_compresses_once():
+    rag = CountingRAGSystem()
+    state = query_path(rag)
+
+    # The variant found two of the original candidates again: three unique candidates,
+    # each reranked and compressed once
+    assert rag.calls == {"rerank": 3, "compress": 3}
+    assert state.report()["stages"] == ["dedupe", "rerank", "compress", "diversify", "length_normalize"]
+    assert all(node.node.metadata["compressed"] for node in state.nodes)
+    assert completed_stages(state.nodes[0]) == [
+        "search", "fuse", "dedupe", "rerank", "compress", "diversify", "length_normalize"
+    ]
+
+
+def test_ranked_nodes_are_not_ranked_again():
+    rag = CountingRAGSystem()
+    nodes = query_path(rag).nodes
+    calls = dict(rag.calls)
+    texts = [node.node.get_content() for node in nodes]
+
+    reranked = rag._apply_context_reranking(nodes, "q")
+    state = rag.retrieve("q", top_k=3, candidates=nodes)
+
+    assert rag.calls == calls
+    assert [node.node.get_content() for node in reranked] == texts
+    assert state.report()["stages"] == []
+    assert "rerank" in state.report()["skipped_stages"]
+
+
+def test_mixing_ranked_and_fresh_candidates_is_refused():
+    rag = CountingRAGSystem()
+    ranked = query_path(rag).nodes
+    fresh = rag.gather_candidates("q", top_k=3, use_hybrid_search=False).nodes
+
+    with pytest.raises(ValueError):
+        rag.retrieve("q", top_k=3, candidates=ranked + fresh)
+
+
+def test_stage_marks_stay_out_of_prompts():
+    rag = CountingRAGSystem()
+    node = query_path(rag).nodes[0]
+
+    assert "retrieval_stages" not in node.node.get_content(metadata_mode="llm")
+    assert "retrieval_stages" not in node.node.get_content(metadata_mode="embed")
@@ -0,0 +1,168 @@
+"""
+Sparse vector migration: syncing writes made during the copy, the collection switch and alias recovery.
+
+Runs against Qdrant's in-process local mode.
+"""
+
+import uuid
+
+import pytest
+
+pytest.importorskip("llama_index.core")
+qdrant_client = pytest.importorskip("qdrant_client")
+
+from qdrant_client import models
+
+from llamaIndex_rag.file_lock import FileLock
+from llamaIndex_rag.query_cache import IndexGeneration
+from llamaIndex_rag.rag import RAGSystem
+from llamaIndex_rag.sparse_vectors import SPARSE_VECTOR_NAME
+
+COLLECTION = "chunks"
+MIGRATED = f"{COLLECTION}_hybrid"
+
+
+class FakeSparseEncoder:
+    def embed_documents(self, texts):
+        return [models.SparseVector(indices=[len(text) % 97], values=[1.0]) for text in texts]
+
+
+class MigratingRAGSystem(RAGSystem):
+    """RAGSystem over a local Qdrant, running during_copy after the first page is copied."""
+
+    def __init__(self, client, during_copy=None):
+        self.client = client
+        self.collection_name = COLLECTION
+        self.scroll_page_size = 2
+        self.sparse_encoder = FakeSparseEncoder()
+        self.sparse_migration_lock = FileLock(None)
+        self.chunk_write_lock = FileLock(None)
+        self.index_generation = IndexGeneration(None)
+        self.sparse_vectors_ready = False
+        self.during_copy = during_copy
+
+    def _copy_points_with_sparse(self, points, target_name):
+        super()._copy_points_with_sparse(points, target_name)
+        if self.during_copy is not None:
+            during_copy, self.during_copy = self.during_copy, None
+            during_copy()
+
+
+def point_id(i):
+    return str(uuid.UUID(int=i))
+
+
+def chunk(i, text=None, vector=None):
+    return models.PointStruct(
+        id=point_id(i),
+        vector=vector or [1.0, float(i), 0.5],
+        payload={"text": text or f"chunk {i}", "metadata": {"doc_id": f"doc-{i % 2}"}}
+    )
+
+
+@pytest.fixture
+def client():
+    client = qdrant_client.QdrantClient(":memory:")
+    client.create_collection(
+        COLLECTION,
+        vectors_config=models.VectorParams(size=3, distance=models.Distance.COSINE)
+    )
+    client.upsert(COLLECTION, points=[chunk(i) for i in range(1, 6)])
+    yield client
+    client.close()
+
+
+def points_by_id(client, collection):
+    points, _ = client.scroll(collection, limit=100, with_payload=True, with_vectors=True)
+    return {point.id: point for point in points}
+
+
+def test_writes_during_the_copy_are_synced_before_the_switch(client):
+    def write_during_copy():
+        # Point 1 was copied already: change its payload and vector under the same ID
+        client.upsert(COLLECTION, points=[chunk(1, text="chunk 1, rewritten", vector=[0.0, 1.0, 0.0])])
+        client.delete(COLLECTION, points_selector=models.PointIdsList(points=[point_id(2)]))
+        client.upsert(COLLECTION, points=[chunk(6)])
+
+    rag = MigratingRAGSystem(client, during_copy=write_during_copy)
+    result = rag.migrate_to_sparse_vectors()
+
+    assert result["status"] == "success", result
+    assert {a.alias_name: a.collection_name for a in client.get_aliases().aliases} == {COLLECTION: MIGRATED}
+    assert [c.name for c in client.get_collections().collections] == [MIGRATED]
+    assert rag.sparse_vectors_ready
+
+    migrated = points_by_id(client, COLLECTION)
+    assert set(migrated) == {point_id(i) for i in (1, 3, 4, 5, 6)}
+    assert migrated[point_id(1)].payload["text"] == "chunk 1, rewritten"
+    assert migrated[point_id(1)].vector[""] == pytest.approx([0.0, 1.0, 0.0])
+    assert all(SPARSE_VECTOR_NAME in point.vector for point in migrated.values())
+
+
+def test_source_is_kept_when_the_counts_differ(client):
+    rag = MigratingRAGSystem(
+        client,
+        during_copy=lambda: client.delete(COLLECTION, points_selector=models.PointIdsList(points=[point_id(1)]))
+    )
+    # Without the sync the point deleted during the copy is still in the copy
+    rag._sync_point_delta = lambda source_name, target_name: (0, 0)
+
+    result = rag.migrate_to_sparse_vectors()
+
+    assert result["status"] == "error"
+    assert client.get_aliases().aliases == []
+    assert client.count(COLLECTION, exact=True).count == 4
+    assert not rag.sparse_vectors_ready
+
+
+def test_sync_copies_changed_points_and_deletes_extra_ones(client):
+    rag = MigratingRAGSystem(client)
+    client.create_collection(
+        MIGRATED,
+        vectors_config=models.VectorParams(size=3, distance=models.Distance.COSINE),
+        sparse_vectors_config={SPARSE_VECTOR_NAME: models.SparseVectorParams()}
+    )
+    rag._copy_points_with_sparse(list(points_by_id(client, COLLECTION).values()), MIGRATED)
+    assert rag._sync_point_delta(COLLECTION, MIGRATED) == (0, 0)
+
+    client.set_payload(COLLECTION, payload={"is_reviewed": True}, points=[point_id(3)])
+    client.upsert(MIGRATED, points=[chunk(9)])
+
+    assert rag._sync_point_delta(COLLECTION, MIGRATED) == (1, 1)
+    assert points_by_id(client, MIGRATED)[point_id(3)].payload["is_reviewed"] is True
+    assert rag._sync_point_delta(COLLECTION, MIGRATED) == (0, 0)
+
+
+def test_migrating_twice_is_a_no_op(client):
+    rag = MigratingRAGSystem(client)
+    assert rag.migrate_to_sparse_vectors()["status"] == "success"
+
+    again = rag.migrate_to_sparse_vectors()
+    assert again["status"] == "success"
+    assert again["copied"] == 0
+
+
+def test_recover_alias_after_a_crash_between_drop_and_alias(client):
+    rag = MigratingRAGSystem(client)
+    client.create_collection(
+        MIGRATED,
+        vectors_config=models.VectorParams(size=3, distance=models.Distance.COSINE)
+    )
+
+    # The source still exists: nothing to recover
+    assert not rag._recover_chunk_alias()
+    assert client.get_aliases().aliases == []
+
+    client.delete_collection(COLLECTION)
+    assert rag._recover_chunk_alias()
+    assert {a.alias_name: a.collection_name for a in client.get_aliases().aliases} == {COLLECTION: MIGRATED}
+    # Already aliased
+    assert rag._recover_chunk_alias()
+
+
+def test_recover_alias_without_a_migrated_collection(client):
+    rag = MigratingRAGSystem(client)
+    client.delete_collection(COLLECTION)
+
+    assert not rag._recover_chunk_alias()
+    assert client.get_aliases().aliases == []
@@ -96,6 +96,7 @@ class BaseParser(abc.ABC):
         neo4j_uri: str,
         neo4j_user: str,
         neo4j_password: str,
+        rag_system: Optional[Any] = None,
         **kwargs
     ) -> 'BaseParser':
         """
@@ -106,6 +107,8 @@ class BaseParser(abc.ABC):
             neo4j_uri: URI for Neo4j database
             neo4j_user: Username for Neo4j
             neo4j_password: Password for Neo4j
+            rag_system: RAGSystem of the calling process, used by the parsers that embed
+                chunks at ingest time (the others ignore it)
             **kwargs: Additional parser-specific initialization parameters
 
         Returns:
@@ -120,6 +123,7 @@ class BaseParser(abc.ABC):
                 neo4j_uri=neo4j_uri,
                 neo4j_user=neo4j_user,
                 neo4j_password=neo4j_password,
+                rag_system=rag_system,
                 **kwargs
             )
         elif parser_type == ParserType.UNSTRUCTURED_CLOUD:
@@ -130,6 +134,7 @@ class BaseParser(abc.ABC):
                 neo4j_user=neo4j_user,
                 neo4j_password=neo4j_password,
                 is_cloud=True,
+                rag_system=rag_system,
                 **kwargs
             )
         elif parser_type == ParserType.DOCTLY:
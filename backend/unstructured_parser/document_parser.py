@@ -4,7 +4,7 @@ import requests
 import logging
 import json
 import uuid
-from typing import Dict, List, Any, Optional, BinaryIO, Callable, Literal
+from typing import Dict, List, Any, Optional, BinaryIO, Callable, Literal, Iterator
 from datetime import datetime as py_datetime  
 import datetime  # Import the full module too
 import tempfile
@@ -18,6 +18,7 @@ from qdrant_client import QdrantClient, models as qdrant_models
 
 # Import MetadataParser
 from data_enrichment.metadata_parser import MetadataParser
+from llamaIndex_rag.document_catalog import DocumentCatalog
 
 # Import LangChain TokenTextSplitter with fallback
 try:
@@ -56,7 +57,8 @@ class DocumentParser:
           extract_tables: bool = True,
           extract_metadata: bool = True,
           extract_images: bool = False,
-          is_cloud: bool = False
+          is_cloud: bool = False,
+          rag_system: Optional[Any] = None
       ):
       """
       Initialize the document parser.
@@ -75,8 +77,11 @@ class DocumentParser:
           extract_metadata: Whether to extract detailed metadata
           extract_images: Whether to extract and process images
           is_cloud: Whether to use the cloud version of Unstructured API
+          rag_system: Optional RAGSystem used to embed chunks at ingest time. When set,
+              chunks are stored once with their real vectors instead of dummy vectors.
       """
       self.is_cloud = is_cloud
+      self.rag_system = rag_system
       self.embedding_dim = embedding_dim # Store embedding_dim
 
       # Get Unstructured API credentials from environment if not provided
@@ -115,10 +120,12 @@ class DocumentParser:
       self.qdrant_metadata_collection_name = qdrant_metadata_collection_name
       try:
           self.qdrant_client = QdrantClient(url=self.qdrant_url)
+          self.catalog = DocumentCatalog(self.qdrant_client, self.qdrant_metadata_collection_name)
           logger.info(f"Successfully connected to Qdrant at {self.qdrant_url}")
       except Exception as e:
           logger.error(f"Failed to connect to Qdrant at {self.qdrant_url}: {e}")
           self.qdrant_client = None
+          self.catalog = None
 
       # Initialize metadata parser
       self.metadata_parser = MetadataParser()
@@ -856,7 +863,6 @@ class DocumentParser:
         # Persist initial document metadata (including size, title etc.) to Qdrant metadata collection
         if self.qdrant_client:
             try:
-                metadata_point_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, doc_id))
                 # Ensure all expected fields for DocumentMetadata model are present or have defaults
                 # This helps prevent issues if RAGSystem's _get_document_metadata expects certain fields
                 
@@ -883,16 +889,7 @@ class DocumentParser:
                 }
 
 
-                self.qdrant_client.upsert(
-                    collection_name=self.qdrant_metadata_collection_name,
-                    points=[
-                        qdrant_models.PointStruct(
-                            id=metadata_point_id,
-                            vector=[1.0] * self.embedding_dim, # Use embedding_dim consistent with collection
-                            payload=payload_to_store
-                        )
-                    ]
-                )
+                self.catalog.upsert(doc_id, payload_to_store, merge=False)
                 logger.info(f"Stored initial metadata for document {doc_id} in '{self.qdrant_metadata_collection_name}'")
             except Exception as e:
                 logger.error(f"Error storing initial metadata for document {doc_id} in Qdrant: {e}", exc_info=True)
@@ -1016,7 +1013,6 @@ class DocumentParser:
                     # Update document metadata in Qdrant with language info
                     if self.qdrant_client:
                         try:
-                            metadata_point_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, doc_id))
                             # Prepare payload with updated language and potentially other fields
                             # It's important to merge with existing metadata in Qdrant or ensure full update
                             # For simplicity, we update specific fields here. A more robust solution
@@ -1052,16 +1048,7 @@ class DocumentParser:
                             }
 
 
-                            self.qdrant_client.upsert(
-                                collection_name=self.qdrant_metadata_collection_name,
-                                points=[
-                                    qdrant_models.PointStruct(
-                                        id=metadata_point_id,
-                                        vector=[1.0] * self.embedding_dim, # Use embedding_dim consistent with collection
-                                        payload=final_payload_for_update
-                                    )
-                                ]
-                            )
+                            self.catalog.upsert(doc_id, final_payload_for_update, merge=False)
                             logger.info(f"Updated metadata for document {doc_id} with language info.")
                         except Exception as e:
                             logger.error(f"Error updating metadata with language info for {doc_id}: {e}", exc_info=True)
@@ -1079,7 +1066,42 @@ class DocumentParser:
                 chunks = self._fixed_chunking_from_elements(elements, doc_id)
             
             # Store chunks in Qdrant
-            if self.qdrant_client and chunks:
+            if self.qdrant_client and chunks and self.rag_system:
+                try:
+                    # Single-pass ingest: embed and store each chunk once with its real vector
+                    chunks_to_index = []
+                    for chunk_idx, chunk_data in enumerate(chunks):
+                        text_content = chunk_data.get("text", "")
+                        if not text_content or text_content.strip() == "":
+                            continue
+                        
+                        chunk_metadata = dict(chunk_data.get("metadata", {}) or {})
+                        chunk_metadata.update({
+                            "doc_id": doc_id,
+                            "chunk_id": chunk_data.get("chunk_id", f"{doc_id}_chunk_{chunk_idx}"),
+                            "page_number": chunk_data.get("page_num", 0),
+                            "element_type": chunk_data.get("element_type", "unknown"),
+                            "order_index": chunk_data.get("order_index", chunk_idx)
+                        })
+                        chunks_to_index.append({"text": text_content, "metadata": chunk_metadata})
+                    
+                    index_result = self.rag_system.index_chunks(doc_id, chunks_to_index)
+                    if index_result.get("status") == "success":
+                        stored_count = index_result.get("vector_count", 0) + index_result.get("unchanged_count", 0)
+                        doc_metadata["is_indexed"] = True
+                        logger.info(f"Embedded and stored {stored_count} chunks for document {doc_id} in a single pass")
+                    else:
+                        stored_count = 0
+                        logger.error(f"Single-pass indexing failed for document {doc_id}: {index_result.get('message')}")
+                    
+                    if "chunk_count" not in doc_metadata:
+                        doc_metadata["chunk_count"] = stored_count
+                    self._mark_document_processed(doc_id, doc_metadata, stored_count)
+                except Exception as e:
+                    logger.error(f"Error storing chunks in Qdrant: {str(e)}")
+                    # Continue processing - we'll still return the extracted information
+
+            elif self.qdrant_client and chunks:
                 try:
                     points_to_upsert = []
                     skipped_chunks = 0
@@ -1098,6 +1120,7 @@ class DocumentParser:
 
                         # Create payload for Qdrant
                         payload = {
+                            "is_placeholder": True,  # Not embedded yet, ignored by "already indexed" checks
                             "doc_id": doc_id,  # Add doc_id at root level
                             "chunk_id": payload_chunk_id, # Use the original chunk_id style here
                             "text": text_content,
@@ -1161,49 +1184,7 @@ class DocumentParser:
                         doc_metadata["chunk_count"] = len(points_to_upsert)
 
                     # Update document status to processed
-                    try:
-                        metadata_point_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, doc_id))
-                        
-                        # Get existing metadata
-                        try:
-                            metadata_response = self.qdrant_client.retrieve(
-                                collection_name=self.qdrant_metadata_collection_name,
-                                ids=[metadata_point_id],
-                                with_payload=True
-                            )
-                            
-                            if metadata_response and len(metadata_response) > 0:
-                                existing_metadata = metadata_response[0].payload
-                            else:
-                                existing_metadata = {}
-                        except Exception as retrieve_error:
-                            logger.warning(f"Error retrieving existing metadata for {doc_id}: {str(retrieve_error)}")
-                            existing_metadata = {}
-                        
-                        # Merge with existing metadata
-                        final_payload_for_update = existing_metadata.copy() if existing_metadata else {}
-                        final_payload_for_update.update({
-                            "doc_id": doc_id,
-                            "status": "processed",
-                            "chunk_count": len(points_to_upsert),
-                            "is_indexed": doc_metadata.get("is_indexed", False)
-                        })
-                        
-                        # Update metadata in Qdrant
-                        self.qdrant_client.upsert(
-                            collection_name=self.qdrant_metadata_collection_name,
-                            points=[
-                                qdrant_models.PointStruct(
-                                    id=metadata_point_id,
-                                    vector=[1.0] * self.embedding_dim,
-                                    payload=final_payload_for_update
-                                )
-                            ],
-                            wait=True
-                        )
-                        logger.info(f"Updated metadata for document {doc_id} to status 'processed' with chunk_count {len(points_to_upsert)}")
-                    except Exception as e:
-                        logger.error(f"Error updating document metadata: {str(e)}")
+                    self._mark_document_processed(doc_id, doc_metadata, len(points_to_upsert))
                 except Exception as e:
                     logger.error(f"Error storing chunks in Qdrant: {str(e)}")
                     # Continue processing - we'll still return the extracted information
@@ -1214,7 +1195,6 @@ class DocumentParser:
             # After successful chunking and storage, update metadata status to "processed" or "pending_indexing"
             if self.qdrant_client:
                 try:
-                    metadata_point_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, doc_id))
                     # Update status to 'processed', indicating chunks are stored, ready for indexing by RAGSystem
                     # The RAGSystem will later update it to is_indexed=True and status='active' or 'indexed'
                     processed_payload = doc_metadata.copy()
@@ -1240,16 +1220,7 @@ class DocumentParser:
                          **processed_payload # Add any other fields
                     }
                     
-                    self.qdrant_client.upsert(
-                        collection_name=self.qdrant_metadata_collection_name,
-                        points=[
-                            qdrant_models.PointStruct(
-                                id=metadata_point_id,
-                                vector=[1.0] * self.embedding_dim, # Use embedding_dim consistent with collection
-                                payload=final_processed_payload
-                            )
-                        ]
-                    )
+                    self.catalog.upsert(doc_id, final_processed_payload, merge=False)
                     logger.info(f"Updated metadata for document {doc_id} to status 'processed' with chunk_count {len(chunks)}.")
                 except Exception as e:
                     logger.error(f"Error updating metadata status to processed for {doc_id}: {e}", exc_info=True)
@@ -1266,6 +1237,28 @@ class DocumentParser:
             logger.error(f"Error processing document: {str(e)}", exc_info=True)
             raise
 
+    def _mark_document_processed(self, doc_id: str, doc_metadata: Dict[str, Any], chunk_count: int) -> None:
+        """
+        Update the document's metadata record to status 'processed' after its chunks are stored.
+
+        Args:
+            doc_id: Document ID
+            doc_metadata: Current document metadata
+            chunk_count: Number of chunks stored for the document
+        """
+        try:
+            # Merge into the existing catalog record
+            self.catalog.update_fields(
+                doc_id,
+                wait=True,
+                status="processed",
+                chunk_count=chunk_count,
+                is_indexed=doc_metadata.get("is_indexed", False)
+            )
+            logger.info(f"Updated metadata for document {doc_id} to status 'processed' with chunk_count {chunk_count}")
+        except Exception as e:
+            logger.error(f"Error updating document metadata: {str(e)}")
+
     def process_large_document(
         self,
         file_content: bytes,
@@ -1510,96 +1503,116 @@ class DocumentParser:
         """
         Retrieve all chunks for a document from Qdrant.
         
+        Prefer iter_document_chunks for large documents; this materializes the whole stream.
+        
         Args:
             doc_id: Document ID to retrieve chunks for
             
         Returns:
             List of chunk dictionaries with text and metadata
         """
+        try:
+            chunks = list(self.iter_document_chunks(doc_id))
+            if chunks:
+                logger.info(f"Retrieved {len(chunks)} chunks for document {doc_id} from Qdrant")
+            return chunks
+        except Exception as e:
+            logger.error(f"Error retrieving chunks for document {doc_id}: {str(e)}")
+            return []
+
+    def iter_document_chunks(self, doc_id: str, page_size: int = 256) -> Iterator[Dict[str, Any]]:
+        """
+        Stream all chunks for a document from Qdrant, one scroll page at a time.
+        
+        Pages are followed through Qdrant's next page offset, so documents of any size
+        are returned in full while only one page is held in memory.
+        
+        Args:
+            doc_id: Document ID to retrieve chunks for
+            page_size: Number of points fetched per scroll call
+            
+        Yields:
+            Chunk dictionaries with text and metadata
+        """
         if not self.qdrant_client:
             logger.error("Qdrant client not available, cannot retrieve document chunks")
-            return []
+            return
         
-        try:
-            # Query Qdrant for chunks with this doc_id
-            response = self.qdrant_client.scroll(
-                                collection_name=self.qdrant_collection_name,
-                                scroll_filter=qdrant_models.Filter(
-                                    must=[
-                                        qdrant_models.FieldCondition(
-                                            key="doc_id",
-                                            match=qdrant_models.MatchValue(value=doc_id)
-                                        )
-                                    ]
-                                ),
-                limit=1000,
-                with_payload=True,
-                with_vectors=False
-            )
+        found = False
+        for point in self._scroll_chunk_points("doc_id", doc_id, page_size):
+            found = True
+            payload = point.payload or {}
+            # Create a chunk object with standard fields
+            chunk = {
+                "text": payload.get("text", ""),
+                "content": payload.get("text", ""),  # Use 'text' as 'content' for compatibility
+                "metadata": {
+                    "doc_id": doc_id,
+                    "chunk_id": payload.get("chunk_id", ""),
+                    "page_num": payload.get("page_number", 0),
+                    "element_type": payload.get("element_type", "")
+                }
+            }
             
-            chunks = []
-            if response and len(response[0]) > 0:
-                for point in response[0]:
-                    payload = point.payload
-                    # Create a chunk object with standard fields
-                    chunk = {
-                        "text": payload.get("text", ""),
-                        "content": payload.get("text", ""),  # Use 'text' as 'content' for compatibility
-                        "metadata": {
-                            "doc_id": doc_id,
-                            "chunk_id": payload.get("chunk_id", ""),
-                            "page_num": payload.get("page_number", 0),
-                            "element_type": payload.get("element_type", "")
-                        }
-                    }
-                    
-                    # Add additional metadata if available
-                    if "metadata" in payload and isinstance(payload["metadata"], dict):
-                        for key, value in payload["metadata"].items():
-                            chunk["metadata"][key] = value
-                    
-                    chunks.append(chunk)
-                
-                logger.info(f"Retrieved {len(chunks)} chunks for document {doc_id} from Qdrant")
-                return chunks
+            # Add additional metadata if available
+            if "metadata" in payload and isinstance(payload["metadata"], dict):
+                for key, value in payload["metadata"].items():
+                    chunk["metadata"][key] = value
+            
+            yield chunk
+        
+        if found:
+            return
+        
+        # If no chunks found with 'doc_id' field, try with 'metadata.doc_id'
+        for point in self._scroll_chunk_points("metadata.doc_id", doc_id, page_size):
+            found = True
+            payload = point.payload or {}
+            # Create a chunk object with standard fields
+            chunk = {
+                "text": payload.get("text", ""),
+                "content": payload.get("text", ""),  # Use 'text' as 'content' for compatibility
+                "metadata": dict(payload.get("metadata", {}) or {})
+            }
+            
+            # Ensure doc_id is in metadata
+            if "doc_id" not in chunk["metadata"]:
+                chunk["metadata"]["doc_id"] = doc_id
+            
+            yield chunk
+        
+        if not found:
+            logger.warning(f"No chunks found for document {doc_id} in Qdrant")
+
+    def _scroll_chunk_points(self, key: str, doc_id: str, page_size: int) -> Iterator[Any]:
+        """
+        Page through the chunk points whose payload field matches doc_id.
+        
+        Args:
+            key: Payload field to match on
+            doc_id: Document ID
+            page_size: Number of points fetched per scroll call
             
-            # If no chunks found with 'doc_id' field, try with 'metadata.doc_id'
-            response = self.qdrant_client.scroll(
+        Yields:
+            Qdrant points with payloads
+        """
+        offset = None
+        while True:
+            points, offset = self.qdrant_client.scroll(
                 collection_name=self.qdrant_collection_name,
                 scroll_filter=qdrant_models.Filter(
                     must=[
                         qdrant_models.FieldCondition(
-                            key="metadata.doc_id",
+                            key=key,
                             match=qdrant_models.MatchValue(value=doc_id)
                         )
                     ]
                 ),
-                limit=1000,
+                limit=max(1, page_size),
+                offset=offset,
                 with_payload=True,
                 with_vectors=False
             )
-            
-            if response and len(response[0]) > 0:
-                for point in response[0]:
-                    payload = point.payload
-                    # Create a chunk object with standard fields
-                    chunk = {
-                        "text": payload.get("text", ""),
-                        "content": payload.get("text", ""),  # Use 'text' as 'content' for compatibility
-                        "metadata": payload.get("metadata", {})
-                    }
-                    
-                    # Ensure doc_id is in metadata
-                    if "metadata" in chunk and "doc_id" not in chunk["metadata"]:
-                        chunk["metadata"]["doc_id"] = doc_id
-                    
-                    chunks.append(chunk)
-                
-                logger.info(f"Retrieved {len(chunks)} chunks for document {doc_id} from Qdrant using metadata.doc_id")
-                return chunks
-            
-            logger.warning(f"No chunks found for document {doc_id} in Qdrant")
-            return []
-        except Exception as e:
-            logger.error(f"Error retrieving chunks for document {doc_id}: {str(e)}")
-            return []
+            yield from points
+            if offset is None:
+                break
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Load test for the RAG query endpoint.
+
+Sends one warm-up query, then N concurrent queries to /rag/query while polling
+/rag/health. If the query engine blocked the event loop, the concurrent
+queries would finish one after the other (wall time close to the sum of their
+latencies) and the health probe would stall for the duration of each query.
+
+With --stream, queries use the streaming mode and the time to the first answer
+token is reported as well.
+
+Usage:
+    python scripts/rag_load_test.py --url http://localhost:8090 --concurrency 8
+"""
+
+import argparse
+import functools
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+DEFAULT_QUERIES = [
+    "What does article 32 GDPR require for encryption?",
+    "Which security measures does ISO 27001 Annex A list for access control?",
+    "What are the breach notification deadlines under GDPR?",
+    "How should personal data be pseudonymised?",
+    "What does NIS2 require for incident reporting?",
+    "Who must appoint a data protection officer?",
+    "What is a data protection impact assessment?",
+    "Which rights do data subjects have under GDPR?",
+]
+
+
+def run_query(url: str, query: str, headers: dict, timeout: float) -> float:
+    start = time.perf_counter()
+    response = requests.post(
+        f"{url}/rag/query",
+        json={"query": query, "use_cache": False},
+        headers=headers,
+        timeout=timeout,
+    )
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+def run_stream_query(url: str, query: str, headers: dict, timeout: float, first_tokens: list) -> float:
+    start = time.perf_counter()
+    with requests.post(
+        f"{url}/rag/query",
+        json={"query": query, "use_cache": False, "streaming": True},
+        headers=headers,
+        timeout=timeout,
+        stream=True,
+    ) as response:
+        response.raise_for_status()
+        first_token = None
+        for line in response.iter_lines():
+            if first_token is None and line and json.loads(line).get("type") == "token":
+                first_token = time.perf_counter() - start
+    if first_token is not None:
+        first_tokens.append(first_token)
+    return time.perf_counter() - start
+
+
+def probe_health(url: str, headers: dict, stop: threading.Event, latencies: list) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            requests.get(f"{url}/rag/health", headers=headers, timeout=60)
+            latencies.append(time.perf_counter() - start)
+        except requests.RequestException:
+            pass
+        stop.wait(0.2)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8090", help="Base URL of the backend")
+    parser.add_argument("--concurrency", type=int, default=8, help="Number of concurrent queries")
+    parser.add_argument("--token", default=None, help="Bearer token, if the endpoint requires authentication")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Per-request timeout in seconds")
+    parser.add_argument("--stream", action="store_true", help="Use streaming queries and report time to first token")
+    args = parser.parse_args()
+
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    queries = [DEFAULT_QUERIES[i % len(DEFAULT_QUERIES)] for i in range(args.concurrency)]
+    first_tokens = []
+    query_fn = functools.partial(run_stream_query, first_tokens=first_tokens) if args.stream else run_query
+
+    single = query_fn(args.url, queries[0], headers, args.timeout)
+    print(f"Single query: {single:.2f}s" + (f", first token {first_tokens[0]:.2f}s" if first_tokens else ""))
+    first_tokens.clear()
+
+    stop = threading.Event()
+    health_latencies = []
+    prober = threading.Thread(target=probe_health, args=(args.url, headers, stop, health_latencies), daemon=True)
+    prober.start()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        latencies = list(pool.map(lambda q: query_fn(args.url, q, headers, args.timeout), queries))
+    wall = time.perf_counter() - start
+    stop.set()
+    prober.join()
+
+    serial = sum(latencies)
+    print(f"{args.concurrency} concurrent queries: wall {wall:.2f}s, sum of latencies {serial:.2f}s")
+    print(f"Latency: median {statistics.median(latencies):.2f}s, max {max(latencies):.2f}s")
+    # 1.0 means fully serialized, 1/concurrency means fully overlapped
+    print(f"Serialization ratio (wall / sum): {wall / serial:.2f} (fully overlapped: {1 / args.concurrency:.2f})")
+    if first_tokens:
+        print(
+            f"Time to first token: median {statistics.median(first_tokens):.2f}s, max {max(first_tokens):.2f}s"
+        )
+    if health_latencies:
+        print(
+            f"Health probe during load: {len(health_latencies)} probes, "
+            f"median {statistics.median(health_latencies) * 1000:.0f}ms, max {max(health_latencies) * 1000:.0f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()